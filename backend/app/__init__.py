@@ -28,6 +28,10 @@ def create_app(config_name=None):
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
     
+    # 连接池指标需在创建数据库引擎前配置
+    from app.utils.metrics import configure_engine_metrics
+    configure_engine_metrics(app)
+    
     # 初始化扩展
     db.init_app(app)
     migrate.init_app(app, db)
@@ -39,6 +43,42 @@ def create_app(config_name=None):
     from app.notification.service import init_notification_service
     init_notification_service(mail)
     
+    # 初始化通知模板渲染器
+    from app.notification.templating import init_template_renderer
+    init_template_renderer(app)
+    
+    # 初始化通知规则索引（注册规则、模板变更时递增版本号的监听）
+    from app.notification.rule_index import init_notification_rule_index
+    init_notification_rule_index(app)
+    
+    # 初始化通知异步派发
+    from app.notification.dispatcher import init_notification_dispatcher
+    init_notification_dispatcher(app)
+    
+    # 初始化通知升级调度
+    from app.notification.escalation import init_escalation_scheduler
+    init_escalation_scheduler(app)
+    
+    # 初始化告警关联引擎
+    from app.alerting.correlation import init_correlation_engine
+    init_correlation_engine(app)
+    
+    # 初始化告警抑制器
+    from app.alerting.suppression import init_alert_suppressor
+    init_alert_suppressor(app)
+    
+    # 初始化告警异步写入队列
+    from app.alerting.writer import init_alert_writer
+    init_alert_writer(app)
+    
+    # 初始化Prometheus指标
+    from app.utils.metrics import init_metrics
+    init_metrics(app)
+    
+    # 初始化请求计量
+    from app.utils.instrumentation import init_instrumentation
+    init_instrumentation(app)
+    
     # 注册蓝图
     from app.api import api_v1
     app.register_blueprint(api_v1, url_prefix='/api/v1')
@@ -0,0 +1,4 @@
+"""
+告警接入模块
+负责监控系统告警的解析、校验与批量入库
+"""
@@ -0,0 +1,153 @@
+"""
+Prometheus Alertmanager 接入
+将Alertmanager webhook的分组告警映射为alerts表数据
+"""
+from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime
+from app import db
+from app.models.alert import Alert
+from app.models.incident import Service
+from app.alerting.ingest import AlertValidationError, build_alert_row, parse_fired_at
+import hashlib
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# severity标签到告警级别的映射
+SEVERITY_LEVELS = {
+    'critical': 'Critical',
+    'page': 'Critical',
+    'error': 'Critical',
+    'warning': 'Warning',
+    'warn': 'Warning',
+}
+
+# environment标签到环境枚举的映射
+ENVIRONMENTS = {
+    'prod': 'Production',
+    'production': 'Production',
+    'staging': 'Staging',
+    'stage': 'Staging',
+    'dev': 'Development',
+    'development': 'Development',
+}
+
+
+class ServiceLabelCache:
+    """服务名称到服务ID的进程内缓存，避免每条告警查询一次services表"""
+
+    def __init__(self, ttl: int = 60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._mapping: Dict[str, int] = {}
+        self._loaded_at = 0.0
+
+    def lookup(self, name: Optional[str]) -> Optional[int]:
+        """按名称（不区分大小写）查找服务ID"""
+        if not name:
+            return None
+        if time.monotonic() - self._loaded_at > self.ttl:
+            self._refresh()
+        return self._mapping.get(str(name).lower())
+
+    def invalidate(self):
+        """服务变更后使缓存失效"""
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def _refresh(self):
+        rows = db.session.query(Service.id, Service.name).filter(Service.is_active == True).all()
+        with self._lock:
+            self._mapping = {name.lower(): service_id for service_id, name in rows if name}
+            self._loaded_at = time.monotonic()
+
+
+service_label_cache = ServiceLabelCache()
+
+
+def _alert_fingerprint(alert: Dict[str, Any]) -> str:
+    """优先使用Alertmanager提供的指纹，旧版本没有时按完整标签集计算"""
+    fingerprint = alert.get('fingerprint')
+    if fingerprint:
+        return str(fingerprint)
+    labels = alert.get('labels') or {}
+    raw = '\x1f'.join(f'{key}={labels[key]}' for key in sorted(labels))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def map_alert(alert: Dict[str, Any], group: Dict[str, Any], service_labels: List[str]) -> Dict[str, Any]:
+    """将Alertmanager单条告警映射为告警接口的数据格式"""
+    labels = dict(group.get('commonLabels') or {})
+    labels.update(alert.get('labels') or {})
+    annotations = dict(group.get('commonAnnotations') or {})
+    annotations.update(alert.get('annotations') or {})
+
+    service_id = None
+    for label in service_labels:
+        service_id = service_label_cache.lookup(labels.get(label))
+        if service_id:
+            break
+
+    alertname = labels.get('alertname')
+    return {
+        'title': (annotations.get('summary') or alertname or 'Alertmanager alert')[:255],
+        'description': annotations.get('description'),
+        'alert_source': 'Prometheus',
+        'alert_rule': alertname,
+        'level': SEVERITY_LEVELS.get(str(labels.get('severity', '')).lower(), 'Info'),
+        'metric_name': labels.get('metric'),
+        'metric_value': annotations.get('value'),
+        'threshold': annotations.get('threshold'),
+        'service_id': service_id,
+        'host': labels.get('instance') or labels.get('host'),
+        'environment': ENVIRONMENTS.get(str(labels.get('environment') or labels.get('env') or '').lower()),
+        'fired_at': alert.get('startsAt'),
+        'fingerprint': _alert_fingerprint(alert)
+    }
+
+
+def split_alertmanager_payload(
+    payload: Dict[str, Any],
+    service_labels: List[str]
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], Dict[str, Optional[datetime]], List[Dict[str, Any]]]:
+    """
+    拆分Alertmanager webhook数据
+    返回 (触发中的告警行[(下标, 列字典)], 已恢复的 {指纹: 恢复时间}, 无效条目结果)
+    """
+    firing = []
+    resolved = {}
+    errors = []
+
+    for index, alert in enumerate(payload.get('alerts') or []):
+        if not isinstance(alert, dict):
+            errors.append({'index': index, 'status': 'invalid', 'error': 'alert must be an object'})
+            continue
+
+        status = alert.get('status') or payload.get('status')
+        if status == 'resolved':
+            try:
+                ends_at = parse_fired_at(alert['endsAt']) if alert.get('endsAt') else None
+            except ValueError:
+                ends_at = None
+            resolved[_alert_fingerprint(alert)] = ends_at
+            continue
+
+        try:
+            firing.append((index, build_alert_row(map_alert(alert, payload, service_labels))))
+        except AlertValidationError as e:
+            errors.append({'index': index, 'status': 'invalid', 'error': str(e)})
+
+    return firing, resolved, errors
+
+
+def resolve_alerts_by_fingerprint(resolved: Dict[str, Optional[datetime]]) -> int:
+    """批量解决指纹匹配的活跃告警（不提交事务），返回解决的数量"""
+    if not resolved:
+        return 0
+
+    alerts = Alert.query.filter(Alert.active_fingerprint.in_(list(resolved.keys()))).all()
+    for alert in alerts:
+        alert.resolve(resolved_at=resolved.get(alert.active_fingerprint))
+    return len(alerts)
@@ -0,0 +1,270 @@
+"""
+告警关联引擎
+按受影响服务和时间窗口把新告警自动关联到未关闭的故障，无法关联时给出新建故障建议
+"""
+from typing import Dict, List, Any, Optional
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from app import db
+from app.models.alert import Alert
+from app.models.incident_new import NewIncident, IncidentTimeline
+from app.alerting.alertmanager import service_label_cache
+import json
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 仍需关联告警的故障状态
+OPEN_INCIDENT_STATUSES = ('Pending', 'Investigating', 'Recovering', 'Recovered')
+
+# 告警级别到建议故障等级的映射
+LEVEL_SEVERITY = {'Critical': 'P2', 'Warning': 'P3', 'Info': 'P4'}
+LEVEL_RANK = {'Critical': 3, 'Warning': 2, 'Info': 1}
+
+
+class _OpenIncident:
+    """索引中的故障条目"""
+    __slots__ = ('id', 'incident_id', 'started_at', 'last_seen_at')
+
+    def __init__(self, id, incident_id, started_at):
+        self.id = id
+        self.incident_id = incident_id
+        self.started_at = started_at
+        self.last_seen_at = started_at
+
+
+def parse_affected_services(value: Optional[str]) -> List[int]:
+    """解析故障的affected_services字段（JSON列表，元素可以是服务ID、服务名称或{id: ...}）"""
+    if not value:
+        return []
+    try:
+        items = json.loads(value)
+    except (TypeError, ValueError):
+        items = [item.strip() for item in str(value).split(',')]
+    if not isinstance(items, list):
+        items = [items]
+
+    service_ids = []
+    for item in items:
+        if isinstance(item, dict):
+            item = item.get('id') or item.get('name')
+        if isinstance(item, int) or (isinstance(item, str) and item.isdigit()):
+            service_ids.append(int(item))
+        elif isinstance(item, str):
+            service_id = service_label_cache.lookup(item)
+            if service_id:
+                service_ids.append(service_id)
+    return service_ids
+
+
+class CorrelationEngine:
+    """
+    未关闭故障的进程内索引：服务ID -> 故障列表（按开始时间倒序）
+    告警落在故障开始前window秒到最近一次关联告警后window秒之间即视为同一故障
+    """
+
+    def __init__(self, window_seconds: int = 1800, ttl: int = 30):
+        self.window = timedelta(seconds=window_seconds)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._index: Dict[int, List[_OpenIncident]] = {}
+        self._loaded_at = 0.0
+
+    def configure(self, window_seconds: int, ttl: int):
+        self.window = timedelta(seconds=window_seconds)
+        self.ttl = ttl
+        self.invalidate()
+
+    def invalidate(self):
+        """故障创建或状态变更后使索引失效，下次关联时重新加载"""
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def _ensure_loaded(self):
+        if time.monotonic() - self._loaded_at <= self.ttl:
+            return
+
+        incidents = db.session.query(
+            NewIncident.id, NewIncident.incident_id, NewIncident.detected_at,
+            NewIncident.created_at, NewIncident.affected_services
+        ).filter(NewIncident.status.in_(OPEN_INCIDENT_STATUSES)).all()
+
+        entries = {}
+        services = {}
+        for pk, incident_id, detected_at, created_at, affected_services in incidents:
+            entries[pk] = _OpenIncident(pk, incident_id, detected_at or created_at or datetime.utcnow())
+            services[pk] = set(parse_affected_services(affected_services))
+
+        # 已关联告警的服务同样视为受影响服务，并推进最近活动时间
+        if entries:
+            linked = db.session.query(
+                Alert.incident_id, Alert.service_id, db.func.max(Alert.last_fired_at)
+            ).filter(
+                Alert.incident_id.in_(list(entries.keys())),
+                Alert.service_id.isnot(None)
+            ).group_by(Alert.incident_id, Alert.service_id).all()
+            for pk, service_id, last_fired_at in linked:
+                services[pk].add(service_id)
+                if last_fired_at and last_fired_at > entries[pk].last_seen_at:
+                    entries[pk].last_seen_at = last_fired_at
+
+        index = {}
+        for pk, service_ids in services.items():
+            for service_id in service_ids:
+                index.setdefault(service_id, []).append(entries[pk])
+        for candidates in index.values():
+            candidates.sort(key=lambda entry: entry.started_at, reverse=True)
+
+        with self._lock:
+            self._index = index
+            self._loaded_at = time.monotonic()
+
+    def match(self, service_id: Optional[int], fired_at: datetime,
+              pending: Optional[Dict[int, datetime]] = None) -> Optional[_OpenIncident]:
+        """查找告警所属的未关闭故障，pending 为当前事务中尚未提交的最近活动时间"""
+        if service_id is None:
+            return None
+        for entry in self._index.get(service_id, ()):
+            last_seen_at = entry.last_seen_at
+            if pending and entry.id in pending:
+                last_seen_at = max(last_seen_at, pending[entry.id])
+            if entry.started_at - self.window <= fired_at <= last_seen_at + self.window:
+                return entry
+        return None
+
+    def apply_last_seen(self, pending: Dict[int, datetime]):
+        """事务提交后推进故障的最近活动时间"""
+        with self._lock:
+            for candidates in self._index.values():
+                for entry in candidates:
+                    fired_at = pending.get(entry.id)
+                    if fired_at is not None and fired_at > entry.last_seen_at:
+                        entry.last_seen_at = fired_at
+
+    def correlate(self, alerts: List[Dict[str, Any]], user_id: int) -> Dict[str, Any]:
+        """
+        关联一批新告警（不提交事务）
+        alerts中每项需包含 id、service_id、fired_at、level、title
+        返回 {'linked': {告警ID: 故障主键}, 'proposals': [新建故障建议]}
+        """
+        alerts = [alert for alert in alerts if alert.get('id') and alert.get('service_id')]
+        if not alerts:
+            return {'linked': {}, 'proposals': []}
+
+        self._ensure_loaded()
+
+        linked = {}
+        timeline_rows = []
+        proposals = {}
+        now = datetime.utcnow()
+        # 关联写入提交前只记录在会话中，回滚时丢弃，避免未保存的关联扩大故障的关联窗口
+        pending = db.session.info.setdefault('correlation_last_seen', {})
+
+        with self._lock:
+            for alert in alerts:
+                entry = self.match(alert['service_id'], alert['fired_at'], pending)
+                if entry is not None:
+                    linked[alert['id']] = entry.id
+                    if alert['fired_at'] > pending.get(entry.id, entry.last_seen_at):
+                        pending[entry.id] = alert['fired_at']
+                    timeline_rows.append({
+                        'incident_id': entry.id,
+                        'user_id': user_id,
+                        'entry_type': 'alert_linked',
+                        'title': f'关联告警: {alert["title"]}'[:255],
+                        'description': f'告警 #{alert["id"]} 按服务和时间窗口自动关联到故障 {entry.incident_id}',
+                        'timestamp': now,
+                        'related_alert_id': alert['id'],
+                        'created_at': now
+                    })
+                    continue
+
+                proposal = proposals.get(alert['service_id'])
+                if proposal is None:
+                    proposal = proposals[alert['service_id']] = {
+                        'service_id': alert['service_id'],
+                        'title': alert['title'],
+                        'level': alert['level'],
+                        'alert_ids': [],
+                        'first_fired_at': alert['fired_at']
+                    }
+                proposal['alert_ids'].append(alert['id'])
+                proposal['first_fired_at'] = min(proposal['first_fired_at'], alert['fired_at'])
+                if LEVEL_RANK.get(alert['level'], 0) > LEVEL_RANK.get(proposal['level'], 0):
+                    proposal['level'] = alert['level']
+                    proposal['title'] = alert['title']
+
+        # 按故障分组批量更新告警，时间线条目一次批量写入
+        by_incident = {}
+        for alert_id, incident_pk in linked.items():
+            by_incident.setdefault(incident_pk, []).append(alert_id)
+        for incident_pk, alert_ids in by_incident.items():
+            Alert.query.filter(Alert.id.in_(alert_ids)).update({
+                'status': 'Linked',
+                'incident_id': incident_pk,
+                'updated_at': now
+            }, synchronize_session=False)
+        if timeline_rows:
+            db.session.execute(insert(IncidentTimeline), timeline_rows)
+
+        return {
+            'linked': linked,
+            'proposals': [
+                {
+                    'service_id': proposal['service_id'],
+                    'title': proposal['title'],
+                    'suggested_severity': LEVEL_SEVERITY.get(proposal['level'], 'P4'),
+                    'alert_ids': proposal['alert_ids'],
+                    'alert_count': len(proposal['alert_ids']),
+                    'first_fired_at': proposal['first_fired_at'].isoformat()
+                }
+                for proposal in proposals.values()
+            ]
+        }
+
+
+correlation_engine = CorrelationEngine()
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_correlation_last_seen(session):
+    pending = session.info.pop('correlation_last_seen', None)
+    if pending:
+        correlation_engine.apply_last_seen(pending)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_correlation_last_seen(session):
+    session.info.pop('correlation_last_seen', None)
+
+
+def correlate_ingested(rows: List[Dict[str, Any]], upserted: List[tuple], user_id: int) -> Dict[str, Any]:
+    """对本次新建的告警执行关联，去重命中的告警保持原有关联关系"""
+    if not current_app.config['ALERT_CORRELATION_ENABLED']:
+        return {'linked': {}, 'proposals': []}
+
+    alerts = [
+        {
+            'id': alert_id,
+            'service_id': row['service_id'],
+            'fired_at': row['fired_at'],
+            'level': row['level'],
+            'title': row['title']
+        }
+        for row, (alert_id, status) in zip(rows, upserted)
+        if status == 'created'
+    ]
+    return correlation_engine.correlate(alerts, user_id)
+
+
+def init_correlation_engine(app):
+    """根据应用配置初始化关联引擎"""
+    correlation_engine.configure(
+        app.config['ALERT_CORRELATION_WINDOW'],
+        app.config['ALERT_CORRELATION_INDEX_TTL']
+    )
+    return correlation_engine
@@ -0,0 +1,259 @@
+"""
+告警批量接入
+负责告警数据的解析、统一校验以及分块批量写入
+"""
+from typing import Dict, List, Any, Optional, Tuple
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy import update, bindparam
+from app import db
+from app.models.alert import Alert
+from app.models.incident import Service
+from app.utils.sql import upsert_statement
+from app.utils.metrics import ALERTS_INGESTED
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+ALERT_LEVELS = ('Critical', 'Warning', 'Info')
+ALERT_ENVIRONMENTS = ('Production', 'Staging', 'Development')
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+# 单条INSERT语句携带的最大行数，避免超出max_allowed_packet
+BULK_INSERT_CHUNK_SIZE = 500
+
+
+class AlertValidationError(ValueError):
+    """告警数据校验失败"""
+    pass
+
+
+def parse_fired_at(value) -> datetime:
+    """解析告警时间，统一转换为不带时区的UTC时间"""
+    if isinstance(value, datetime):
+        fired_at = value
+    else:
+        fired_at = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+    if fired_at.tzinfo is not None:
+        fired_at = fired_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return fired_at
+
+
+def build_alert_row(data: Any) -> Dict[str, Any]:
+    """校验单条告警并转换为alerts表的列字典"""
+    if not isinstance(data, dict):
+        raise AlertValidationError('alert must be an object')
+
+    for field in ('title', 'level', 'fired_at'):
+        if not data.get(field):
+            raise AlertValidationError(f'{field} is required')
+
+    if not isinstance(data['title'], str):
+        raise AlertValidationError('title must be a string')
+    if len(data['title']) > 255:
+        raise AlertValidationError('title is too long')
+
+    if data['level'] not in ALERT_LEVELS:
+        raise AlertValidationError(f'Invalid level: {data["level"]}')
+
+    environment = data.get('environment')
+    if environment and environment not in ALERT_ENVIRONMENTS:
+        raise AlertValidationError(f'Invalid environment: {environment}')
+
+    try:
+        fired_at = parse_fired_at(data['fired_at'])
+    except (TypeError, ValueError):
+        raise AlertValidationError('Invalid fired_at')
+
+    service_id = data.get('service_id')
+    if service_id is not None:
+        try:
+            service_id = int(service_id)
+        except (TypeError, ValueError):
+            raise AlertValidationError('Invalid service_id')
+
+    fingerprint = data.get('fingerprint')
+    if fingerprint is not None and (not isinstance(fingerprint, str) or not 0 < len(fingerprint) <= 64):
+        raise AlertValidationError('Invalid fingerprint')
+    if not fingerprint:
+        fingerprint = Alert.compute_fingerprint(
+            data.get('alert_rule'), data.get('host'), service_id,
+            data.get('metric_name'), data['title']
+        )
+
+    return {
+        'title': data['title'],
+        'description': data.get('description'),
+        'alert_source': data.get('alert_source'),
+        'alert_rule': data.get('alert_rule'),
+        'level': data['level'],
+        'metric_name': data.get('metric_name'),
+        'metric_value': data.get('metric_value'),
+        'threshold': data.get('threshold'),
+        'service_id': service_id,
+        'host': data.get('host'),
+        'environment': environment or None,
+        'fingerprint': fingerprint,
+        'active_fingerprint': fingerprint,
+        'occurrence_count': 1,
+        'fired_at': fired_at,
+        'last_fired_at': fired_at
+    }
+
+
+def read_alert_batch(req) -> List[Any]:
+    """从请求中读取告警列表，支持JSON数组、{"alerts": [...]}以及NDJSON"""
+    if req.mimetype in NDJSON_MIMETYPES:
+        items = []
+        for line_no, line in enumerate(req.get_data(as_text=True).splitlines(), start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                raise AlertValidationError(f'Invalid JSON at line {line_no}')
+        return items
+
+    data = req.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('alerts')
+    if not isinstance(data, list):
+        raise AlertValidationError('Request body must be a JSON array, {"alerts": [...]} or NDJSON')
+    return data
+
+
+def validate_alert_batch(items: List[Any]) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    统一校验一批告警
+    返回 (有效行列表[(原始下标, 列字典)], 无效条目的结果列表)
+    """
+    rows = []
+    errors = []
+
+    for index, item in enumerate(items):
+        try:
+            rows.append((index, build_alert_row(item)))
+        except AlertValidationError as e:
+            errors.append({'index': index, 'status': 'invalid', 'error': str(e)})
+
+    # 一次查询校验本批次引用的所有服务，避免外键错误导致整批回滚
+    service_ids = {row['service_id'] for _, row in rows if row['service_id'] is not None}
+    if service_ids:
+        existing_ids = {
+            service_id for (service_id,) in
+            db.session.query(Service.id).filter(Service.id.in_(service_ids))
+        }
+        valid_rows = []
+        for index, row in rows:
+            if row['service_id'] is not None and row['service_id'] not in existing_ids:
+                errors.append({'index': index, 'status': 'invalid', 'error': 'Service not found'})
+            else:
+                valid_rows.append((index, row))
+        rows = valid_rows
+
+    return rows, errors
+
+
+def _find_active_alerts(fingerprints) -> Dict[str, Tuple[int, Optional[datetime]]]:
+    """按活跃指纹批量查询已有告警，返回 {指纹: (告警ID, 最近触发时间)}"""
+    fingerprints = list(fingerprints)
+    found = {}
+    for start in range(0, len(fingerprints), BULK_INSERT_CHUNK_SIZE):
+        chunk = fingerprints[start:start + BULK_INSERT_CHUNK_SIZE]
+        query = db.session.query(
+            Alert.active_fingerprint, Alert.id, Alert.last_fired_at
+        ).filter(Alert.active_fingerprint.in_(chunk))
+        for fingerprint, alert_id, last_fired_at in query:
+            found[fingerprint] = (alert_id, last_fired_at)
+    return found
+
+
+def _merge_alert_occurrences(table, inserted):
+    """与活跃告警指纹冲突时累加计数（处理并发写入的竞争）"""
+    return {
+        'occurrence_count': table.c.occurrence_count + inserted.occurrence_count,
+        'last_fired_at': inserted.last_fired_at,
+        'updated_at': inserted.updated_at
+    }
+
+
+def upsert_alerts(rows: List[Dict[str, Any]]) -> List[Tuple[Optional[int], str]]:
+    """
+    按指纹去重写入告警（不提交事务）
+    与同批次或库中活跃告警指纹相同的条目只累加occurrence_count并刷新last_fired_at
+    返回与rows一一对应的 (告警ID, 'created' 或 'deduplicated')，调用方提交后用 count_ingested 计数
+    """
+    if not rows:
+        return []
+
+    # 先在批次内合并相同指纹
+    merged = {}
+    for row in rows:
+        fingerprint = row['active_fingerprint']
+        current = merged.get(fingerprint)
+        if current is None:
+            merged[fingerprint] = dict(row)
+        else:
+            current['occurrence_count'] += row['occurrence_count']
+            current['last_fired_at'] = max(current['last_fired_at'], row['last_fired_at'])
+
+    existing = _find_active_alerts(merged.keys())
+    now = datetime.utcnow()
+
+    updates = []
+    inserts = []
+    for fingerprint, row in merged.items():
+        if fingerprint in existing:
+            alert_id, last_fired_at = existing[fingerprint]
+            updates.append({
+                '_id': alert_id,
+                '_count': row['occurrence_count'],
+                '_last_fired_at': max(last_fired_at, row['last_fired_at']) if last_fired_at else row['last_fired_at'],
+                '_updated_at': now
+            })
+        else:
+            row['created_at'] = now
+            row['updated_at'] = now
+            inserts.append(row)
+
+    if updates:
+        table = Alert.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('_id'))
+            .values(
+                occurrence_count=table.c.occurrence_count + bindparam('_count'),
+                last_fired_at=bindparam('_last_fired_at'),
+                updated_at=bindparam('_updated_at')
+            ),
+            updates
+        )
+
+    created = set()
+    if inserts:
+        table = Alert.__table__
+        stmt = upsert_statement(table, [table.c.active_fingerprint], _merge_alert_occurrences)
+        for start in range(0, len(inserts), BULK_INSERT_CHUNK_SIZE):
+            db.session.execute(stmt, inserts[start:start + BULK_INSERT_CHUNK_SIZE])
+        created = {row['active_fingerprint'] for row in inserts}
+        existing.update(_find_active_alerts(created))
+
+    results = []
+    for row in rows:
+        fingerprint = row['active_fingerprint']
+        alert_id = existing.get(fingerprint, (None, None))[0]
+        if fingerprint in created:
+            created.discard(fingerprint)
+            results.append((alert_id, 'created'))
+        else:
+            results.append((alert_id, 'deduplicated'))
+    return results
+
+
+def count_ingested(upserted: List[Tuple[int, str]]):
+    """事务提交成功后按 upsert_alerts 的结果累计接入计数，回滚或重试的批次不会被重复计数"""
+    for result, count in Counter(result for _, result in upserted).items():
+        ALERTS_INGESTED.labels(result).inc(count)
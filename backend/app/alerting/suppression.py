@@ -0,0 +1,324 @@
+"""
+告警风暴抑制
+在告警入库前按来源和指纹限流，来源速率超过风暴阈值时改为抽样入库，
+被丢弃的告警只在内存中计数并定期汇总写入，同时维护一条风暴汇总告警
+"""
+from typing import Dict, List, Any, Optional, Tuple
+from collections import defaultdict
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models.alert import Alert, AlertSuppressionStat
+from app.utils.sql import upsert_statement
+from app.utils.metrics import ALERTS_INGESTED
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+LEVEL_RANK = {'Critical': 3, 'Warning': 2, 'Info': 1}
+
+
+class TokenBucket:
+    """令牌桶：rate为每秒补充的令牌数，capacity为允许的突发量"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def take(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _SourceState:
+    """单个告警来源的限流与风暴状态"""
+    __slots__ = ('bucket', 'window_start', 'window_count', 'storm_started_at',
+                 'storm_received', 'storm_suppressed', 'storm_level')
+
+    def __init__(self, bucket: TokenBucket, now: float):
+        self.bucket = bucket
+        self.window_start = now
+        self.window_count = 0
+        self.storm_started_at = None
+        self.storm_received = 0
+        self.storm_suppressed = 0
+        self.storm_level = 'Info'
+
+    @property
+    def in_storm(self) -> bool:
+        return self.storm_started_at is not None
+
+
+def storm_fingerprint(source: str) -> str:
+    """风暴汇总告警的指纹"""
+    return Alert.compute_fingerprint(alert_rule='alert_storm', metric_name=source or 'unknown')
+
+
+class AlertSuppressor:
+    """告警抑制器（进程内状态，计数由后台线程定期写入数据库）"""
+
+    def __init__(self):
+        self.enabled = True
+        self.source_rate = 200.0
+        self.source_burst = 1000.0
+        self.fingerprint_rate = 1.0
+        self.fingerprint_burst = 10.0
+        self.storm_threshold = 500
+        self.storm_window = 60.0
+        self.sample_rate = 10
+        self.flush_interval = 10.0
+
+        self._lock = threading.Lock()
+        self._sources: Dict[str, _SourceState] = {}
+        self._fingerprints: Dict[str, TokenBucket] = {}
+        self._pending: Dict[Tuple[str, str, Any], int] = defaultdict(int)
+        self._ended_storms = set()
+        self._flusher = None
+
+    def configure(self, config):
+        self.enabled = config['ALERT_SUPPRESSION_ENABLED']
+        self.source_rate = config['ALERT_SOURCE_RATE']
+        self.source_burst = config['ALERT_SOURCE_BURST']
+        self.fingerprint_rate = config['ALERT_FINGERPRINT_RATE']
+        self.fingerprint_burst = config['ALERT_FINGERPRINT_BURST']
+        self.storm_threshold = config['ALERT_STORM_THRESHOLD']
+        self.storm_window = config['ALERT_STORM_WINDOW']
+        self.sample_rate = max(1, config['ALERT_STORM_SAMPLE_RATE'])
+        self.flush_interval = config['ALERT_SUPPRESSION_FLUSH_INTERVAL']
+
+    def filter(self, rows: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """逐条判定告警是否被抑制，返回与rows一一对应的抑制原因（None表示放行）"""
+        if not self.enabled or not rows:
+            return [None] * len(rows)
+
+        self._ensure_flusher()
+        now = time.monotonic()
+        today = datetime.utcnow().date()
+
+        reasons = []
+        with self._lock:
+            for row in rows:
+                reason = self._check(row, now)
+                if reason:
+                    self._pending[(row['alert_source'] or '', row['level'], today)] += 1
+                reasons.append(reason)
+        return reasons
+
+    def _roll_window(self, source: str, state: _SourceState, now: float):
+        """固定窗口滚动；上一窗口速率回落到阈值以下时结束风暴"""
+        if now - state.window_start < self.storm_window:
+            return
+        if state.in_storm and state.window_count <= self.storm_threshold:
+            state.storm_started_at = None
+            self._ended_storms.add(source)
+        state.window_start = now
+        state.window_count = 0
+
+    def _check(self, row: Dict[str, Any], now: float) -> Optional[str]:
+        source = row['alert_source'] or ''
+        state = self._sources.get(source)
+        if state is None:
+            state = self._sources[source] = _SourceState(
+                TokenBucket(self.source_rate, self.source_burst, now), now
+            )
+
+        self._roll_window(source, state, now)
+        state.window_count += 1
+        if not state.in_storm and state.window_count > self.storm_threshold:
+            state.storm_started_at = datetime.utcnow()
+            state.storm_received = 0
+            state.storm_suppressed = 0
+            state.storm_level = 'Info'
+            self._ended_storms.discard(source)
+            logger.warning(f'Alert storm detected for source {source or "unknown"}')
+
+        reason = None
+        if state.in_storm:
+            state.storm_received += 1
+            if LEVEL_RANK.get(row['level'], 0) > LEVEL_RANK.get(state.storm_level, 0):
+                state.storm_level = row['level']
+            # 风暴期间每sample_rate条只保留第一条
+            if (state.storm_received - 1) % self.sample_rate:
+                reason = 'storm_sampled'
+
+        if reason is None and not state.bucket.take(now):
+            reason = 'source_rate_limited'
+
+        if reason is None:
+            fingerprint = row['fingerprint']
+            bucket = self._fingerprints.get(fingerprint)
+            if bucket is None:
+                bucket = self._fingerprints[fingerprint] = TokenBucket(
+                    self.fingerprint_rate, self.fingerprint_burst, now
+                )
+            if not bucket.take(now):
+                reason = 'fingerprint_rate_limited'
+
+        if reason and state.in_storm:
+            state.storm_suppressed += 1
+        return reason
+
+    def pending_counts(self) -> Dict[str, int]:
+        """尚未写入数据库的抑制计数（按来源汇总）"""
+        counts = defaultdict(int)
+        with self._lock:
+            for (source, _, _), count in self._pending.items():
+                counts[source] += count
+        return dict(counts)
+
+    def flush(self):
+        """将抑制计数和风暴汇总告警写入数据库（需要应用上下文）"""
+        now = time.monotonic()
+        with self._lock:
+            pending = self._pending
+            self._pending = defaultdict(int)
+            for source, state in self._sources.items():
+                self._roll_window(source, state, now)
+            storms = [
+                (source, state.storm_started_at, state.storm_received,
+                 state.storm_suppressed, state.storm_level)
+                for source, state in self._sources.items() if state.in_storm
+            ]
+            ended = self._ended_storms
+            self._ended_storms = set()
+            # 清理已回满且空闲的指纹令牌桶，避免内存无限增长
+            self._fingerprints = {
+                fingerprint: bucket for fingerprint, bucket in self._fingerprints.items()
+                if not bucket.is_full(now)
+            }
+
+        if not pending and not storms and not ended:
+            return
+
+        try:
+            if pending:
+                table = AlertSuppressionStat.__table__
+                stmt = upsert_statement(
+                    table,
+                    [table.c.alert_source, table.c.level, table.c.stat_date],
+                    lambda table, inserted: {
+                        'suppressed_count': table.c.suppressed_count + inserted.suppressed_count,
+                        'updated_at': inserted.updated_at
+                    }
+                )
+                db.session.execute(stmt, [
+                    {
+                        'alert_source': source,
+                        'level': level,
+                        'stat_date': stat_date,
+                        'suppressed_count': count,
+                        'updated_at': datetime.utcnow()
+                    }
+                    for (source, level, stat_date), count in pending.items()
+                ])
+
+            for storm in storms:
+                self._upsert_storm_alert(*storm)
+
+            for source in ended:
+                alert = Alert.query.filter_by(active_fingerprint=storm_fingerprint(source)).first()
+                if alert:
+                    alert.resolve()
+
+            db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f'Alert suppression flush error: {str(e)}')
+            # 写入失败时把计数放回，等待下次重试
+            with self._lock:
+                for key, count in pending.items():
+                    self._pending[key] += count
+                self._ended_storms.update(ended)
+
+    def _upsert_storm_alert(self, source, started_at, received, suppressed, level):
+        """创建或更新来源的风暴汇总告警"""
+        fingerprint = storm_fingerprint(source)
+        description = (
+            f'告警来源 {source or "unknown"} 自 {started_at.isoformat()} 起速率超过 '
+            f'{self.storm_threshold} 条/{int(self.storm_window)} 秒，已接收 {received} 条，'
+            f'抽样入库 {received - suppressed} 条，抑制 {suppressed} 条'
+        )
+        now = datetime.utcnow()
+
+        alert = Alert.query.filter_by(active_fingerprint=fingerprint).first()
+        if alert is None:
+            alert = Alert(
+                title=f'告警风暴: {source or "unknown"}',
+                alert_source=source or None,
+                alert_rule='alert_storm',
+                fingerprint=fingerprint,
+                active_fingerprint=fingerprint,
+                fired_at=started_at
+            )
+            db.session.add(alert)
+
+        alert.level = level
+        alert.description = description
+        alert.metric_name = 'suppressed_alerts'
+        alert.metric_value = str(suppressed)
+        alert.threshold = str(self.storm_threshold)
+        alert.last_fired_at = now
+        alert.updated_at = now
+
+    def _ensure_flusher(self):
+        """首次使用时在当前进程内启动后台写入线程（兼容gunicorn fork后的worker）"""
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        app = current_app._get_current_object()
+        self._flusher = threading.Thread(
+            target=self._run_flusher, args=(app,), name='alert-suppression-flusher', daemon=True
+        )
+        self._flusher.start()
+
+    def _run_flusher(self, app):
+        while True:
+            time.sleep(self.flush_interval)
+            with app.app_context():
+                try:
+                    self.flush()
+                finally:
+                    db.session.remove()
+
+
+alert_suppressor = AlertSuppressor()
+
+
+def init_alert_suppressor(app):
+    """根据应用配置初始化告警抑制器"""
+    alert_suppressor.configure(app.config)
+    return alert_suppressor
+
+
+def apply_suppression(rows: List[Tuple[int, Dict[str, Any]]]) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    对已校验的告警执行抑制判定
+    返回 (放行的行[(下标, 列字典)], 被抑制条目的结果列表)
+    """
+    reasons = alert_suppressor.filter([row for _, row in rows])
+    passed = []
+    suppressed = []
+    for (index, row), reason in zip(rows, reasons):
+        if reason:
+            suppressed.append({'index': index, 'status': 'suppressed', 'reason': reason})
+        else:
+            passed.append((index, row))
+    if suppressed:
+        ALERTS_INGESTED.labels('suppressed').inc(len(suppressed))
+    return passed, suppressed
@@ -0,0 +1,368 @@
+"""
+告警异步写入（write-behind）
+接入请求只把校验后的告警追加到本地spool文件并放入有界内存队列，立即返回临时ID；
+后台线程按批量大小或时间间隔批量写入数据库，进程崩溃后由spool文件恢复未写入的告警
+"""
+from typing import Dict, List, Any, Tuple
+from collections import deque
+from datetime import datetime
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from app import db
+from app.models.incident import Service
+from app.alerting.ingest import upsert_alerts, count_ingested, parse_fired_at
+from app.alerting.correlation import correlate_ingested
+from app.utils.metrics import ALERTS_INGESTED, QUEUE_DEPTH
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# spool中需要还原为datetime的字段
+DATETIME_FIELDS = ('fired_at', 'last_fired_at')
+
+
+class AlertQueueFullError(Exception):
+    """写入队列已满，调用方应稍后重试"""
+    pass
+
+
+def _is_transient_error(error: Exception) -> bool:
+    """连接中断、锁等待超时等数据库暂时不可用的错误，重试可能成功；数据过长、约束冲突等则不会"""
+    if isinstance(error, (OperationalError, InterfaceError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+def _encode_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+
+
+def _decode_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    for field in DATETIME_FIELDS:
+        if row.get(field):
+            row[field] = parse_fired_at(row[field])
+    return row
+
+
+class AlertSpool:
+    """
+    进程独占的追加写日志，记录入队的告警以及已写入数据库的确认
+    文件在进程存活期间持有flock排他锁，未被锁定的spool文件即为崩溃进程遗留，可被接管回放
+    """
+
+    def __init__(self, directory: str, fsync: bool = False):
+        self.directory = directory
+        self.fsync = fsync
+        self.path = None
+        self._file = None
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f'alerts-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl')
+        self._file = open(self.path, 'a+', encoding='utf-8')
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def append(self, records: List[Dict[str, Any]]):
+        self._file.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def truncate(self):
+        """队列中的告警全部写入后清空spool"""
+        self._file.seek(0)
+        self._file.truncate()
+
+    def rewrite(self, records: List[Dict[str, Any]]):
+        """
+        只保留尚未写入的条目重写spool，丢弃已确认的条目和确认记录
+        先写入并锁定临时文件再原子替换，期间崩溃时原文件仍完整
+        """
+        tmp_path = self.path + '.tmp'
+        new_file = open(tmp_path, 'w+', encoding='utf-8')
+        fcntl.flock(new_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        new_file.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+        new_file.flush()
+        if self.fsync:
+            os.fsync(new_file.fileno())
+        os.replace(tmp_path, self.path)
+        self._file.close()
+        self._file = new_file
+
+    def recover_orphans(self) -> List[Dict[str, Any]]:
+        """
+        接管其他已退出进程遗留的spool文件，返回其中尚未确认写入的条目
+        条目先追加到本进程的spool再删除原文件，恢复过程中再次崩溃也不会丢失
+        """
+        pending = []
+        for path in sorted(glob.glob(os.path.join(self.directory, 'alerts-*.jsonl'))):
+            if path == self.path:
+                continue
+            try:
+                with open(path, 'r+', encoding='utf-8') as orphan:
+                    try:
+                        fcntl.flock(orphan.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        # 仍被存活进程持有
+                        continue
+
+                    entries = {}
+                    for line in orphan:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # 崩溃时写了一半的最后一行
+                            continue
+                        if 'ack' in record:
+                            for provisional_id in record['ack']:
+                                entries.pop(provisional_id, None)
+                        else:
+                            entries[record['id']] = record
+                    self.append(list(entries.values()))
+                    pending.extend(entries.values())
+                os.remove(path)
+            except OSError as e:
+                logger.error(f'Alert spool recovery error for {path}: {str(e)}')
+        return pending
+
+
+class AlertWriteBehindQueue:
+    """有界告警写入队列与后台批量写入线程"""
+
+    def __init__(self):
+        self.enabled = False
+        self.max_size = 10000
+        self.batch_size = 500
+        self.flush_interval = 0.2
+        self.spool_dir = 'spool'
+        self.spool_fsync = False
+        self.spool_compact_threshold = 10000
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._in_flight = 0
+        self._spool = None
+        self._acked = 0
+        self._writer = None
+        self._pid = None
+        self._app = None
+        self._stopping = False
+
+    def configure(self, app):
+        config = app.config
+        self.enabled = config['ALERT_INGEST_MODE'] == 'async'
+        self.max_size = config['ALERT_QUEUE_MAX_SIZE']
+        self.batch_size = config['ALERT_QUEUE_BATCH_SIZE']
+        self.flush_interval = config['ALERT_QUEUE_FLUSH_INTERVAL']
+        self.spool_dir = config['ALERT_SPOOL_DIR']
+        self.spool_fsync = config['ALERT_SPOOL_FSYNC']
+        self.spool_compact_threshold = config['ALERT_SPOOL_COMPACT_THRESHOLD']
+        self._app = app
+
+    def qsize(self) -> int:
+        return len(self._queue) + self._in_flight
+
+    def enqueue(self, rows: List[Dict[str, Any]], user_id: int) -> List[str]:
+        """
+        追加一批已校验的告警，返回与rows一一对应的临时ID
+        队列容量不足以容纳整批时抛出AlertQueueFullError，整批都不会入队
+        """
+        self.ensure_started()
+        records = [
+            {'id': uuid.uuid4().hex, 'user_id': user_id, 'row': _encode_row(row)}
+            for row in rows
+        ]
+
+        with self._cond:
+            if self.qsize() + len(records) > self.max_size:
+                raise AlertQueueFullError()
+            self._spool.append(records)
+            self._queue.extend(records)
+            QUEUE_DEPTH.labels('alert_writer').set(self.qsize())
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+
+        return [record['id'] for record in records]
+
+    def ensure_started(self):
+        """在当前进程内启动写入线程（gunicorn fork后的worker各自启动），并回放遗留的spool"""
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._queue = deque()
+            self._in_flight = 0
+            self._acked = 0
+            self._spool = AlertSpool(self.spool_dir, self.spool_fsync)
+            self._spool.open()
+
+            recovered = self._spool.recover_orphans()
+            if recovered:
+                logger.warning(f'Recovered {len(recovered)} queued alerts from spool')
+                self._queue.extend(recovered)
+
+            self._writer = threading.Thread(target=self._run, name='alert-writer', daemon=True)
+            self._writer.start()
+            self._pid = os.getpid()
+
+    def stop(self, timeout: float = 5.0):
+        """进程退出前尽量写完队列中的告警，未写完的留在spool中下次启动恢复"""
+        if self._pid != os.getpid():
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._writer.join(timeout)
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._queue) < self.batch_size and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            self._in_flight = len(batch)
+            return batch
+
+    def _run(self):
+        backoff = self.flush_interval
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                if self._stopping:
+                    return
+                continue
+
+            with self._app.app_context():
+                try:
+                    remaining = self._flush(batch)
+                finally:
+                    db.session.remove()
+
+            # 按顺序写入，未写入的告警总是批次的末尾部分
+            done = batch[:len(batch) - len(remaining)]
+            with self._cond:
+                if remaining:
+                    # 数据库不可用时保留未写入的告警重试，spool中的记录保证进程退出也不会丢失
+                    self._queue.extendleft(reversed(remaining))
+                self._in_flight = 0
+                QUEUE_DEPTH.labels('alert_writer').set(self.qsize())
+                self._ack(done)
+
+            if remaining:
+                if self._stopping:
+                    return
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            else:
+                backoff = self.flush_interval
+
+    def _ack(self, done: List[Dict[str, Any]]):
+        """
+        记录已写入的告警（调用方持有锁，此时没有写入中的批次）：队列为空时清空spool；
+        否则追加确认记录，累计确认条数超过阈值后用队列中的条目重写spool，
+        避免持续有积压时spool无限增长、崩溃恢复需要回放整个文件
+        """
+        if not self._queue:
+            self._spool.truncate()
+            self._acked = 0
+            return
+        if not done:
+            return
+        self._acked += len(done)
+        if self._acked >= self.spool_compact_threshold:
+            self._spool.rewrite(list(self._queue))
+            self._acked = 0
+        else:
+            self._spool.append([{'ack': [record['id'] for record in done]}])
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        写入一批告警，返回因数据库暂时不可用而未写入的告警（保持原顺序）
+        遇到非瞬时错误时二分批次，其余告警照常写入，单独仍无法写入的告警记录日志后丢弃，
+        避免一条始终被数据库拒绝的告警阻塞整个队列
+        """
+        parts = [batch]
+        while parts:
+            part = parts.pop()
+            try:
+                self._write(part)
+            except Exception as e:
+                db.session.rollback()
+                if _is_transient_error(e):
+                    logger.error(f'Alert write-behind flush error: {str(e)}')
+                    return [record for chunk in [part] + parts[::-1] for record in chunk]
+                if len(part) > 1:
+                    middle = len(part) // 2
+                    # 先写前半部分，保持写入顺序
+                    parts.extend([part[middle:], part[:middle]])
+                    continue
+                record = part[0]
+                ALERTS_INGESTED.labels('rejected').inc()
+                logger.error(
+                    f'Queued alert {record["id"]} rejected by database and dropped: {str(e)}; '
+                    f'record: {json.dumps(record, ensure_ascii=False)}'
+                )
+        return []
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        rows_by_user: Dict[Any, List[Dict[str, Any]]] = {}
+        for record in batch:
+            rows_by_user.setdefault(record['user_id'], []).append(_decode_row(dict(record['row'])))
+
+        # 请求路径不访问数据库，服务存在性在写入前按批次统一校验
+        service_ids = {
+            row['service_id'] for rows in rows_by_user.values() for row in rows
+            if row['service_id'] is not None
+        }
+        if service_ids:
+            existing_ids = {
+                service_id for (service_id,) in
+                db.session.query(Service.id).filter(Service.id.in_(service_ids))
+            }
+            for user_id, rows in rows_by_user.items():
+                dropped = [row for row in rows if row['service_id'] is not None and row['service_id'] not in existing_ids]
+                for row in dropped:
+                    logger.error(f'Queued alert dropped, service {row["service_id"]} not found: {row["title"]}')
+                    rows.remove(row)
+
+        upserted_all = []
+        for user_id, rows in rows_by_user.items():
+            upserted = upsert_alerts(rows)
+            correlate_ingested(rows, upserted, user_id)
+            upserted_all.extend(upserted)
+        db.session.commit()
+        # 提交成功后才计数，出错重试或二分重写的批次不会重复计数
+        count_ingested(upserted_all)
+
+
+alert_writer = AlertWriteBehindQueue()
+
+
+def init_alert_writer(app):
+    """根据应用配置初始化异步写入队列（仅在ALERT_INGEST_MODE=async时生效）"""
+    alert_writer.configure(app)
+    if alert_writer.enabled:
+        atexit.register(alert_writer.stop)
+    return alert_writer
+
+
+def enqueue_alerts(rows: List[Tuple[int, Dict[str, Any]]], user_id: int) -> List[Dict[str, Any]]:
+    """将已校验的告警放入写入队列，返回每条的排队结果"""
+    provisional_ids = alert_writer.enqueue([row for _, row in rows], user_id)
+    ALERTS_INGESTED.labels('queued').inc(len(provisional_ids))
+    return [
+        {'index': index, 'status': 'queued', 'provisional_id': provisional_id, 'fingerprint': row['fingerprint']}
+        for (index, row), provisional_id in zip(rows, provisional_ids)
+    ]
@@ -4,4 +4,4 @@ from flask import Blueprint
 api_v1 = Blueprint('api_v1', __name__)
 
 # 导入所有API路由
-from . import incidents, problems, users, services, dashboard, approvals, notifications, alerts, incidents_new, postmortems
\ No newline at end of file
+from . import incidents, problems, users, services, dashboard, approvals, notifications, alerts, alertmanager, incidents_new, postmortems, system
\ No newline at end of file
@@ -0,0 +1,59 @@
+from flask import request, jsonify, current_app
+from flask_jwt_extended import get_jwt_identity
+from app.api import api_v1
+from app import db
+from app.alerting.ingest import upsert_alerts, count_ingested
+from app.alerting.alertmanager import split_alertmanager_payload, resolve_alerts_by_fingerprint
+from app.alerting.correlation import correlate_ingested
+from app.alerting.suppression import apply_suppression
+from app.utils.auth import permission_required
+import logging
+
+logger = logging.getLogger(__name__)
+
+@api_v1.route('/alerts/alertmanager', methods=['POST'])
+@permission_required('alert:write')
+def receive_alertmanager_webhook():
+    """接收Prometheus Alertmanager webhook（分组告警一次事务写入）"""
+    payload = request.get_json(silent=True)
+
+    if not isinstance(payload, dict) or not isinstance(payload.get('alerts'), list):
+        return jsonify({'error': 'Invalid Alertmanager payload'}), 400
+
+    try:
+        firing, resolved, results = split_alertmanager_payload(
+            payload, current_app.config['ALERTMANAGER_SERVICE_LABELS']
+        )
+        firing, suppressed = apply_suppression(firing)
+        results.extend(suppressed)
+
+        resolved_count = resolve_alerts_by_fingerprint(resolved)
+        firing_rows = [row for _, row in firing]
+        upserted = upsert_alerts(firing_rows)
+        correlation = correlate_ingested(firing_rows, upserted, get_jwt_identity())
+        db.session.commit()
+        count_ingested(upserted)
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'Alertmanager webhook error: {str(e)}')
+        return jsonify({'error': 'Alertmanager webhook processing failed'}), 500
+
+    linked = correlation['linked']
+    for (index, _), (alert_id, status) in zip(firing, upserted):
+        item = {'index': index, 'status': status, 'id': alert_id}
+        if alert_id in linked:
+            item['incident_id'] = linked[alert_id]
+        results.append(item)
+    results.sort(key=lambda item: item['index'])
+
+    return jsonify({
+        'message': 'Alertmanager webhook processed',
+        'group_key': payload.get('groupKey'),
+        'firing': len(firing),
+        'suppressed': len(suppressed),
+        'resolved': resolved_count,
+        'linked': len(linked),
+        'results': results,
+        'incident_proposals': correlation['proposals']
+    }), 200
@@ -1,16 +1,28 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from app.api import api_v1
 from app import db
-from app.models.alert import Alert, AlertComment
+from app.models.alert import Alert, AlertComment, AlertSuppressionStat
 from app.models.user import User
 from app.models.incident import Service
+from flask_jwt_extended import get_jwt_identity
 from app.utils.auth import permission_required, get_current_user
+from app.utils.instrumentation import query_budget
+from app.utils.pagination import is_cursor_request, paginate_by_cursor, InvalidCursorError
+from app.utils.serialization import get_profile, apply_profile, InvalidProfileError
+from app.alerting.ingest import (
+    AlertValidationError, build_alert_row, read_alert_batch,
+    validate_alert_batch, upsert_alerts, count_ingested
+)
+from app.alerting.correlation import correlation_engine, correlate_ingested
+from app.alerting.suppression import alert_suppressor, apply_suppression
+from app.alerting.writer import alert_writer, enqueue_alerts, AlertQueueFullError
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
 @api_v1.route('/alerts', methods=['GET'])
+@query_budget(max_queries=15)
 @permission_required('alert:read')
 def get_alerts():
     """获取告警列表"""
@@ -23,10 +35,16 @@ def get_alerts():
     service_id_filter = request.args.get('service_id', type=int)
     source_filter = request.args.get('source')
     environment_filter = request.args.get('environment')
+    fingerprint_filter = request.args.get('fingerprint')
     unlinked_only = request.args.get('unlinked', type=bool)
     
-    # 构建查询
-    query = Alert.query
+    try:
+        profile = get_profile(request.args)
+    except InvalidProfileError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # 构建查询，按序列化配置预加载关联
+    query = apply_profile(Alert.query, Alert, profile)
     
     # 应用筛选条件
     if status_filter:
@@ -44,16 +62,36 @@ def get_alerts():
     if environment_filter:
         query = query.filter(Alert.environment == environment_filter)
     
+    if fingerprint_filter:
+        query = query.filter(Alert.fingerprint == fingerprint_filter)
+    
     if unlinked_only:
         query = query.filter(Alert.incident_id.is_(None))
     
+    # 游标分页：按 (fired_at, id) 翻页，不执行COUNT和OFFSET
+    if is_cursor_request(request.args):
+        try:
+            page_data = paginate_by_cursor(query, Alert.fired_at, Alert.id, request.args)
+        except InvalidCursorError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        result = {
+            'alerts': [alert.to_dict(profile) for alert in page_data['items']],
+            'next_cursor': page_data['next_cursor'],
+            'has_more': page_data['has_more'],
+            'per_page': page_data['per_page']
+        }
+        if page_data['total'] is not None:
+            result['total'] = page_data['total']
+        return jsonify(result), 200
+    
     # 排序和分页
     pagination = query.order_by(Alert.fired_at.desc()).paginate(
         page=page, per_page=per_page, error_out=False
     )
     
     return jsonify({
-        'alerts': [alert.to_dict() for alert in pagination.items],
+        'alerts': [alert.to_dict(profile) for alert in pagination.items],
         'total': pagination.total,
         'page': page,
         'per_page': per_page,
@@ -76,42 +114,66 @@ def get_alert(alert_id):
     
     return jsonify({'alert': result}), 200
 
+def _queue_full_response():
+    """写入队列已满时的背压响应"""
+    response = jsonify({'error': 'Alert queue is full, retry later'})
+    response.headers['Retry-After'] = str(current_app.config['ALERT_QUEUE_RETRY_AFTER'])
+    return response, 503
+
 @api_v1.route('/alerts', methods=['POST'])
 @permission_required('alert:write')
 def create_alert():
     """创建告警（通常由监控系统调用）"""
     data = request.get_json()
     
-    required_fields = ['title', 'level', 'fired_at']
-    for field in required_fields:
-        if not data.get(field):
-            return jsonify({'error': f'{field} is required'}), 400
-    
     try:
-        # 解析fired_at时间
-        fired_at = datetime.fromisoformat(data['fired_at'].replace('Z', '+00:00'))
-        
-        alert = Alert(
-            title=data['title'],
-            description=data.get('description'),
-            alert_source=data.get('alert_source'),
-            alert_rule=data.get('alert_rule'),
-            level=data['level'],
-            metric_name=data.get('metric_name'),
-            metric_value=data.get('metric_value'),
-            threshold=data.get('threshold'),
-            service_id=data.get('service_id'),
-            host=data.get('host'),
-            environment=data.get('environment'),
-            fired_at=fired_at
-        )
+        row = build_alert_row(data)
+    except AlertValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # 超出来源/指纹限流或处于告警风暴抽样时只计数不入库
+    _, suppressed = apply_suppression([(0, row)])
+    if suppressed:
+        return jsonify({
+            'message': 'Alert suppressed',
+            'reason': suppressed[0]['reason']
+        }), 202
+    
+    # 异步模式下入队即返回，由后台线程批量写入
+    if alert_writer.enabled:
+        try:
+            queued = enqueue_alerts([(0, row)], get_jwt_identity())[0]
+        except AlertQueueFullError:
+            return _queue_full_response()
+        except Exception as e:
+            logger.error(f'Alert enqueue error: {str(e)}')
+            return jsonify({'error': 'Alert creation failed'}), 500
         
-        db.session.add(alert)
+        return jsonify({
+            'message': 'Alert accepted',
+            'provisional_id': queued['provisional_id'],
+            'fingerprint': queued['fingerprint']
+        }), 202
+    
+    try:
+        # 相同指纹的活跃告警只累加触发次数，不再新建记录
+        upserted = upsert_alerts([row])
+        correlation = correlate_ingested([row], upserted, get_jwt_identity())
         db.session.commit()
+        count_ingested(upserted)
+        
+        alert_id, result = upserted[0]
+        alert = Alert.query.get(alert_id)
+        if result == 'deduplicated':
+            return jsonify({
+                'message': 'Alert deduplicated',
+                'alert': alert.to_dict()
+            }), 200
         
         return jsonify({
             'message': 'Alert created successfully',
-            'alert': alert.to_dict()
+            'alert': alert.to_dict(),
+            'incident_proposals': correlation['proposals']
         }), 201
         
     except Exception as e:
@@ -119,6 +181,73 @@ def create_alert():
         logger.error(f'Alert creation error: {str(e)}')
         return jsonify({'error': 'Alert creation failed'}), 500
 
+@api_v1.route('/alerts/bulk', methods=['POST'])
+@permission_required('alert:write')
+def bulk_create_alerts():
+    """批量创建告警（支持JSON数组或NDJSON，用于监控系统告警风暴场景）"""
+    try:
+        items = read_alert_batch(request)
+    except AlertValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not items:
+        return jsonify({'error': 'alerts is required'}), 400
+    
+    max_items = current_app.config['ALERT_BULK_MAX_ITEMS']
+    if len(items) > max_items:
+        return jsonify({'error': f'Too many alerts in one request (max {max_items})'}), 413
+    
+    rows, results = validate_alert_batch(items)
+    rows, suppressed = apply_suppression(rows)
+    results.extend(suppressed)
+    
+    if alert_writer.enabled:
+        try:
+            results.extend(enqueue_alerts(rows, get_jwt_identity()))
+        except AlertQueueFullError:
+            return _queue_full_response()
+        except Exception as e:
+            logger.error(f'Bulk alert enqueue error: {str(e)}')
+            return jsonify({'error': 'Bulk alert creation failed'}), 500
+        results.sort(key=lambda item: item['index'])
+        
+        return jsonify({
+            'message': 'Bulk alert ingestion accepted',
+            'accepted': len(rows),
+            'suppressed': len(suppressed),
+            'rejected': len(items) - len(rows) - len(suppressed),
+            'results': results
+        }), 202
+    
+    try:
+        valid_rows = [row for _, row in rows]
+        upserted = upsert_alerts(valid_rows)
+        correlation = correlate_ingested(valid_rows, upserted, get_jwt_identity())
+        db.session.commit()
+        count_ingested(upserted)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'Bulk alert creation error: {str(e)}')
+        return jsonify({'error': 'Bulk alert creation failed'}), 500
+    
+    linked = correlation['linked']
+    for (index, _), (alert_id, status) in zip(rows, upserted):
+        item = {'index': index, 'status': status, 'id': alert_id}
+        if alert_id in linked:
+            item['incident_id'] = linked[alert_id]
+        results.append(item)
+    results.sort(key=lambda item: item['index'])
+    
+    return jsonify({
+        'message': 'Bulk alert ingestion completed',
+        'accepted': len(rows),
+        'suppressed': len(suppressed),
+        'rejected': len(items) - len(rows) - len(suppressed),
+        'linked': len(linked),
+        'results': results,
+        'incident_proposals': correlation['proposals']
+    }), 200
+
 @api_v1.route('/alerts/<int:alert_id>/acknowledge', methods=['PUT'])
 @permission_required('alert:write')
 def acknowledge_alert(alert_id):
@@ -206,6 +335,7 @@ def link_alert_to_incident(alert_id):
     try:
         alert.link_to_incident(incident_id)
         db.session.commit()
+        correlation_engine.invalidate()
         
         return jsonify({
             'message': 'Alert linked to incident successfully',
@@ -330,6 +460,20 @@ def get_alert_statistics():
             Alert.alert_source, db.func.count(Alert.id)
         ).group_by(Alert.alert_source).all()
         
+        # 去重后累计触发次数
+        total_occurrences = db.session.query(
+            db.func.coalesce(db.func.sum(Alert.occurrence_count), 0)
+        ).scalar()
+        
+        # 被抑制的告警（已写入的汇总计数加上内存中尚未写入的部分）
+        suppressed_stats = dict(db.session.query(
+            AlertSuppressionStat.alert_source, db.func.sum(AlertSuppressionStat.suppressed_count)
+        ).group_by(AlertSuppressionStat.alert_source).all())
+        for source, count in alert_suppressor.pending_counts().items():
+            suppressed_stats[source] = suppressed_stats.get(source, 0) + count
+        suppressed_stats = {source or 'unknown': int(count) for source, count in suppressed_stats.items()}
+        total_suppressed = sum(suppressed_stats.values())
+        
         # 今日新增告警
         today = datetime.now().date()
         today_alerts = Alert.query.filter(
@@ -340,7 +484,10 @@ def get_alert_statistics():
             'status_distribution': dict(status_stats),
             'level_distribution': dict(level_stats),
             'source_distribution': dict(source_stats),
-            'today_alerts': today_alerts
+            'today_alerts': today_alerts,
+            'total_occurrences': int(total_occurrences) + total_suppressed,
+            'suppressed_total': total_suppressed,
+            'suppressed_distribution': suppressed_stats
         }), 200
         
     except Exception as e:
@@ -3,6 +3,7 @@ from app.api import api_v1
 from app import db
 from app.models import ApprovalWorkflow, ApprovalStep, User, Role, Group
 from app.utils.auth import permission_required, get_current_user
+from app.utils.serialization import get_profile, apply_profile, InvalidProfileError
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,10 +13,13 @@ logger = logging.getLogger(__name__)
 def get_approval_workflows():
     """获取审批流程列表"""
     try:
-        workflows = ApprovalWorkflow.query.all()
+        profile = get_profile(request.args)
+        workflows = apply_profile(ApprovalWorkflow.query, ApprovalWorkflow, profile).all()
         return jsonify({
-            'workflows': [workflow.to_dict() for workflow in workflows]
+            'workflows': [workflow.to_dict(profile) for workflow in workflows]
         }), 200
+    except InvalidProfileError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"获取审批流程列表失败: {str(e)}")
         return jsonify({'error': '获取审批流程列表失败'}), 500
@@ -3,18 +3,26 @@ from app.api import api_v1
 from app import db
 from app.models import Approval, ApprovalWorkflow, ApprovalStep
 from app.utils.auth import permission_required, get_current_user
+from app.utils.instrumentation import query_budget
+from app.utils.serialization import get_profile, apply_profile, InvalidProfileError
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
 @api_v1.route('/approvals', methods=['GET'])
+@query_budget(max_queries=15)
 @permission_required('problem:read')
 def get_approvals():
     """获取审批列表"""
-    approvals = Approval.query.order_by(Approval.created_at.desc()).all()
+    try:
+        profile = get_profile(request.args)
+    except InvalidProfileError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    approvals = apply_profile(Approval.query, Approval, profile).order_by(Approval.created_at.desc()).all()
     return jsonify({
-        'approvals': [approval.to_dict() for approval in approvals]
+        'approvals': [approval.to_dict(profile) for approval in approvals]
     }), 200
 
 @api_v1.route('/approvals/<int:approval_id>', methods=['GET'])
@@ -118,18 +126,23 @@ def get_my_pending_approvals():
     """获取当前用户的待审批列表"""
     current_user = get_current_user()
     
+    try:
+        profile = get_profile(request.args)
+    except InvalidProfileError as e:
+        return jsonify({'error': str(e)}), 400
+    
     # 查找当前用户作为审批人的待审批项目
     pending_approvals = []
     
-    # 获取所有待审批的项目
-    all_pending = Approval.query.filter(Approval.status == 'PENDING').all()
+    # 获取所有待审批的项目（预加载流程步骤和审批人，逐条判断时不再额外查询）
+    all_pending = apply_profile(Approval.query, Approval, profile).filter(Approval.status == 'PENDING').all()
     
     for approval in all_pending:
         if approval.is_user_current_approver(current_user):
             pending_approvals.append(approval)
     
     return jsonify({
-        'pending_approvals': [approval.to_dict() for approval in pending_approvals]
+        'pending_approvals': [approval.to_dict(profile) for approval in pending_approvals]
     }), 200
 
 @api_v1.route('/approvals/workflows', methods=['GET'])
@@ -137,7 +150,7 @@ def get_my_pending_approvals():
 def get_approvals_workflows():
     """获取审批流程列表（兼容前端路由）"""
     try:
-        workflows = ApprovalWorkflow.query.filter(
+        workflows = apply_profile(ApprovalWorkflow.query, ApprovalWorkflow, 'detail').filter(
             ApprovalWorkflow.is_active == True
         ).all()
         
@@ -152,7 +165,7 @@ def get_approvals_workflows():
 @permission_required('approval:admin')
 def get_approval_workflows():
     """获取审批流程列表"""
-    workflows = ApprovalWorkflow.query.filter(
+    workflows = apply_profile(ApprovalWorkflow.query, ApprovalWorkflow, 'detail').filter(
         ApprovalWorkflow.is_active == True
     ).all()
     
@@ -2,7 +2,13 @@ from flask import request, jsonify
 from app.api import api_v1
 from app import db
 from app.models import Incident, IncidentComment, IncidentStatusLog, Service, User
+from app.notification.triggers import (
+    handle_incident_created, handle_incident_assigned, handle_incident_status_changed
+)
 from app.utils.auth import permission_required, get_current_user
+from app.utils.instrumentation import query_budget
+from app.utils.pagination import is_cursor_request, paginate_by_cursor, InvalidCursorError
+from app.utils.serialization import get_profile, apply_profile, InvalidProfileError
 from datetime import datetime
 import logging
 
@@ -23,6 +29,7 @@ def get_assignable_users():
         return jsonify({'error': '获取用户列表失败'}), 500
 
 @api_v1.route('/incidents', methods=['GET'])
+@query_budget(max_queries=15)
 @permission_required('incident:read')
 def get_incidents():
     """获取事件列表"""
@@ -32,21 +39,43 @@ def get_incidents():
         status = request.args.get('status')
         service_id = request.args.get('service_id', type=int)
         
-        # 构建查询
-        query = Incident.query
+        try:
+            profile = get_profile(request.args)
+        except InvalidProfileError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # 构建查询，按序列化配置预加载关联
+        query = apply_profile(Incident.query, Incident, profile)
         
         if status:
             query = query.filter(Incident.status == status)
         if service_id:
             query = query.filter(Incident.service_id == service_id)
         
+        # 游标分页：按 (created_at, id) 翻页，不执行COUNT和OFFSET
+        if is_cursor_request(request.args):
+            try:
+                page_data = paginate_by_cursor(query, Incident.created_at, Incident.id, request.args)
+            except InvalidCursorError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            return jsonify({
+                'incidents': [incident.to_dict(profile) for incident in page_data['items']],
+                'pagination': {
+                    'per_page': page_data['per_page'],
+                    'next_cursor': page_data['next_cursor'],
+                    'has_more': page_data['has_more'],
+                    'total': page_data['total']
+                }
+            })
+        
         # 分页
         pagination = query.order_by(Incident.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
         
         return jsonify({
-            'incidents': [incident.to_dict() for incident in pagination.items],
+            'incidents': [incident.to_dict(profile) for incident in pagination.items],
             'pagination': {
                 'page': page,
                 'per_page': per_page,
@@ -137,6 +166,9 @@ def create_incident():
         db.session.add(incident)
         db.session.commit()
         
+        # 按通知规则发送创建通知，P0级事件同时写入升级步骤
+        handle_incident_created(incident)
+        
         return jsonify(incident.to_dict()), 201
         
     except Exception as e:
@@ -153,8 +185,9 @@ def update_incident(incident_id):
     current_user = get_current_user()
     
     try:
-        # 记录状态变更
+        # 记录状态和分配人变更
         old_status = incident.status
+        old_assignee_id = incident.assignee_id
         
         # 更新基本字段
         allowed_fields = ['title', 'description', 'impact', 'urgency', 'service_id']
@@ -209,7 +242,6 @@ def update_incident(incident_id):
             if not can_assign_incident(current_user, incident):
                 return jsonify({'error': 'Permission denied to assign incident'}), 403
             
-            old_assignee_id = incident.assignee_id
             new_assignee_id = data['assignee_id']
             
             if old_assignee_id != new_assignee_id:
@@ -237,7 +269,10 @@ def update_incident(incident_id):
         
         logger.info(f'Incident updated: {incident.id} by {current_user.username}')
         
-        # TODO: 触发通知（如果状态或分配人有变化）
+        if incident.status != old_status:
+            handle_incident_status_changed(incident, old_status)
+        if incident.assignee_id != old_assignee_id:
+            handle_incident_assigned(incident, old_assignee_id)
         
         return jsonify({
             'message': 'Incident updated successfully',
@@ -339,7 +374,10 @@ def assign_incident(incident_id):
         
         logger.info(f'Incident {incident_id} assigned to {assignee_id} by {current_user.username}')
         
-        # TODO: 通知新的分配人
+        if incident.status != old_status:
+            handle_incident_status_changed(incident, old_status)
+        if incident.assignee_id != old_assignee_id:
+            handle_incident_assigned(incident, old_assignee_id)
         
         return jsonify({
             'message': 'Incident assigned successfully',
@@ -411,6 +449,7 @@ def close_incident(incident_id):
         db.session.commit()
         
         logger.info(f'Incident {incident_id} closed by {current_user.username}')
+        handle_incident_status_changed(incident, old_status)
         
         return jsonify({
             'message': 'Incident closed successfully',
@@ -468,6 +507,7 @@ def reopen_incident(incident_id):
         db.session.commit()
         
         logger.info(f'Incident {incident_id} reopened by {current_user.username}')
+        handle_incident_status_changed(incident, old_status)
         
         return jsonify({
             'message': 'Incident reopened successfully',
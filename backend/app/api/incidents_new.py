@@ -1,101 +1,167 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from app.api import api_v1
 from app import db
-from app.models.incident_new import NewIncident
+from app.models.incident_new import NewIncident, IncidentTimeline, incident_statistics_cache
+from app.models.alert import Alert
 from app.models.incident import Service
 from app.models.user import User
 from app.utils.auth import permission_required, get_current_user
-from datetime import datetime
+from app.utils.instrumentation import query_budget
+from app.utils.pagination import is_cursor_request, paginate_by_cursor, InvalidCursorError
+from app.alerting.correlation import correlation_engine
+from app.notification.triggers import handle_new_incident_created, handle_new_incident_status_changed
+from app.alerting.ingest import parse_fired_at
+from sqlalchemy import and_
+from sqlalchemy.orm import joinedload
+from datetime import datetime, date, time, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
 @api_v1.route('/incidents-new', methods=['GET'])
+@query_budget(max_queries=15)
 @permission_required('incident:read')
 def get_new_incidents():
-    """获取新事件列表"""
+    """获取新事件列表（分页，返回精简字典，详情请使用单个故障接口）"""
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    
+    # 筛选参数：status、severity 支持逗号分隔的多个值，时间范围按创建时间筛选
+    status_filter = request.args.get('status')
+    severity_filter = request.args.get('severity')
+    
     try:
-        logger.info("开始查询故障列表")
+        start_time = _parse_time_arg('start_time')
+        end_time = _parse_time_arg('end_time')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        query = NewIncident.query.options(
+            joinedload(NewIncident.commander),
+            joinedload(NewIncident.assignee),
+            joinedload(NewIncident.reporter)
+        )
+        
+        if status_filter:
+            query = query.filter(NewIncident.status.in_(status_filter.split(',')))
         
-        # 暂时不使用分页，直接返回所有故障
-        incidents = NewIncident.query.order_by(NewIncident.created_at.desc()).all()
-        logger.info(f"查询到 {len(incidents)} 个故障")
+        if severity_filter:
+            query = query.filter(NewIncident.severity.in_(severity_filter.split(',')))
         
-        # 转换为字典
-        incidents_dict = []
-        for incident in incidents:
+        if start_time:
+            query = query.filter(NewIncident.created_at >= start_time)
+        
+        if end_time:
+            query = query.filter(NewIncident.created_at < end_time)
+        
+        if is_cursor_request(request.args):
             try:
-                incident_dict = incident.to_dict()
-                incidents_dict.append(incident_dict)
-                logger.info(f"故障 {incident.id} 转换成功")
-            except Exception as e:
-                logger.error(f"故障 {incident.id} 转换失败: {e}")
-                continue
-        
-        logger.info("故障列表查询成功")
+                page_data = paginate_by_cursor(query, NewIncident.created_at, NewIncident.id, request.args)
+            except InvalidCursorError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            return jsonify({
+                'incidents': _summarize_incidents(page_data['items']),
+                'pagination': {
+                    'per_page': page_data['per_page'],
+                    'next_cursor': page_data['next_cursor'],
+                    'has_more': page_data['has_more'],
+                    'total': page_data['total']
+                }
+            })
+        
+        pagination = query.order_by(NewIncident.created_at.desc(), NewIncident.id.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+        
         return jsonify({
-            'incidents': incidents_dict,
+            'incidents': _summarize_incidents(pagination.items),
             'pagination': {
-                'page': 1,
-                'per_page': len(incidents_dict),
-                'total': len(incidents_dict),
-                'pages': 1
+                'page': page,
+                'per_page': per_page,
+                'total': pagination.total,
+                'pages': pagination.pages
             }
         })
     except Exception as e:
         logger.error(f"获取新事件列表失败: {e}")
-        import traceback
-        logger.error(f"详细错误信息: {traceback.format_exc()}")
         return jsonify({'error': '获取事件列表失败'}), 500
 
+def _parse_time_arg(name):
+    """解析ISO格式的时间参数"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return parse_fired_at(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name}')
+
+def _summarize_incidents(incidents):
+    """批量统计当前页故障的告警数和时间线条目数，转换为精简字典"""
+    ids = [incident.id for incident in incidents]
+    alert_counts = {}
+    timeline_counts = {}
+    if ids:
+        alert_counts = dict(db.session.query(
+            Alert.incident_id, db.func.count(Alert.id)
+        ).filter(Alert.incident_id.in_(ids)).group_by(Alert.incident_id).all())
+        timeline_counts = dict(db.session.query(
+            IncidentTimeline.incident_id, db.func.count(IncidentTimeline.id)
+        ).filter(IncidentTimeline.incident_id.in_(ids)).group_by(IncidentTimeline.incident_id).all())
+    
+    return [
+        incident.to_summary_dict(
+            alerts_count=alert_counts.get(incident.id, 0),
+            timeline_count=timeline_counts.get(incident.id, 0)
+        )
+        for incident in incidents
+    ]
+
 @api_v1.route('/incidents-new/statistics', methods=['GET'])
 @permission_required('incident:read')
 def get_new_incidents_statistics():
-    """获取新事件统计信息"""
+    """获取新事件统计信息（单次条件聚合查询，结果短时缓存）"""
     try:
-        from datetime import datetime, date
-        
-        # 获取基础统计信息
-        total_incidents = NewIncident.query.count()
-        new_incidents = NewIncident.query.filter_by(status='Pending').count()
-        in_progress = NewIncident.query.filter_by(status='Investigating').count()
-        resolved = NewIncident.query.filter_by(status='Recovered').count()
-        closed = NewIncident.query.filter_by(status='Closed').count()
-        
-        # 计算活跃故障（非关闭状态）
-        active_incidents = NewIncident.query.filter(
-            NewIncident.status.in_(['Pending', 'Investigating', 'Recovering', 'Recovered'])
-        ).count()
-        
-        # 计算今日新增故障
         today = date.today()
-        today_incidents = NewIncident.query.filter(
-            db.func.date(NewIncident.created_at) == today
-        ).count()
-        
-        # 计算待复盘故障（状态为Post-Mortem或需要复盘的）
-        pending_postmortem = NewIncident.query.filter(
-            NewIncident.status.in_(['Post-Mortem', 'Recovered'])
-        ).count()
-        
-        # 计算P1故障数量（高严重度）
-        p1_incidents = NewIncident.query.filter_by(severity='P1').count()
-        
-        return jsonify({
-            'total_incidents': total_incidents,
-            'active_incidents': active_incidents,
-            'today_incidents': today_incidents,
-            'pending_postmortem': pending_postmortem,
-            'p1_incidents': p1_incidents,
-            'new_incidents': new_incidents,
-            'in_progress': in_progress,
-            'resolved': resolved,
-            'closed': closed
-        })
+        statistics = incident_statistics_cache.get_or_load(
+            today, lambda: _load_incident_statistics(today),
+            current_app.config['INCIDENT_STATISTICS_CACHE_TTL']
+        )
+        return jsonify(statistics)
     except Exception as e:
         logger.error(f"获取新事件统计失败: {e}")
         return jsonify({'error': '获取统计信息失败'}), 500
 
+def _load_incident_statistics(today):
+    """用一条 SUM(CASE ...) 查询计算全部统计项；今日新增按创建时间范围筛选以便使用索引"""
+    day_start = datetime.combine(today, time.min)
+    day_end = day_start + timedelta(days=1)
+    
+    def count_if(condition):
+        return db.func.coalesce(db.func.sum(db.case((condition, 1), else_=0)), 0)
+    
+    row = db.session.query(
+        db.func.count(NewIncident.id),
+        # 活跃故障（非关闭状态）
+        count_if(NewIncident.status.in_(['Pending', 'Investigating', 'Recovering', 'Recovered'])),
+        count_if(and_(NewIncident.created_at >= day_start, NewIncident.created_at < day_end)),
+        # 待复盘故障（状态为Post-Mortem或已恢复）
+        count_if(NewIncident.status.in_(['Post-Mortem', 'Recovered'])),
+        count_if(NewIncident.severity == 'P1'),
+        count_if(NewIncident.status == 'Pending'),
+        count_if(NewIncident.status == 'Investigating'),
+        count_if(NewIncident.status == 'Recovered'),
+        count_if(NewIncident.status == 'Closed')
+    ).one()
+    
+    keys = (
+        'total_incidents', 'active_incidents', 'today_incidents', 'pending_postmortem',
+        'p1_incidents', 'new_incidents', 'in_progress', 'resolved', 'closed'
+    )
+    return {key: int(value) for key, value in zip(keys, row)}
+
 @api_v1.route('/incidents-new/<int:incident_id>', methods=['GET'])
 @permission_required('incident:read')
 def get_new_incident(incident_id):
@@ -146,6 +212,10 @@ def create_new_incident():
         
         db.session.add(incident)
         db.session.commit()
+        correlation_engine.invalidate()
+        
+        # 按通知规则发送创建通知，P1级故障同时写入升级步骤
+        handle_new_incident_created(incident)
         
         return jsonify(incident.to_dict()), 201
         
@@ -200,6 +270,10 @@ def update_incident_status(incident_id):
         
         db.session.add(timeline_entry)
         db.session.commit()
+        correlation_engine.invalidate()
+        
+        if new_status != old_status:
+            handle_new_incident_status_changed(incident, old_status)
         
         return jsonify({
             'message': '故障状态更新成功',
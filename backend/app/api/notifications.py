@@ -1,9 +1,16 @@
 from flask import request, jsonify, current_app
 from app.api import api_v1
-from app.models.notification import NotificationChannel, NotificationLog
+from app.models.notification import NotificationChannel, NotificationLog, NotificationJob, NotificationDeadLetter
+from app.notification.dispatcher import (
+    enqueue_notification, enqueue_notification_batch, notification_dispatcher, channel_config_cache,
+    replay_dead_letters
+)
+from app.notification.breaker import notification_breakers
 from app.utils.auth import permission_required
+from app.utils.pagination import is_cursor_request, paginate_by_cursor, InvalidCursorError
 from app import db
 from datetime import datetime
+import os
 import logging
 
 logger = logging.getLogger(__name__)
@@ -39,6 +46,7 @@ def update_notification_channel(channel_id):
             channel.name = data['name']
         
         db.session.commit()
+        channel_config_cache.invalidate()
         return jsonify({'message': '通知渠道更新成功', 'channel': channel.to_dict()}), 200
         
     except Exception as e:
@@ -65,6 +73,7 @@ def create_notification_channel():
         
         db.session.add(channel)
         db.session.commit()
+        channel_config_cache.invalidate()
         
         return jsonify({'message': '通知渠道创建成功', 'channel': channel.to_dict()}), 201
         
@@ -270,7 +279,10 @@ def send_notification():
         return jsonify({'error': '发送通知失败'}), 500
 
 def send_batch_notification(data):
-    """发送批量通知"""
+    """
+    提交批量通知：渠道配置只解析一次，全部任务在一个事务内批量写入，由后台线程池并发发送
+    立即返回批次ID，发送进度通过 GET /notification/batches/<batch_id> 轮询
+    """
     try:
         # 验证必填字段
         required_fields = ['channel_ids', 'message']
@@ -295,227 +307,244 @@ def send_batch_notification(data):
         if not channels:
             return jsonify({'error': '未找到有效的通知渠道'}), 400
         
-        # 获取用户组中的用户
+        # 一次查询获取用户组中的用户，同时属于多个组的用户只通知一次
         users = []
         if group_ids:
             from app.models.user import User, Group
-            groups = Group.query.filter(Group.id.in_(group_ids)).all()
-            for group in groups:
-                users.extend(group.members)
+            users = User.query.join(User.groups).filter(Group.id.in_(group_ids)).distinct().all()
         
         if not users:
             return jsonify({'error': '请选择至少一个用户组'}), 400
         
-        # 发送通知到每个渠道
-        results = []
+        # 为每个渠道和用户生成发送任务
+        targets = []
+        skipped = []
         for channel in channels:
+            webhook_url = (channel.config or {}).get('webhook_url')
             for user in users:
-                try:
-                    # 根据渠道类型发送通知
-                    if channel.type == 'EMAIL':
-                        result = send_email_notification(user.email, message, user.id, incident_id)
-                    elif channel.type == 'SMS':
-                        result = send_sms_notification(user.phone, message, user.id, incident_id)
-                    elif channel.type == 'WEBHOOK':
-                        result = send_webhook_notification(channel, message, user.id, incident_id)
-                    else:
-                        result = {'status': 'FAILED', 'message': f'不支持的通知渠道类型: {channel.type}'}
-                    
-                    results.append({
-                        'channel': channel.name,
-                        'user': user.real_name or user.username,
-                        'result': result
-                    })
-                    
-                except Exception as e:
-                    results.append({
-                        'channel': channel.name,
-                        'user': user.real_name or user.username,
-                        'result': {'status': 'FAILED', 'message': str(e)}
-                    })
-        
-        # 统计结果
-        success_count = sum(1 for r in results if r['result']['status'] == 'SUCCESS')
-        total_count = len(results)
+                if channel.type == 'EMAIL':
+                    recipient = user.email
+                elif channel.type in ('SMS', 'VOICE_CALL'):
+                    recipient = user.phone_number
+                else:
+                    recipient = webhook_url
+                
+                label = {'channel': channel.name, 'user': user.real_name or user.username}
+                if not recipient:
+                    skipped.append(dict(label, result={'status': 'FAILED', 'message': '缺少收件地址'}))
+                    continue
+                
+                targets.append({
+                    'channel_type': channel.type,
+                    'channel_id': channel.id,
+                    'recipient': recipient,
+                    'subject': '事件管理平台 - 故障通知',
+                    'content': message,
+                    'target_user_id': user.id,
+                    'request_content': f'发送{channel.type}到: {recipient}',
+                    'label': label
+                })
+        
+        batch_id, job_ids = enqueue_notification_batch(targets, trigger_record_id=incident_id)
+        db.session.commit()
+        notification_dispatcher.wake()
         
+        # 发送进度由客户端轮询 GET /notification/batches/<batch_id> 获取，请求内不等待发送结果
+        results = [dict(target['label'], job_id=job_id, result={'status': 'PENDING'})
+                   for target, job_id in zip(targets, job_ids)]
         return jsonify({
-            'message': f'批量通知发送完成，成功: {success_count}/{total_count}',
-            'results': results
-        }), 200
+            'message': f'批量通知已提交: {len(job_ids)}/{len(job_ids) + len(skipped)}',
+            'batch_id': batch_id,
+            'job_ids': job_ids,
+            'progress_url': f'/api/v1/notification/batches/{batch_id}',
+            'results': results + skipped
+        }), 202
         
     except Exception as e:
-        logger.error(f"批量通知发送失败: {e}")
-        return jsonify({'error': f'批量通知发送失败: {str(e)}'}), 500
+        db.session.rollback()
+        logger.error(f"批量通知提交失败: {e}")
+        return jsonify({'error': f'批量通知提交失败: {str(e)}'}), 500
 
 def send_single_notification(data):
-    """发送单个通知"""
+    """提交单个通知，由后台派发"""
     # 验证必填字段
     required_fields = ['channel_type', 'to', 'subject', 'content']
     for field in required_fields:
         if field not in data:
             return jsonify({'error': f'缺少必填字段: {field}'}), 400
     
-    # 根据渠道类型发送通知
     channel_type = data['channel_type']
+    options = None
+    recipient = data['to']
     
-    if channel_type == 'EMAIL':
-        return send_email_notification(data['to'], data['content'], data.get('user_id'), data.get('trigger_record_id'))
-    elif channel_type == 'SMS':
-        return send_sms_notification(data['to'], data['content'], data.get('user_id'), data.get('trigger_record_id'))
-    elif channel_type == 'WEBHOOK':
+    if channel_type == 'WEBHOOK':
         # 对于单个通知，需要提供webhook配置
         webhook_config = data.get('webhook_config', {})
-        return send_webhook_notification(webhook_config, data['content'], data.get('user_id'), data.get('trigger_record_id'))
-    else:
+        if not webhook_config.get('webhook_url'):
+            return jsonify({'error': '缺少webhook_config.webhook_url'}), 400
+        options = {'webhook_config': webhook_config}
+        recipient = webhook_config['webhook_url']
+    elif channel_type not in ('EMAIL', 'SMS'):
         return jsonify({'error': f'不支持的通知渠道类型: {channel_type}'}), 400
-
-def send_email_notification(to_email, content, user_id=None, incident_id=None):
-    """发送邮件通知"""
+    
     try:
-        from app.notification.service import EmailChannel
-        from flask_mail import Mail
-        
-        # 获取邮件渠道配置
-        email_channel_db = NotificationChannel.query.filter_by(type='EMAIL', is_active=True).first()
-        if not email_channel_db:
-            return {'status': 'FAILED', 'message': '未找到启用的邮件渠道配置'}
-        
-        email_config = email_channel_db.config
-        if not email_config:
-            return {'status': 'FAILED', 'message': '邮件渠道配置为空'}
-        
-        # 创建邮件配置
-        mail_config = {
-            'smtp_server': email_config['smtp_host'],
-            'smtp_port': email_config['smtp_port'],
-            'username': email_config['smtp_username'],
-            'password': email_config['smtp_password'],
-            'use_tls': email_config.get('use_tls', True)
-        }
-        
-        # 初始化Flask-Mail
-        mail = Mail()
-        mail.init_app(current_app)
-        
-        email_channel = EmailChannel(mail_config, mail)
-        
-        # 发送邮件
-        subject = '事件管理平台 - 故障通知'
-        result = email_channel.send(
-            to=to_email,
-            subject=subject,
-            content=content
+        job = enqueue_notification(
+            channel_type, recipient, data['content'],
+            subject=data['subject'],
+            options=options,
+            target_user_id=data.get('user_id'),
+            trigger_record_id=data.get('trigger_record_id'),
+            request_content=f'发送{channel_type}到: {recipient}'
         )
-        
-        # 记录发送日志
-        log = NotificationLog(
-            channel_type='EMAIL',
-            target_user_id=user_id,
-            trigger_event='incident_notification',
-            trigger_record_id=incident_id or 0,
-            status=result['status'],
-            request_content=f'发送邮件到: {to_email}',
-            response_content=result.get('message', ''),
-            external_id=result.get('external_id')
-        )
-        db.session.add(log)
         db.session.commit()
+        notification_dispatcher.wake()
         
-        return result
+        return jsonify({
+            'message': '通知已提交',
+            'job_id': job.id,
+            'log_id': job.log_id,
+            'status': job.status
+        }), 202
         
     except Exception as e:
-        logger.error(f"邮件通知发送失败: {e}")
-        return {'status': 'FAILED', 'message': str(e)}
+        db.session.rollback()
+        logger.error(f"通知提交失败: {e}")
+        return jsonify({'error': f'通知提交失败: {str(e)}'}), 500
 
-def send_sms_notification(to_phone, content, user_id=None, incident_id=None):
-    """发送短信通知"""
+@api_v1.route('/notification/batches/<batch_id>', methods=['GET'])
+@permission_required('notification:admin')
+def get_notification_batch(batch_id):
+    """查询批量通知的发送进度"""
+    jobs = NotificationJob.query.filter_by(batch_id=batch_id).order_by(NotificationJob.id).all()
+    if not jobs:
+        return jsonify({'error': '通知批次不存在'}), 404
+    
+    counts = {}
+    for job in jobs:
+        counts[job.status] = counts.get(job.status, 0) + 1
+    return jsonify({
+        'batch_id': batch_id,
+        'total': len(jobs),
+        'status_counts': counts,
+        # 全部任务发送成功或最终失败后客户端即可停止轮询
+        'done': counts.get('SUCCESS', 0) + counts.get('FAILED', 0) == len(jobs),
+        'jobs': [job.to_dict() for job in jobs]
+    }), 200
+
+@api_v1.route('/notification/jobs/<int:job_id>', methods=['GET'])
+@permission_required('notification:admin')
+def get_notification_job(job_id):
+    """查询通知发送任务状态"""
+    job = NotificationJob.query.get(job_id)
+    if not job:
+        return jsonify({'error': '通知任务不存在'}), 404
+    return jsonify(job.to_dict()), 200
+
+@api_v1.route('/notification/dead-letters', methods=['GET'])
+@permission_required('notification:admin')
+def get_notification_dead_letters():
+    """获取重试次数用尽的通知（死信）列表，默认只返回未重放的"""
     try:
-        from app.notification.service import SMSChannel
-        
-        sms_config = {
-            'api_url': current_app.config.get('SMS_API_URL'),
-            'access_key': current_app.config.get('SMS_ACCESS_KEY_ID'),
-            'access_secret': current_app.config.get('SMS_ACCESS_KEY_SECRET'),
-            'sign_name': current_app.config.get('SMS_SIGN_NAME')
-        }
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        channel_type = request.args.get('channel_type')
+        include_replayed = request.args.get('include_replayed', 'false').lower() == 'true'
         
-        sms_channel = SMSChannel(sms_config)
-        result = sms_channel.send(
-            to=to_phone,
-            subject='SMS Notification',
-            content=content
-        )
+        query = NotificationDeadLetter.query
+        if not include_replayed:
+            query = query.filter(NotificationDeadLetter.replayed_at.is_(None))
+        if channel_type:
+            query = query.filter(NotificationDeadLetter.channel_type == channel_type)
         
-        # 记录发送日志
-        log = NotificationLog(
-            channel_type='SMS',
-            target_user_id=user_id,
-            trigger_event='incident_notification',
-            trigger_record_id=incident_id or 0,
-            status=result['status'],
-            request_content=f'发送短信到: {to_phone}',
-            response_content=result.get('message', ''),
-            external_id=result.get('external_id')
+        letters = query.order_by(NotificationDeadLetter.id.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
         )
-        db.session.add(log)
-        db.session.commit()
         
-        return result
+        return jsonify({
+            'dead_letters': [letter.to_dict() for letter in letters.items],
+            'total': letters.total,
+            'pages': letters.pages,
+            'current_page': page
+        }), 200
         
     except Exception as e:
-        logger.error(f"短信通知发送失败: {e}")
-        return {'status': 'FAILED', 'message': str(e)}
+        logger.error(f"获取通知死信失败: {e}")
+        return jsonify({'error': '获取通知死信失败'}), 500
 
-def send_webhook_notification(channel_or_config, content, user_id=None, incident_id=None):
-    """发送Webhook通知"""
+@api_v1.route('/notification/dead-letters/replay', methods=['POST'])
+@permission_required('notification:admin')
+def replay_notification_dead_letters():
+    """
+    批量重放死信：对应任务重新进入发送队列并重置发送次数
+    可指定 ids，或按 channel_type 重放最早的 limit 条（默认1000）
+    """
     try:
-        from app.notification.service import WebhookChannel
-        
-        if hasattr(channel_or_config, 'config'):
-            # 传入的是NotificationChannel对象
-            webhook_config = {
-                'webhook_url': channel_or_config.config.get('webhook_url'),
-                'webhook_type': 'generic',
-                'method': 'POST',
-                'headers': {'Content-Type': 'application/json'},
-                'timeout': 30
-            }
-        else:
-            # 传入的是配置字典
-            webhook_config = channel_or_config
-        
-        webhook_channel = WebhookChannel(webhook_config)
-        result = webhook_channel.send(
-            to=webhook_config['webhook_url'],
-            subject='Webhook Notification',
-            content=content
-        )
+        data = request.get_json() or {}
+        ids = data.get('ids')
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+            return jsonify({'error': 'ids必须是整数列表'}), 400
+        limit = min(int(data.get('limit', 1000)), 10000)
         
-        # 记录发送日志
-        log = NotificationLog(
-            channel_type='WEBHOOK',
-            target_user_id=user_id,
-            trigger_event='incident_notification',
-            trigger_record_id=incident_id or 0,
-            status=result['status'],
-            request_content=f'发送Webhook到: {webhook_config["webhook_url"]}',
-            response_content=result.get('message', ''),
-            external_id=result.get('external_id')
-        )
-        db.session.add(log)
+        replayed = replay_dead_letters(ids, data.get('channel_type'), limit)
         db.session.commit()
+        if replayed:
+            notification_dispatcher.wake()
         
-        return result
+        return jsonify({
+            'message': f'已重放 {replayed} 条通知',
+            'replayed': replayed
+        }), 200
         
     except Exception as e:
-        logger.error(f"Webhook通知发送失败: {e}")
-        return {'status': 'FAILED', 'message': str(e)}
+        db.session.rollback()
+        logger.error(f"重放通知死信失败: {e}")
+        return jsonify({'error': f'重放通知死信失败: {str(e)}'}), 500
+
+@api_v1.route('/notification/circuit-breakers', methods=['GET'])
+@permission_required('notification:admin')
+def get_notification_circuit_breakers():
+    """查看本worker各渠道、目标主机的熔断状态和渠道的自适应并发上限"""
+    return jsonify({
+        'pid': os.getpid(),
+        'breakers': notification_breakers.snapshot(),
+        'concurrency': notification_dispatcher.concurrency_snapshot()
+    }), 200
+
+@api_v1.route('/notification/circuit-breakers/<path:name>/reset', methods=['POST'])
+@permission_required('notification:admin')
+def reset_notification_circuit_breaker(name):
+    """手动关闭熔断器（如目标已恢复，不必等待恢复时间），只影响处理该请求的worker"""
+    breaker = notification_breakers.find(name)
+    if breaker is None:
+        return jsonify({'error': '熔断器不存在'}), 404
+    breaker.reset()
+    notification_dispatcher.wake()
+    return jsonify(breaker.snapshot()), 200
 
 @api_v1.route('/notification/logs', methods=['GET'])
 @permission_required('notification:admin')
 def get_notification_logs():
     """获取通知日志列表"""
     try:
+        # 游标分页：按 (created_at, id) 翻页，不执行COUNT和OFFSET
+        if is_cursor_request(request.args):
+            try:
+                page_data = paginate_by_cursor(
+                    NotificationLog.query, NotificationLog.created_at, NotificationLog.id, request.args
+                )
+            except InvalidCursorError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            result = {
+                'logs': [log.to_dict() for log in page_data['items']],
+                'next_cursor': page_data['next_cursor'],
+                'has_more': page_data['has_more'],
+                'per_page': page_data['per_page']
+            }
+            if page_data['total'] is not None:
+                result['total'] = page_data['total']
+            return jsonify(result), 200
+        
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         
@@ -3,11 +3,15 @@ from app.api import api_v1
 from app import db
 from app.models import Problem, ProblemStatusLog
 from app.utils.auth import permission_required, get_current_user
+from app.utils.instrumentation import query_budget
+from app.utils.pagination import is_cursor_request, paginate_by_cursor, InvalidCursorError
+from app.utils.serialization import get_profile, apply_profile, InvalidProfileError
 import logging
 
 logger = logging.getLogger(__name__)
 
 @api_v1.route('/problems', methods=['GET'])
+@query_budget(max_queries=15)
 @permission_required('problem:read')
 def get_problems():
     """获取故障列表"""
@@ -18,8 +22,13 @@ def get_problems():
     status_filter = request.args.get('status')
     priority_filter = request.args.get('priority')
     
-    # 构建查询
-    query = Problem.query
+    try:
+        profile = get_profile(request.args)
+    except InvalidProfileError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # 构建查询，按序列化配置预加载关联
+    query = apply_profile(Problem.query, Problem, profile)
     
     # 应用筛选条件
     if status_filter:
@@ -28,13 +37,30 @@ def get_problems():
     if priority_filter:
         query = query.filter(Problem.priority == priority_filter)
     
+    # 游标分页：按 (created_at, id) 翻页，不执行COUNT和OFFSET
+    if is_cursor_request(request.args):
+        try:
+            page_data = paginate_by_cursor(query, Problem.created_at, Problem.id, request.args)
+        except InvalidCursorError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        result = {
+            'problems': [problem.to_dict(profile) for problem in page_data['items']],
+            'next_cursor': page_data['next_cursor'],
+            'has_more': page_data['has_more'],
+            'per_page': page_data['per_page']
+        }
+        if page_data['total'] is not None:
+            result['total'] = page_data['total']
+        return jsonify(result), 200
+    
     # 排序和分页
     pagination = query.order_by(Problem.created_at.desc()).paginate(
         page=page, per_page=per_page, error_out=False
     )
     
     return jsonify({
-        'problems': [problem.to_dict() for problem in pagination.items],
+        'problems': [problem.to_dict(profile) for problem in pagination.items],
         'total': pagination.total,
         'page': page,
         'per_page': per_page,
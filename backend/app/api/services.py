@@ -3,6 +3,7 @@ from app.api import api_v1
 from app import db
 from app.models import Service
 from app.utils.auth import permission_required
+from app.alerting.alertmanager import service_label_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -89,6 +90,7 @@ def create_service():
         
         db.session.add(service)
         db.session.commit()
+        service_label_cache.invalidate()
         
         logger.info(f'Service created: {service.name}')
         
@@ -122,6 +124,7 @@ def update_service(service_id):
                 setattr(service, field, data[field])
         
         db.session.commit()
+        service_label_cache.invalidate()
         
         logger.info(f'Service updated: {service.name}')
         
@@ -152,6 +155,7 @@ def delete_service(service_id):
         # 软删除：设置为非激活状态
         service.is_active = False
         db.session.commit()
+        service_label_cache.invalidate()
         
         logger.info(f'Service deleted (deactivated): {service.name}')
         
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from flask import jsonify
+from app.api import api_v1
+from app.utils.auth import admin_required
+from app.utils.instrumentation import endpoint_stats
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+@api_v1.route('/system/endpoint-metrics', methods=['GET'])
+@admin_required
+def get_endpoint_metrics():
+    """获取当前worker进程内各端点的SQL条数与耗时统计"""
+    return jsonify({
+        'pid': os.getpid(),
+        'endpoints': endpoint_stats.snapshot()
+    }), 200
+
+@api_v1.route('/system/endpoint-metrics', methods=['DELETE'])
+@admin_required
+def reset_endpoint_metrics():
+    """清空当前worker进程内的端点统计"""
+    endpoint_stats.reset()
+    logger.info('Endpoint metrics reset')
+    return jsonify({'message': 'Endpoint metrics reset'}), 200
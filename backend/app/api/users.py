@@ -3,19 +3,27 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.api import api_v1
 from app import db
 from app.models import User, Role, Group
-from app.utils.auth import permission_required, admin_required, get_current_user
+from app.utils.auth import permission_required, admin_required, get_current_user, permission_cache, invalidate_user_permissions
+from app.utils.instrumentation import query_budget
+from app.utils.serialization import get_profile, apply_profile, InvalidProfileError
 import bcrypt
 import logging
 
 logger = logging.getLogger(__name__)
 
 @api_v1.route('/users', methods=['GET'])
+@query_budget(max_queries=15)
 @permission_required('user:read')
 def get_users():
     """获取用户列表"""
-    users = User.query.filter(User.is_active == True).all()
+    try:
+        profile = get_profile(request.args)
+    except InvalidProfileError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    users = apply_profile(User.query, User, profile).filter(User.is_active == True).all()
     return jsonify({
-        'users': [user.to_dict() for user in users]
+        'users': [user.to_dict(profile) for user in users]
     }), 200
 
 @api_v1.route('/roles', methods=['GET'])
@@ -91,6 +99,7 @@ def create_user():
         
         db.session.add(user)
         db.session.commit()
+        permission_cache.invalidate(user.id)
         
         logger.info(f'User created: {user.username} by {current_user.username}')
         
@@ -159,13 +168,21 @@ def update_user(user_id):
                 setattr(user, field, data[field])
         
         # 更新角色
+        roles_changed = False
         if 'roles' in data:
+            old_role_ids = {role.id for role in user.roles}
             user.roles.clear()
             if data['roles']:
                 roles = Role.query.filter(Role.id.in_(data['roles'])).all()
                 user.roles.extend(roles)
+            roles_changed = {role.id for role in user.roles} != old_role_ids
         
         db.session.commit()
+        # 只有角色变化才需要使令牌中的权限位图过期，资料修改只失效本进程缓存
+        if roles_changed:
+            invalidate_user_permissions(user.id)
+        else:
+            permission_cache.invalidate(user.id)
         
         logger.info(f'User updated: {user.username} by {current_user.username}')
         
@@ -190,6 +207,7 @@ def toggle_user_status(user_id):
     try:
         user.is_active = data.get('is_active', not user.is_active)
         db.session.commit()
+        permission_cache.invalidate(user.id)
         
         action = '启用' if user.is_active else '禁用'
         logger.info(f'User {action}: {user.username} by {current_user.username}')
@@ -282,6 +300,8 @@ def delete_group(group_id):
         
         db.session.delete(group)
         db.session.commit()
+        # 组内成员通过该组获得的权限随之失效
+        invalidate_user_permissions()
         
         logger.info(f'Group deleted: {group.name} by {current_user.username}')
         
@@ -326,6 +346,7 @@ def add_group_member(group_id):
         
         group.members.append(user)
         db.session.commit()
+        invalidate_user_permissions(user.id)
         
         logger.info(f'User {user.username} added to group {group.name} by {current_user.username}')
         
@@ -351,6 +372,7 @@ def remove_group_member(group_id, user_id):
         if user in group.members:
             group.members.remove(user)
             db.session.commit()
+            invalidate_user_permissions(user.id)
             
             logger.info(f'User {user.username} removed from group {group.name} by {current_user.username}')
             
@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identi
 from app.auth import auth_bp
 from app import db
 from app.models import User
+from app.utils.auth import build_permission_claims
 import bcrypt
 import logging
 
@@ -30,10 +31,7 @@ def login():
     try:
         access_token = create_access_token(
             identity=user.id,
-            additional_claims={
-                'username': user.username,
-                'roles': [role.name for role in user.roles]
-            }
+            additional_claims=build_permission_claims(user)
         )
         
         return jsonify({
@@ -45,6 +43,29 @@ def login():
         logger.error(f'Login error: {str(e)}')
         return jsonify({'error': 'Login failed'}), 500
 
+@auth_bp.route('/refresh-permissions', methods=['POST'])
+@jwt_required()
+def refresh_permissions():
+    """权限变更后换取带有最新权限位图的访问令牌"""
+    user = User.query.get(get_jwt_identity())
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    if not user.is_active:
+        return jsonify({'error': 'Account is not activated'}), 401
+    
+    try:
+        access_token = create_access_token(
+            identity=user.id,
+            additional_claims=build_permission_claims(user)
+        )
+        return jsonify({'access_token': access_token}), 200
+        
+    except Exception as e:
+        logger.error(f'Permission refresh error: {str(e)}')
+        return jsonify({'error': 'Permission refresh failed'}), 500
+
 @auth_bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
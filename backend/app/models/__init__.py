@@ -5,21 +5,25 @@
 
 from .user import User, Group, Role, Permission
 from .incident import Service, Incident, IncidentComment, IncidentStatusLog, Problem, ProblemStatusLog
-from .alert import Alert, AlertComment
+from .alert import Alert, AlertComment, AlertSuppressionStat
 # 导入新的故障模型
-from .incident_new import NewIncident, IncidentTimeline, PostMortem, ActionItem
+from .incident_new import NewIncident, IncidentIdSequence, IncidentTimeline, PostMortem, ActionItem
 from .approval import ApprovalWorkflow, ApprovalStep, Approval, ApprovalLog
 from .notification import (
     NotificationChannel, UserNotificationPreference, NotificationRule,
-    NotificationRuleAction, NotificationTemplate, NotificationLog
+    NotificationRuleAction, NotificationTemplate, NotificationLog, NotificationJob,
+    NotificationDeadLetter, EscalationStep
 )
+from .system import ConfigVersion
 
 __all__ = [
     'User', 'Group', 'Role', 'Permission',
     'Service', 'Incident', 'IncidentComment', 'IncidentStatusLog', 'Problem', 'ProblemStatusLog',
-    'Alert', 'AlertComment',
-    'NewIncident', 'IncidentTimeline', 'PostMortem', 'ActionItem',  # 添加新的故障模型
+    'Alert', 'AlertComment', 'AlertSuppressionStat',
+    'NewIncident', 'IncidentIdSequence', 'IncidentTimeline', 'PostMortem', 'ActionItem',  # 添加新的故障模型
     'ApprovalWorkflow', 'ApprovalStep', 'Approval', 'ApprovalLog',
     'NotificationChannel', 'UserNotificationPreference', 'NotificationRule',
-    'NotificationRuleAction', 'NotificationTemplate', 'NotificationLog'
+    'NotificationRuleAction', 'NotificationTemplate', 'NotificationLog', 'NotificationJob',
+    'NotificationDeadLetter', 'EscalationStep',
+    'ConfigVersion'
 ]
\ No newline at end of file
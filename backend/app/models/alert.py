@@ -1,5 +1,7 @@
 from datetime import datetime
+from sqlalchemy.orm import joinedload
 from app import db
+import hashlib
 
 class Alert(db.Model):
     """
@@ -7,6 +9,11 @@ class Alert(db.Model):
     这是故障管理流程的起点，多个告警可以关联到一个故障
     """
     __tablename__ = 'alerts'
+    # 支撑按 (fired_at, id) 的游标分页，以及按状态筛选后的分页
+    __table_args__ = (
+        db.Index('idx_alerts_fired_at_id', 'fired_at', 'id'),
+        db.Index('idx_alerts_status_fired_at_id', 'status', 'fired_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -35,8 +42,16 @@ class Alert(db.Model):
     incident_id = db.Column(db.Integer, db.ForeignKey('incidents_new.id'), comment='关联的故障ID')
     acknowledged_by = db.Column(db.Integer, db.ForeignKey('users.id'), comment='确认人')
     
+    # 去重信息
+    fingerprint = db.Column(db.String(64), index=True, comment='告警指纹（标识标签的哈希）')
+    # 仅在告警处于活跃状态时等于fingerprint，解决或忽略后置空；
+    # MySQL不支持部分索引，借助唯一索引允许多个NULL的特性实现“活跃告警指纹唯一”
+    active_fingerprint = db.Column(db.String(64), unique=True, comment='活跃告警指纹')
+    occurrence_count = db.Column(db.Integer, nullable=False, default=1, comment='重复触发次数')
+    
     # 时间信息
     fired_at = db.Column(db.DateTime, nullable=False, comment='告警触发时间')
+    last_fired_at = db.Column(db.DateTime, comment='最近一次触发时间')
     resolved_at = db.Column(db.DateTime, comment='告警解决时间')
     acknowledged_at = db.Column(db.DateTime, comment='确认时间')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
@@ -47,8 +62,39 @@ class Alert(db.Model):
     incident = db.relationship('NewIncident', foreign_keys=[incident_id])
     acknowledged_user = db.relationship('User', foreign_keys=[acknowledged_by])
     
-    def to_dict(self):
+    @staticmethod
+    def compute_fingerprint(alert_rule=None, host=None, service_id=None, metric_name=None, title=None):
+        """根据告警规则、主机、服务和指标计算稳定指纹；标识标签全部缺失时退化为按标题区分"""
+        labels = [alert_rule, host, service_id, metric_name]
+        parts = ['' if value is None else str(value) for value in labels]
+        parts.append('' if any(parts) else (title or ''))
+        return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def loader_options(cls, profile='detail'):
+        """序列化配置所需的预加载选项"""
+        from app.models.user import User
+        
+        if profile == 'embed':
+            return []
+        user_path = joinedload(cls.acknowledged_user)
+        options = [joinedload(cls.service), user_path]
+        if profile == 'detail':
+            options.extend(User.loader_options('detail', user_path))
+        return options
+    
+    def to_dict(self, profile='detail'):
         """转换为字典"""
+        if profile == 'embed':
+            return {
+                'id': self.id,
+                'title': self.title,
+                'level': self.level,
+                'status': self.status,
+                'fired_at': self.fired_at.isoformat() if self.fired_at else None
+            }
+        
+        user_profile = 'embed' if profile == 'summary' else 'detail'
         return {
             'id': self.id,
             'title': self.title,
@@ -64,8 +110,11 @@ class Alert(db.Model):
             'incident_id': self.incident_id,
             'host': self.host,
             'environment': self.environment,
-            'acknowledged_by': self.acknowledged_user.to_dict() if self.acknowledged_user else None,
+            'fingerprint': self.fingerprint,
+            'occurrence_count': self.occurrence_count,
+            'acknowledged_by': self.acknowledged_user.to_dict(user_profile) if self.acknowledged_user else None,
             'fired_at': self.fired_at.isoformat() if self.fired_at else None,
+            'last_fired_at': self.last_fired_at.isoformat() if self.last_fired_at else None,
             'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
             'acknowledged_at': self.acknowledged_at.isoformat() if self.acknowledged_at else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -88,11 +137,13 @@ class Alert(db.Model):
     def ignore(self):
         """忽略告警"""
         self.status = 'Ignored'
+        self.active_fingerprint = None
         self.updated_at = datetime.utcnow()
     
-    def resolve(self):
+    def resolve(self, resolved_at=None):
         """解决告警"""
-        self.resolved_at = datetime.utcnow()
+        self.resolved_at = resolved_at or datetime.utcnow()
+        self.active_fingerprint = None
         self.updated_at = datetime.utcnow()
 
 class AlertComment(db.Model):
@@ -119,4 +170,30 @@ class AlertComment(db.Model):
             'content': self.content,
             'is_private': self.is_private,
             'created_at': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
+        }
+
+class AlertSuppressionStat(db.Model):
+    """告警抑制统计模型 - 被限流或风暴采样丢弃的告警只按来源、级别和日期累计数量"""
+    __tablename__ = 'alert_suppression_stats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    alert_source = db.Column(db.String(100), nullable=False, default='', comment='告警来源')
+    level = db.Column(db.Enum('Critical', 'Warning', 'Info'), nullable=False, comment='告警级别')
+    stat_date = db.Column(db.Date, nullable=False, comment='统计日期')
+    suppressed_count = db.Column(db.Integer, nullable=False, default=0, comment='被抑制的告警数量')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('alert_source', 'level', 'stat_date', name='_alert_suppression_stat_uc'),
+    )
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'alert_source': self.alert_source,
+            'level': self.level,
+            'stat_date': self.stat_date.isoformat() if self.stat_date else None,
+            'suppressed_count': self.suppressed_count,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
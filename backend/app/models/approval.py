@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy.orm import joinedload, selectinload
 from app import db
 
 class ApprovalWorkflow(db.Model):
@@ -14,14 +15,29 @@ class ApprovalWorkflow(db.Model):
     steps = db.relationship('ApprovalStep', backref='workflow', cascade='all, delete-orphan')
     approvals = db.relationship('Approval', backref='workflow')
     
-    def to_dict(self):
+    def get_step(self, step_number):
+        """按序号查找审批步骤（在已加载的步骤列表中查找，不额外查询）"""
+        return next((step for step in self.steps if step.step_number == step_number), None)
+    
+    @classmethod
+    def loader_options(cls, profile='detail', path=None):
+        """序列化配置所需的预加载选项；path为从上级对象到流程的加载路径"""
+        if profile == 'embed':
+            return []
+        steps_path = path.selectinload(cls.steps) if path is not None else selectinload(cls.steps)
+        return [steps_path] + ApprovalStep.loader_options(profile, steps_path)
+    
+    def to_dict(self, profile='detail'):
         """转换为字典"""
+        if profile == 'embed':
+            return {'id': self.id, 'name': self.name}
+        
         return {
             'id': self.id,
             'name': self.name,
             'description': self.description,
             'is_active': self.is_active,
-            'steps': [step.to_dict() for step in self.steps]
+            'steps': [step.to_dict(profile) for step in self.steps]
         }
 
 class ApprovalStep(db.Model):
@@ -57,18 +73,54 @@ class ApprovalStep(db.Model):
         
         return approvers
     
-    def to_dict(self):
+    @classmethod
+    def loader_options(cls, profile='detail', path=None):
+        """序列化配置所需的预加载选项；path为从上级对象到步骤的加载路径"""
+        from app.models.user import User, Role, Group
+        
+        if profile == 'embed':
+            return []
+        
+        def load(attr):
+            return path.joinedload(attr) if path is not None else joinedload(attr)
+        
+        user_path = load(cls.approved_by_user)
+        role_users_path = load(cls.approved_by_role).selectinload(Role.users)
+        manager_path = load(cls.approved_by_group).joinedload(Group.manager)
+        options = [user_path, role_users_path, manager_path]
+        if profile == 'detail':
+            role_path = load(cls.approved_by_role)
+            group_path = load(cls.approved_by_group)
+            options.extend([
+                role_path.selectinload(Role.permissions),
+                group_path.selectinload(Group.members),
+                group_path.selectinload(Group.roles)
+            ])
+            for path_to_user in (user_path, role_users_path, manager_path):
+                options.extend(User.loader_options('detail', path_to_user))
+        return options
+    
+    def to_dict(self, profile='detail'):
         """转换为字典"""
-        return {
+        if profile == 'embed':
+            return {'id': self.id, 'step_number': self.step_number, 'approval_type': self.approval_type}
+        
+        user_profile = 'embed' if profile == 'summary' else 'detail'
+        result = {
             'id': self.id,
             'workflow_id': self.workflow_id,
             'step_number': self.step_number,
             'approval_type': self.approval_type,
-            'approved_by_user': self.approved_by_user.to_dict() if self.approved_by_user else None,
-            'approved_by_role': self.approved_by_role.to_dict() if self.approved_by_role else None,
-            'approved_by_group': self.approved_by_group.to_dict() if self.approved_by_group else None,
-            'approvers': [user.to_dict() for user in self.get_approvers()]
+            'approved_by_user': self.approved_by_user.to_dict(user_profile) if self.approved_by_user else None,
+            'approvers': [user.to_dict(user_profile) for user in self.get_approvers()]
         }
+        if profile == 'summary':
+            result['approved_by_role'] = {'id': self.approved_by_role.id, 'name': self.approved_by_role.name} if self.approved_by_role else None
+            result['approved_by_group'] = {'id': self.approved_by_group.id, 'name': self.approved_by_group.name} if self.approved_by_group else None
+        else:
+            result['approved_by_role'] = self.approved_by_role.to_dict() if self.approved_by_role else None
+            result['approved_by_group'] = self.approved_by_group.to_dict() if self.approved_by_group else None
+        return result
 
 class Approval(db.Model):
     """审批实例模型"""
@@ -95,7 +147,7 @@ class Approval(db.Model):
         if self.status != 'PENDING':
             return []
         
-        current_step = self.workflow.steps.filter_by(step_number=self.current_step).first()
+        current_step = self.workflow.get_step(self.current_step)
         if not current_step:
             return []
         
@@ -111,7 +163,7 @@ class Approval(db.Model):
             raise ValueError("User is not authorized to approve this step")
         
         # 记录审批日志
-        current_step = self.workflow.steps.filter_by(step_number=self.current_step).first()
+        current_step = self.workflow.get_step(self.current_step)
         log = ApprovalLog(
             approval_id=self.id,
             step_id=current_step.id,
@@ -122,7 +174,7 @@ class Approval(db.Model):
         db.session.add(log)
         
         # 检查是否还有下一步
-        next_step = self.workflow.steps.filter_by(step_number=self.current_step + 1).first()
+        next_step = self.workflow.get_step(self.current_step + 1)
         if next_step:
             # 进入下一步
             self.current_step += 1
@@ -139,7 +191,7 @@ class Approval(db.Model):
             raise ValueError("User is not authorized to reject this step")
         
         # 记录审批日志
-        current_step = self.workflow.steps.filter_by(step_number=self.current_step).first()
+        current_step = self.workflow.get_step(self.current_step)
         log = ApprovalLog(
             approval_id=self.id,
             step_id=current_step.id,
@@ -153,8 +205,51 @@ class Approval(db.Model):
         self.updated_at = datetime.utcnow()
         db.session.commit()
     
-    def to_dict(self):
+    @classmethod
+    def loader_options(cls, profile='detail'):
+        """序列化配置所需的预加载选项"""
+        from app.models.user import User
+        from app.models.incident import Problem
+        
+        if profile == 'embed':
+            return []
+        
+        requester_path = joinedload(cls.requester)
+        # 计算当前审批人需要流程步骤及审批人配置，summary同样需要
+        options = [requester_path, joinedload(cls.problem)]
+        options.extend(ApprovalWorkflow.loader_options(profile, joinedload(cls.workflow)))
+        if profile == 'summary':
+            options.append(selectinload(cls.logs))
+            return options
+        
+        options.extend(User.loader_options('detail', requester_path))
+        options.append(joinedload(cls.problem).selectinload(Problem.incidents))
+        log_approver_path = selectinload(cls.logs).joinedload(ApprovalLog.approver)
+        log_step_path = selectinload(cls.logs).joinedload(ApprovalLog.step)
+        options.extend([log_approver_path, log_step_path])
+        options.extend(User.loader_options('detail', log_approver_path))
+        options.extend(ApprovalStep.loader_options('detail', log_step_path))
+        return options
+    
+    def to_dict(self, profile='detail'):
         """转换为字典"""
+        if profile == 'embed':
+            return {'id': self.id, 'problem_id': self.problem_id, 'status': self.status, 'current_step': self.current_step}
+        
+        if profile == 'summary':
+            return {
+                'id': self.id,
+                'workflow': self.workflow.to_dict('embed') if self.workflow else None,
+                'problem': self.problem.to_dict('embed') if self.problem else None,
+                'requester': self.requester.to_dict('embed') if self.requester else None,
+                'status': self.status,
+                'current_step': self.current_step,
+                'current_approvers': [user.to_dict('embed') for user in self.get_current_approvers()],
+                'created_at': self.created_at.isoformat() if self.created_at else None,
+                'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+                'logs_count': len(self.logs)
+            }
+        
         return {
             'id': self.id,
             'workflow': self.workflow.to_dict() if self.workflow else None,
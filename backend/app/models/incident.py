@@ -1,6 +1,7 @@
 from datetime import datetime
 from app import db
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import joinedload, selectinload
 
 # 事件-故障关联表
 incident_problem = db.Table('incident_problem',
@@ -34,6 +35,10 @@ class Service(db.Model):
 class Incident(db.Model):
     """事件模型"""
     __tablename__ = 'incidents'
+    __table_args__ = (
+        db.Index('idx_incidents_created_at_id', 'created_at', 'id'),
+        db.Index('idx_incidents_status_created_at_id', 'status', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255))
@@ -78,16 +83,46 @@ class Incident(db.Model):
         else:
             return 'Low'
     
-    def to_dict(self):
-        """转换为字典"""
-        # 生成F-格式的故障ID
-        from datetime import datetime
+    @property
+    def formatted_incident_id(self):
+        """F-格式的故障ID"""
         created_date = self.created_at.strftime('%Y%m%d') if self.created_at else datetime.now().strftime('%Y%m%d')
-        formatted_incident_id = f"F-{created_date}-{self.id:03d}"
+        return f"F-{created_date}-{self.id:03d}"
+    
+    @classmethod
+    def loader_options(cls, profile='detail'):
+        """序列化配置所需的预加载选项"""
+        from app.models.user import User
         
-        return {
+        if profile == 'embed':
+            return []
+        
+        assignee_path = joinedload(cls.assignee)
+        reporter_path = joinedload(cls.reporter)
+        options = [joinedload(cls.service), assignee_path, reporter_path, selectinload(cls.comments)]
+        if profile == 'detail':
+            comment_user_path = selectinload(cls.comments).joinedload(IncidentComment.user)
+            options.extend(User.loader_options('detail', assignee_path))
+            options.extend(User.loader_options('detail', reporter_path))
+            options.append(comment_user_path)
+            options.extend(User.loader_options('detail', comment_user_path))
+            options.append(selectinload(cls.problems))
+        return options
+    
+    def to_dict(self, profile='detail'):
+        """转换为字典"""
+        if profile == 'embed':
+            return {
+                'id': self.id,
+                'incident_id': self.formatted_incident_id,
+                'title': self.title,
+                'status': self.status,
+                'priority': self.priority
+            }
+        
+        result = {
             'id': self.id,
-            'incident_id': formatted_incident_id,  # 使用F-格式的故障ID
+            'incident_id': self.formatted_incident_id,  # 使用F-格式的故障ID
             'title': self.title,
             'description': self.description,
             'status': self.status,
@@ -99,19 +134,28 @@ class Incident(db.Model):
             'reporter_id': self.reporter_id,  # 添加reporter_id字段以兼容前端
             'service_id': self.service_id,  # 添加service_id字段以兼容前端
             'service': self.service.to_dict() if self.service else None,
-            'assignee': self.assignee.to_dict() if self.assignee else None,
-            'reporter': self.reporter.to_dict() if self.reporter else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
             'closed_at': self.closed_at.isoformat() if self.closed_at else None,
+            'comments_count': len(self.comments)
+        }
+        
+        if profile == 'summary':
+            result['assignee'] = self.assignee.to_dict('embed') if self.assignee else None
+            result['reporter'] = self.reporter.to_dict('embed') if self.reporter else None
+            return result
+        
+        result.update({
+            'assignee': self.assignee.to_dict() if self.assignee else None,
+            'reporter': self.reporter.to_dict() if self.reporter else None,
             'comments': [comment.to_dict() for comment in self.comments],
-            'comments_count': len(self.comments),
             'problems': [p.id for p in self.problems],
             'alerts': [],  # 添加默认空数组以兼容前端
             'timeline': []  # 包含时间线数据
-        }
+        })
+        return result
 
 class IncidentComment(db.Model):
     """事件评论模型"""
@@ -171,6 +215,10 @@ class IncidentStatusLog(db.Model):
 class Problem(db.Model):
     """故障模型"""
     __tablename__ = 'problems'
+    __table_args__ = (
+        db.Index('idx_problems_created_at_id', 'created_at', 'id'),
+        db.Index('idx_problems_status_created_at_id', 'status', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -191,25 +239,25 @@ class Problem(db.Model):
     current_approval = db.relationship('Approval', foreign_keys=[current_approval_id])
     approvals = db.relationship('Approval', foreign_keys='Approval.problem_id', back_populates='problem')
     
-    def to_dict(self):
+    @classmethod
+    def loader_options(cls, profile='detail'):
+        """序列化配置所需的预加载选项"""
+        if profile == 'embed':
+            return []
+        return [selectinload(cls.incidents)]
+    
+    def to_dict(self, profile='detail'):
         """转换为字典"""
-        # 获取关联的故障ID（取第一个）
-        incident_id = None
-        if self.incidents:
-            # 从关联的故障中获取完整的incident_id
-            incident = self.incidents[0]
-            
-            # 直接使用故障的incident_id字段，它已经是F-格式
-            if hasattr(incident, 'incident_id'):
-                incident_id = incident.incident_id
-            else:
-                # 如果没有incident_id字段，尝试调用to_dict方法
-                try:
-                    incident_dict = incident.to_dict()
-                    incident_id = incident_dict.get('incident_id')
-                except Exception:
-                    # 最后尝试使用id字段生成F-格式
-                    incident_id = f"F-{incident.created_at.strftime('%Y%m%d') if incident.created_at else '00000000'}-{incident.id:03d}" if hasattr(incident, 'created_at') else str(incident.id)
+        if profile == 'embed':
+            return {
+                'id': self.id,
+                'title': self.title,
+                'status': self.status,
+                'priority': self.priority
+            }
+        
+        # 获取关联的故障ID（取第一个，返回完整的F-格式故障ID）
+        incident_id = self.incidents[0].formatted_incident_id if self.incidents else None
         
         return {
             'id': self.id,
@@ -1,7 +1,13 @@
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from app import db
+from app.utils.cache import TTLCache
 import uuid
 
+# /incidents-new/statistics 的结果缓存，故障创建或变更提交后失效
+incident_statistics_cache = TTLCache()
+
 class NewIncident(db.Model):
     """
     故障模型 - 代表已确认的、对业务产生影响的故障
@@ -9,6 +15,10 @@ class NewIncident(db.Model):
     一个故障可以关联多个告警
     """
     __tablename__ = 'incidents_new'
+    __table_args__ = (
+        db.Index('idx_incidents_new_created_at_id', 'created_at', 'id'),
+        db.Index('idx_incidents_new_status_created_at_id', 'status', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -66,15 +76,11 @@ class NewIncident(db.Model):
     
     @staticmethod
     def generate_incident_id():
-        """生成故障ID，格式：F-YYYYMMDD-NNN"""
-        today = datetime.now().strftime('%Y%m%d')
-        
-        # 查询今天已有的故障数量
-        today_count = NewIncident.query.filter(
-            NewIncident.incident_id.like(f'F-{today}-%')
-        ).count()
+        """生成故障ID，格式：F-YYYYMMDD-NNN，序号由按日计数的序列表分配"""
+        from app.utils.sequence import incident_id_allocator
         
-        return f'F-{today}-{today_count + 1:03d}'
+        today = datetime.now().date()
+        return f'F-{today.strftime("%Y%m%d")}-{incident_id_allocator.next_value(today):03d}'
     
     def to_dict(self):
         """转换为字典"""
@@ -108,6 +114,33 @@ class NewIncident(db.Model):
             'timeline': [entry.to_dict() for entry in self.timeline_entries] if self.timeline_entries else []
         }
     
+    @staticmethod
+    def _user_summary(user):
+        return {'id': user.id, 'username': user.username, 'real_name': user.real_name} if user else None
+    
+    def to_summary_dict(self, alerts_count=0, timeline_count=0):
+        """列表用的精简字典：人员只保留基本信息，关联告警和时间线只返回数量"""
+        return {
+            'id': self.id,
+            'incident_id': self.incident_id,
+            'title': self.title,
+            'status': self.status,
+            'severity': self.severity,
+            'affected_services': self.affected_services,
+            'commander': self._user_summary(self.commander),
+            'assignee': self._user_summary(self.assignee),
+            'reporter': self._user_summary(self.reporter),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'detected_at': self.detected_at.isoformat() if self.detected_at else None,
+            'recovered_at': self.recovered_at.isoformat() if self.recovered_at else None,
+            'closed_at': self.closed_at.isoformat() if self.closed_at else None,
+            'notification_sent': self.notification_sent,
+            'postmortem_id': self.postmortem_id,
+            'alerts_count': alerts_count,
+            'timeline_count': timeline_count
+        }
+    
     def change_status(self, new_status, user_id, comments=None):
         """变更故障状态"""
         old_status = self.status
@@ -165,6 +198,35 @@ class NewIncident(db.Model):
         self.updated_at = datetime.utcnow()
 
 
+@event.listens_for(NewIncident, 'after_insert')
+@event.listens_for(NewIncident, 'after_update')
+def _mark_incident_statistics_stale(mapper, connection, target):
+    """故障创建或状态变更写入后标记统计缓存待失效"""
+    session = Session.object_session(target)
+    if session is not None:
+        session.info['incident_statistics_stale'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_incident_statistics(session):
+    # 提交后再失效，避免并发请求在提交前重新缓存旧数据
+    if session.info.pop('incident_statistics_stale', False):
+        incident_statistics_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_incident_statistics_mark(session):
+    session.info.pop('incident_statistics_stale', None)
+
+
+class IncidentIdSequence(db.Model):
+    """故障ID按日序列：每天一行，last_value为当天已分配的最大序号"""
+    __tablename__ = 'incident_id_sequences'
+    
+    seq_date = db.Column(db.Date, primary_key=True, autoincrement=False, comment='日期')
+    last_value = db.Column(db.Integer, nullable=False, default=0, comment='已分配的最大序号')
+
+
 class IncidentTimeline(db.Model):
     """故障处理时间线模型"""
     __tablename__ = 'incident_timelines'
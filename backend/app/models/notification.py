@@ -142,6 +142,10 @@ class NotificationTemplate(db.Model):
 class NotificationLog(db.Model):
     """通知发送日志模型"""
     __tablename__ = 'notification_logs'
+    __table_args__ = (
+        db.Index('idx_notification_logs_created_at_id', 'created_at', 'id'),
+        db.Index('idx_notification_logs_batch_id', 'batch_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     rule_id = db.Column(db.Integer, db.ForeignKey('notification_rules.id'))
@@ -151,10 +155,11 @@ class NotificationLog(db.Model):
     target_user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     channel_type = db.Column(db.Enum('EMAIL', 'SMS', 'SLACK', 'TEAMS', 'DINGTALK', 'WEBHOOK', 'VOICE_CALL'), 
                            nullable=False)
-    status = db.Column(db.Enum('SUCCESS', 'FAILED'), nullable=False)
+    status = db.Column(db.Enum('PENDING', 'SUCCESS', 'FAILED'), nullable=False)
     request_content = db.Column(db.Text)
     response_content = db.Column(db.Text)
     external_id = db.Column(db.String(255))
+    batch_id = db.Column(db.String(32), comment='批量通知批次标识')
     
     # 语音电话特有字段
     call_duration = db.Column(db.Integer)
@@ -186,4 +191,139 @@ class NotificationLog(db.Model):
             'call_status': self.call_status,
             'dtmf_input': self.dtmf_input,
             'created_at': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
+        }
+
+class NotificationJob(db.Model):
+    """通知发送任务（outbox），由后台派发线程池发送并将结果回写到对应的NotificationLog"""
+    __tablename__ = 'notification_jobs'
+    __table_args__ = (
+        db.Index('idx_notification_jobs_status_available_at', 'status', 'available_at'),
+        db.Index('idx_notification_jobs_claimed_by', 'claimed_by'),
+        db.Index('idx_notification_jobs_batch_id', 'batch_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    channel_type = db.Column(db.Enum('EMAIL', 'SMS', 'SLACK', 'TEAMS', 'DINGTALK', 'WEBHOOK', 'VOICE_CALL'), 
+                           nullable=False)
+    channel_id = db.Column(db.Integer, db.ForeignKey('notification_channels.id'))
+    log_id = db.Column(db.Integer, db.ForeignKey('notification_logs.id'), nullable=False)
+    batch_id = db.Column(db.String(32), comment='批量通知批次标识')
+    recipient = db.Column(db.String(500), nullable=False, comment='收件地址：邮箱、手机号或Webhook地址')
+    subject = db.Column(db.String(255))
+    content = db.Column(db.Text, nullable=False)
+    options = db.Column(db.JSON, comment='渠道附加参数，如单条发送指定的webhook配置、语音播报参数')
+    status = db.Column(db.Enum('PENDING', 'SENDING', 'SUCCESS', 'FAILED'), nullable=False, default='PENDING')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    claimed_by = db.Column(db.String(32), comment='领取该任务的派发批次标识')
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, comment='最早可发送时间')
+    locked_at = db.Column(db.DateTime, comment='被领取的时间')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # 关系
+    channel = db.relationship('NotificationChannel', foreign_keys=[channel_id])
+    log = db.relationship('NotificationLog', foreign_keys=[log_id])
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'channel_type': self.channel_type,
+            'channel_id': self.channel_id,
+            'log_id': self.log_id,
+            'batch_id': self.batch_id,
+            'recipient': self.recipient,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'available_at': self.available_at.isoformat() if self.available_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class NotificationDeadLetter(db.Model):
+    """重试次数用尽仍发送失败的通知任务（死信），可批量重放"""
+    __tablename__ = 'notification_dead_letters'
+    __table_args__ = (
+        db.Index('idx_notification_dead_letters_replayed_at', 'replayed_at', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('notification_jobs.id'), nullable=False)
+    log_id = db.Column(db.Integer, db.ForeignKey('notification_logs.id'), nullable=False)
+    channel_type = db.Column(db.Enum('EMAIL', 'SMS', 'SLACK', 'TEAMS', 'DINGTALK', 'WEBHOOK', 'VOICE_CALL'), 
+                           nullable=False)
+    recipient = db.Column(db.String(500), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    replayed_at = db.Column(db.DateTime, comment='重放时间，为空表示尚未重放')
+    
+    # 关系
+    job = db.relationship('NotificationJob', foreign_keys=[job_id])
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'log_id': self.log_id,
+            'channel_type': self.channel_type,
+            'recipient': self.recipient,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'replayed_at': self.replayed_at.isoformat() if self.replayed_at else None
+        }
+
+class EscalationStep(db.Model):
+    """
+    通知升级步骤：严重故障的语音等通知发出后，按升级链在 due_at 到期时再次通知本人或其所在组的负责人，
+    故障状态变更或告警被确认时取消来源下全部待执行的步骤
+    """
+    __tablename__ = 'escalation_steps'
+    __table_args__ = (
+        db.Index('idx_escalation_steps_status_due_at', 'status', 'due_at'),
+        db.Index('idx_escalation_steps_source', 'source_type', 'source_id', 'status'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    source_type = db.Column(db.Enum('incident', 'new_incident', 'alert'), nullable=False, comment='升级来源类型')
+    source_id = db.Column(db.Integer, nullable=False, comment='升级来源记录ID')
+    trigger_event = db.Column(db.String(100), nullable=False)
+    step_no = db.Column(db.Integer, nullable=False, comment='升级级别，从1开始')
+    step_type = db.Column(db.Enum('REPEAT', 'MANAGER'), nullable=False, comment='REPEAT再次通知本人，MANAGER通知所在组负责人')
+    target_user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    channel_type = db.Column(db.Enum('EMAIL', 'SMS', 'SLACK', 'TEAMS', 'DINGTALK', 'WEBHOOK', 'VOICE_CALL'), 
+                           nullable=False)
+    recipient = db.Column(db.String(500), nullable=False)
+    subject = db.Column(db.String(255))
+    content = db.Column(db.Text, nullable=False)
+    options = db.Column(db.JSON)
+    status = db.Column(db.Enum('PENDING', 'FIRED', 'CANCELLED'), nullable=False, default='PENDING')
+    due_at = db.Column(db.DateTime, nullable=False, comment='到期时间')
+    claimed_by = db.Column(db.String(32), comment='执行该步骤的调度批次标识')
+    fired_at = db.Column(db.DateTime)
+    cancelled_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'source_type': self.source_type,
+            'source_id': self.source_id,
+            'trigger_event': self.trigger_event,
+            'step_no': self.step_no,
+            'step_type': self.step_type,
+            'target_user_id': self.target_user_id,
+            'channel_type': self.channel_type,
+            'recipient': self.recipient,
+            'status': self.status,
+            'due_at': self.due_at.isoformat() if self.due_at else None,
+            'fired_at': self.fired_at.isoformat() if self.fired_at else None,
+            'cancelled_at': self.cancelled_at.isoformat() if self.cancelled_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,30 @@
+from datetime import datetime
+from app import db
+from app.utils.sql import upsert_statement
+
+class ConfigVersion(db.Model):
+    """
+    配置版本号 - 各进程缓存的配置（权限、通知规则等）以此判断是否需要重新加载
+    每类配置一行，变更提交后递增version
+    """
+    __tablename__ = 'config_versions'
+    
+    name = db.Column(db.String(50), primary_key=True, comment='配置名称')
+    version = db.Column(db.Integer, nullable=False, default=0, comment='版本号')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
+    
+    @staticmethod
+    def get_version(name):
+        """读取配置的当前版本号，从未变更过时为0"""
+        version = db.session.query(ConfigVersion.version).filter_by(name=name).scalar()
+        return version or 0
+    
+    @staticmethod
+    def bump(name):
+        """递增配置版本号（不提交事务）"""
+        table = ConfigVersion.__table__
+        stmt = upsert_statement(table, [table.c.name], lambda table, inserted: {
+            'version': table.c.version + 1,
+            'updated_at': inserted.updated_at
+        })
+        db.session.execute(stmt, {'name': name, 'version': 1, 'updated_at': datetime.utcnow()})
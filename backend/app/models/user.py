@@ -2,6 +2,7 @@ from datetime import datetime
 from app import db
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import selectinload
 
 # 关联表定义
 user_group = db.Table('user_group',
@@ -71,8 +72,25 @@ class User(db.Model):
         
         return False
     
-    def to_dict(self):
+    @classmethod
+    def loader_options(cls, profile='detail', path=None):
+        """序列化配置所需的预加载选项；path为从上级对象到用户的加载路径"""
+        if profile == 'embed':
+            return []
+        if path is None:
+            return [selectinload(cls.groups), selectinload(cls.roles)]
+        return [path.selectinload(cls.groups), path.selectinload(cls.roles)]
+    
+    def to_dict(self, profile='detail'):
         """转换为字典"""
+        if profile == 'embed':
+            return {
+                'id': self.id,
+                'username': self.username,
+                'real_name': self.real_name,
+                'email': self.email
+            }
+        
         return {
             'id': self.id,
             'username': self.username,
@@ -0,0 +1,176 @@
+"""
+通知发送熔断与自适应并发
+熔断器按渠道类型和目标主机分别统计连续失败：达到阈值后打开（OPEN），期间不再向该渠道/主机发送，
+任务推迟到熔断恢复时间之后，不占用发送线程；恢复时间到后进入半开（HALF_OPEN）状态放行少量试探请求，
+试探成功则关闭（CLOSED），失败则重新打开。
+自适应并发按渠道类型实行AIMD：单条发送耗时在目标以内时并发上限逐步加一，超时或失败时按比例减小。
+状态为进程内状态，每个worker各自维护
+"""
+from typing import Any, Dict, List, Optional
+import math
+import threading
+import time
+
+CLOSED = 'CLOSED'
+OPEN = 'OPEN'
+HALF_OPEN = 'HALF_OPEN'
+
+
+class CircuitBreaker:
+    """三态熔断器"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30, half_open_max: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self._opened_count = 0
+        self._last_error: Optional[str] = None
+
+    def _current_state(self) -> str:
+        # 调用方持有锁；打开时间超过恢复时间后转为半开
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trials = 0
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def allow(self) -> bool:
+        """是否放行一次发送；半开状态下同时只放行 half_open_max 次试探"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._trials < self.half_open_max:
+                self._trials += 1
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        """距离熔断恢复（进入半开）的秒数，未打开时为0"""
+        with self._lock:
+            if self._current_state() != OPEN:
+                return 0.0
+            return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._current_state() == HALF_OPEN:
+                self._state = CLOSED
+                self._trials = 0
+
+    def record_failure(self, error: Optional[str] = None):
+        with self._lock:
+            self._last_error = error
+            state = self._current_state()
+            self._failures += 1
+            if state == HALF_OPEN or (state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._opened_count += 1
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trials = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            retry_after = max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0) if state == OPEN else 0.0
+            return {
+                'name': self.name,
+                'state': state,
+                'consecutive_failures': self._failures,
+                'opened_count': self._opened_count,
+                'retry_after': round(retry_after, 1),
+                'last_error': self._last_error
+            }
+
+
+class AdaptiveLimit:
+    """AIMD并发上限：每次在目标耗时内成功加 1/limit（约每轮加一），超时或失败乘以 decrease_factor"""
+
+    def __init__(self, max_limit: int, min_limit: int = 1, latency_target: float = 2.0, decrease_factor: float = 0.5):
+        self.max_limit = max(max_limit, min_limit)
+        self.min_limit = min_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+
+        self._lock = threading.Lock()
+        self._limit = float(self.max_limit)
+        self._latency: Optional[float] = None
+
+    @property
+    def limit(self) -> int:
+        return max(int(math.floor(self._limit)), self.min_limit)
+
+    def update(self, latency: float, failed: bool = False):
+        """按一批发送的平均单条耗时和是否出现失败调整上限"""
+        with self._lock:
+            self._latency = latency if self._latency is None else self._latency * 0.8 + latency * 0.2
+            if failed or latency > self.latency_target:
+                self._limit = max(self._limit * self.decrease_factor, float(self.min_limit))
+            else:
+                self._limit = min(self._limit + 1.0 / max(self._limit, 1.0), float(self.max_limit))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'max_limit': self.max_limit,
+                'latency_target': self.latency_target,
+                'avg_latency': round(self._latency, 3) if self._latency is not None else None
+            }
+
+
+class BreakerRegistry:
+    """按名称（"channel:DINGTALK"、"host:oapi.dingtalk.com"）创建和查找熔断器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.failure_threshold = 5
+        self.reset_timeout = 30.0
+        self.half_open_max = 1
+
+    def configure(self, failure_threshold: int, reset_timeout: float, half_open_max: int):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        with self._lock:
+            self._breakers = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    breaker = self._breakers[name] = CircuitBreaker(
+                        name, self.failure_threshold, self.reset_timeout, self.half_open_max
+                    )
+        return breaker
+
+    def find(self, name: str) -> Optional[CircuitBreaker]:
+        return self._breakers.get(name)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return sorted((breaker.snapshot() for breaker in breakers), key=lambda item: item['name'])
+
+
+notification_breakers = BreakerRegistry()
@@ -0,0 +1,699 @@
+"""
+通知异步派发
+接口只在事务内写入发送任务（outbox）和待处理的NotificationLog并立即返回任务ID；
+每个进程的后台线程领取待发送任务，交给有界线程池发送，按渠道类型限制并发数，
+发送结果回写到任务和NotificationLog。任务领取通过批次标识实现，多进程同时派发不会重复领取。
+发送失败的任务按渠道重试策略（指数退避加随机抖动）推迟 available_at 后重新进入待发送状态，
+待重试任务由 (status, available_at) 索引排序，领取到期任务的代价为O(log n)；
+派发线程用最小堆记录本进程安排的重试时间，到期即唤醒。重试次数用尽的任务写入死信表，可批量重放
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import joinedload
+from app import db, mail
+from app.models.notification import NotificationChannel, NotificationJob, NotificationLog, NotificationDeadLetter
+from app.notification.service import (
+    EmailChannel, SMSChannel, WebhookChannel, VoiceCallChannel
+)
+from app.notification.breaker import AdaptiveLimit, notification_breakers, OPEN, HALF_OPEN
+from app.utils.cache import TTLCache
+from app.utils.metrics import NOTIFICATION_SENT, NOTIFICATION_LATENCY, QUEUE_DEPTH
+import atexit
+import heapq
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_CHANNEL_TYPES = ('DINGTALK', 'SLACK', 'TEAMS', 'WEBHOOK')
+
+# 渠道配置缓存，键为 (渠道类型, 渠道ID)；本进程修改渠道时主动失效，其他worker依靠TTL过期
+channel_config_cache = TTLCache()
+
+
+def parse_channel_limits(spec: str) -> Dict[str, int]:
+    """解析渠道并发上限配置，格式为 "EMAIL=4,WEBHOOK=16" """
+    limits = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            channel_type, _, limit = item.partition('=')
+            limits[channel_type.strip().upper()] = int(limit)
+    return limits
+
+
+class RetryPolicy:
+    """发送失败后的重试策略：最多发送次数、首次重试延迟和最大延迟（秒）"""
+
+    __slots__ = ('max_attempts', 'base_delay', 'max_delay')
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay_for(self, attempts: int) -> float:
+        """第attempts次发送失败后的等待时间：指数退避，在上限的一半到上限之间随机抖动，避免重试集中到达"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** max(attempts - 1, 0)))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+def parse_retry_policies(spec: str, default: RetryPolicy) -> Dict[str, RetryPolicy]:
+    """
+    解析渠道重试策略配置，格式为 "渠道=最多发送次数[:首次延迟[:最大延迟]],..."，
+    例如 "DINGTALK=8:5:300,EMAIL=5"；省略的部分使用默认策略
+    """
+    policies = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        channel_type, _, values = item.partition('=')
+        parts = [part.strip() for part in values.split(':')]
+        policies[channel_type.strip().upper()] = RetryPolicy(
+            int(parts[0]) if parts[0] else default.max_attempts,
+            float(parts[1]) if len(parts) > 1 and parts[1] else default.base_delay,
+            float(parts[2]) if len(parts) > 2 and parts[2] else default.max_delay
+        )
+    return policies
+
+
+def resolve_channel_config(channel_type: str, channel_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    获取渠道配置（带缓存），同一渠道的大量任务只查询一次
+    未指定渠道ID的邮件任务使用第一个启用的邮件渠道
+    """
+    def load():
+        if channel_id is not None:
+            channel = NotificationChannel.query.get(channel_id)
+        elif channel_type == 'EMAIL':
+            channel = NotificationChannel.query.filter_by(type='EMAIL', is_active=True).first()
+        else:
+            channel = None
+        return dict(channel.config) if channel is not None and channel.config else None
+
+    return channel_config_cache.get_or_load(
+        (channel_type, channel_id), load, current_app.config['NOTIFICATION_CHANNEL_CACHE_TTL']
+    )
+
+
+def build_channel(channel_type: str, channel_config: Optional[Dict[str, Any]] = None, options: Optional[Dict[str, Any]] = None):
+    """根据渠道类型和渠道配置构造发送渠道实例"""
+    config = current_app.config
+    options = options or {}
+
+    if channel_type == 'EMAIL':
+        if not channel_config:
+            raise ValueError('未找到启用的邮件渠道配置')
+        email_config = channel_config
+        return EmailChannel({
+            'smtp_server': email_config['smtp_host'],
+            'smtp_port': email_config['smtp_port'],
+            'username': email_config['smtp_username'],
+            'password': email_config['smtp_password'],
+            'use_tls': email_config.get('use_tls', True)
+        }, mail)
+
+    if channel_type == 'SMS':
+        return SMSChannel({
+            'api_url': config.get('SMS_API_URL'),
+            'access_key': config.get('SMS_ACCESS_KEY_ID'),
+            'access_secret': config.get('SMS_ACCESS_KEY_SECRET'),
+            'sign_name': config.get('SMS_SIGN_NAME')
+        })
+
+    if channel_type == 'VOICE_CALL':
+        return VoiceCallChannel({
+            'api_url': config.get('VOICE_CALL_API_URL'),
+            'api_key': config.get('VOICE_CALL_API_KEY'),
+            'from_number': config.get('VOICE_CALL_FROM_NUMBER')
+        })
+
+    if channel_type in WEBHOOK_CHANNEL_TYPES:
+        webhook_config = options.get('webhook_config')
+        if not webhook_config:
+            if not channel_config:
+                raise ValueError(f'未找到{channel_type}渠道配置')
+            # 渠道配置中的超时、重试、连接池参数原样传给Webhook渠道
+            webhook_config = dict(channel_config)
+            webhook_config.setdefault('webhook_type', 'dingtalk' if channel_type == 'DINGTALK' else 'generic')
+            webhook_config.setdefault('method', 'POST')
+            webhook_config.setdefault('headers', {'Content-Type': 'application/json'})
+        return WebhookChannel(webhook_config)
+
+    raise ValueError(f'不支持的通知渠道类型: {channel_type}')
+
+
+def enqueue_notification(
+    channel_type: str,
+    recipient: str,
+    content: str,
+    subject: Optional[str] = None,
+    channel_id: Optional[int] = None,
+    options: Optional[Dict[str, Any]] = None,
+    target_user_id: Optional[int] = None,
+    trigger_event: str = 'incident_notification',
+    trigger_record_id: int = 0,
+    rule_id: Optional[int] = None,
+    template_id: Optional[int] = None,
+    request_content: Optional[str] = None
+) -> NotificationJob:
+    """
+    写入一条待发送任务及其PENDING状态的通知日志（不提交事务）
+    调用方提交后调用 notification_dispatcher.wake() 可让本进程立即派发
+    """
+    log = NotificationLog(
+        rule_id=rule_id,
+        template_id=template_id,
+        trigger_event=trigger_event,
+        trigger_record_id=trigger_record_id or 0,
+        target_user_id=target_user_id,
+        channel_type=channel_type,
+        status='PENDING',
+        request_content=request_content or recipient
+    )
+    job = NotificationJob(
+        channel_type=channel_type,
+        channel_id=channel_id,
+        log=log,
+        recipient=recipient,
+        subject=subject,
+        content=content,
+        options=options,
+        status='PENDING',
+        available_at=datetime.utcnow()
+    )
+    db.session.add(log)
+    db.session.add(job)
+    return job
+
+
+def enqueue_notification_batch(
+    targets: List[Dict[str, Any]],
+    trigger_event: str = 'incident_notification',
+    trigger_record_id: int = 0
+) -> Tuple[str, List[int]]:
+    """
+    批量写入发送任务（不提交事务）：日志和任务各用一次多行INSERT写入，不逐条flush
+    targets 每项包含 channel_type、recipient、content，可选 subject、channel_id、options、
+    target_user_id、rule_id、template_id、request_content，以及覆盖批次默认值的
+    trigger_event、trigger_record_id；返回 (批次ID, 与targets一一对应的任务ID)
+    """
+    if not targets:
+        return None, []
+
+    batch_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    db.session.execute(insert(NotificationLog), [
+        {
+            'batch_id': batch_id,
+            'trigger_event': target.get('trigger_event', trigger_event),
+            'trigger_record_id': target.get('trigger_record_id', trigger_record_id) or 0,
+            'rule_id': target.get('rule_id'),
+            'template_id': target.get('template_id'),
+            'target_user_id': target.get('target_user_id'),
+            'channel_type': target['channel_type'],
+            'status': 'PENDING',
+            'request_content': target.get('request_content') or target['recipient'],
+            'created_at': now
+        }
+        for target in targets
+    ])
+    # 同一语句插入的行按插入顺序分配递增的自增ID，按ID排序即与targets顺序一致
+    log_ids = [log_id for (log_id,) in db.session.query(NotificationLog.id).filter(
+        NotificationLog.batch_id == batch_id
+    ).order_by(NotificationLog.id)]
+
+    db.session.execute(insert(NotificationJob), [
+        {
+            'batch_id': batch_id,
+            'channel_type': target['channel_type'],
+            'channel_id': target.get('channel_id'),
+            'log_id': log_id,
+            'recipient': target['recipient'],
+            'subject': target.get('subject'),
+            'content': target['content'],
+            'options': target.get('options'),
+            'status': 'PENDING',
+            'attempts': 0,
+            'available_at': now,
+            'created_at': now,
+            'updated_at': now
+        }
+        for target, log_id in zip(targets, log_ids)
+    ])
+    job_ids = [job_id for (job_id,) in db.session.query(NotificationJob.id).filter(
+        NotificationJob.batch_id == batch_id
+    ).order_by(NotificationJob.id)]
+    return batch_id, job_ids
+
+
+def replay_dead_letters(dead_letter_ids: Optional[List[int]] = None, channel_type: Optional[str] = None,
+                        limit: int = 1000) -> int:
+    """
+    将未重放的死信对应的任务重新置为待发送（重置发送次数，不提交事务），返回重放数量；
+    指定dead_letter_ids时只重放这些死信，否则按渠道类型筛选最早的limit条
+    """
+    query = db.session.query(NotificationDeadLetter.id, NotificationDeadLetter.job_id).filter(
+        NotificationDeadLetter.replayed_at.is_(None)
+    )
+    if dead_letter_ids:
+        query = query.filter(NotificationDeadLetter.id.in_(dead_letter_ids))
+    if channel_type:
+        query = query.filter(NotificationDeadLetter.channel_type == channel_type)
+    rows = query.order_by(NotificationDeadLetter.id).limit(limit).all()
+    if not rows:
+        return 0
+
+    now = datetime.utcnow()
+    letter_ids = [letter_id for letter_id, _ in rows]
+    job_ids = [job_id for _, job_id in rows]
+    db.session.execute(
+        update(NotificationDeadLetter).where(NotificationDeadLetter.id.in_(letter_ids)).values(replayed_at=now)
+    )
+    db.session.execute(
+        update(NotificationJob).where(NotificationJob.id.in_(job_ids), NotificationJob.status == 'FAILED').values(
+            status='PENDING', attempts=0, last_error=None, claimed_by=None, locked_at=None,
+            available_at=now, updated_at=now
+        )
+    )
+    db.session.execute(
+        update(NotificationLog).where(
+            NotificationLog.id.in_(db.session.query(NotificationJob.log_id).filter(NotificationJob.id.in_(job_ids)))
+        ).values(status='PENDING')
+    )
+    return len(rows)
+
+
+class NotificationDispatcher:
+    """领取outbox中的待发送任务并交给线程池发送"""
+
+    def __init__(self):
+        self.enabled = True
+        self.workers = 8
+        self.default_limit = 4
+        self.channel_limits: Dict[str, int] = {}
+        self.chunk_sizes: Dict[str, int] = {}
+        self.poll_interval = 1.0
+        self.batch_size = 100
+        self.job_timeout = 300
+        self.default_retry_policy = RetryPolicy(5, 10, 1800)
+        self.retry_policies: Dict[str, RetryPolicy] = {}
+        self.adaptive_concurrency = True
+        self.latency_target = 2.0
+        self._limiters: Dict[str, AdaptiveLimit] = {}
+
+        self._cond = threading.Condition()
+        self._retry_heap: List[int] = []
+        self._retry_scheduled = set()
+        self._in_flight = defaultdict(int)
+        self._executor = None
+        self._poller = None
+        self._pid = None
+        self._app = None
+        self._stopping = False
+        self._last_recovery = 0.0
+
+    def configure(self, app):
+        config = app.config
+        self.enabled = config['NOTIFICATION_DISPATCH_ENABLED']
+        self.workers = config['NOTIFICATION_WORKERS']
+        self.default_limit = config['NOTIFICATION_CHANNEL_DEFAULT_CONCURRENCY']
+        self.channel_limits = parse_channel_limits(config['NOTIFICATION_CHANNEL_CONCURRENCY'])
+        self.chunk_sizes = parse_channel_limits(config['NOTIFICATION_CHANNEL_BATCH_SIZE'])
+        self.poll_interval = config['NOTIFICATION_POLL_INTERVAL']
+        self.batch_size = config['NOTIFICATION_CLAIM_BATCH_SIZE']
+        self.job_timeout = config['NOTIFICATION_JOB_TIMEOUT']
+        self.default_retry_policy = RetryPolicy(
+            config['NOTIFICATION_RETRY_MAX_ATTEMPTS'],
+            config['NOTIFICATION_RETRY_BASE_DELAY'],
+            config['NOTIFICATION_RETRY_MAX_DELAY']
+        )
+        self.retry_policies = parse_retry_policies(config['NOTIFICATION_RETRY_POLICIES'], self.default_retry_policy)
+        self.adaptive_concurrency = config['NOTIFICATION_ADAPTIVE_CONCURRENCY']
+        self.latency_target = config['NOTIFICATION_LATENCY_TARGET']
+        self._limiters = {}
+        notification_breakers.configure(
+            config['NOTIFICATION_BREAKER_FAILURE_THRESHOLD'],
+            config['NOTIFICATION_BREAKER_RESET_TIMEOUT'],
+            config['NOTIFICATION_BREAKER_HALF_OPEN_MAX']
+        )
+        self._app = app
+
+    def limit_for(self, channel_type: str) -> int:
+        """渠道同时执行的发送批次数（即同时占用的连接数）"""
+        return min(self.channel_limits.get(channel_type, self.default_limit), self.workers)
+
+    def limiter_for(self, channel_type: str) -> AdaptiveLimit:
+        limiter = self._limiters.get(channel_type)
+        if limiter is None:
+            limiter = self._limiters.setdefault(
+                channel_type, AdaptiveLimit(self.limit_for(channel_type), latency_target=self.latency_target)
+            )
+        return limiter
+
+    def effective_limit(self, channel_type: str) -> int:
+        """当前生效的并发批次上限：启用自适应并发时由AIMD在1和配置上限之间调整"""
+        if not self.adaptive_concurrency:
+            return self.limit_for(channel_type)
+        return self.limiter_for(channel_type).limit
+
+    def concurrency_snapshot(self) -> List[Dict[str, Any]]:
+        """各渠道的并发上限和正在发送的批次数"""
+        with self._cond:
+            in_flight = dict(self._in_flight)
+        channel_types = sorted(set(in_flight) | set(self._limiters))
+        result = []
+        for channel_type in channel_types:
+            item = {
+                'channel_type': channel_type,
+                'in_flight': in_flight.get(channel_type, 0),
+                'limit': self.effective_limit(channel_type),
+                'max_limit': self.limit_for(channel_type)
+            }
+            if channel_type in self._limiters:
+                item['avg_latency'] = self._limiters[channel_type].snapshot()['avg_latency']
+            result.append(item)
+        return result
+
+    def retry_policy_for(self, channel_type: str) -> RetryPolicy:
+        return self.retry_policies.get(channel_type, self.default_retry_policy)
+
+    def chunk_size_for(self, channel_type: str) -> int:
+        """渠道一个发送批次包含的任务数，邮件等可复用连接的渠道一次发送多条"""
+        return max(self.chunk_sizes.get(channel_type, 1), 1)
+
+    def ensure_started(self):
+        """在当前进程内启动派发线程和发送线程池（gunicorn fork后的worker各自启动）"""
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._in_flight = defaultdict(int)
+            self._retry_heap = []
+            self._retry_scheduled = set()
+            self._stopping = False
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='notification-sender')
+            self._poller = threading.Thread(target=self._run, name='notification-dispatcher', daemon=True)
+            self._poller.start()
+            self._pid = os.getpid()
+
+    def wake(self):
+        """有新任务提交时唤醒派发线程，不必等到下一次轮询"""
+        self.ensure_started()
+        with self._cond:
+            self._cond.notify()
+
+    def stop(self, timeout: float = 5.0):
+        """进程退出前停止领取新任务，等待已领取的任务发送完成"""
+        if self._pid != os.getpid():
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._poller.join(timeout)
+        self._executor.shutdown(wait=True)
+
+    def _run(self):
+        while not self._stopping:
+            with self._app.app_context():
+                try:
+                    self._recover_stale()
+                    claimed = self._claim()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f'Notification dispatch error: {str(e)}')
+                    claimed = 0
+                finally:
+                    db.session.remove()
+
+            # 本轮领满时立即继续领取，否则等待新任务提交、发送完成释放并发额度、重试到期或轮询超时
+            if claimed < self.batch_size:
+                with self._cond:
+                    if not self._stopping:
+                        self._cond.wait(self._next_wait())
+
+    def _next_wait(self) -> float:
+        """距下一个重试到期的时间，不超过轮询间隔（调用方持有锁）"""
+        now = time.time()
+        while self._retry_heap and self._retry_heap[0] <= now:
+            self._retry_scheduled.discard(heapq.heappop(self._retry_heap))
+        if not self._retry_heap:
+            return self.poll_interval
+        return min(self.poll_interval, self._retry_heap[0] - now)
+
+    def _schedule_retries(self, due_times: List[float]):
+        """记录本进程安排的重试到期时间（按秒取整去重），最早到期时间提前时唤醒派发线程"""
+        if not due_times:
+            return
+        with self._cond:
+            earliest = self._retry_heap[0] if self._retry_heap else None
+            for due in set(int(due) + 1 for due in due_times) - self._retry_scheduled:
+                self._retry_scheduled.add(due)
+                heapq.heappush(self._retry_heap, due)
+            if earliest is None or self._retry_heap[0] < earliest:
+                self._cond.notify()
+
+    def _recover_stale(self):
+        """领取后超时未完成的任务（发送进程已退出）重新置为待发送，可能导致重复发送"""
+        now = time.monotonic()
+        if now - self._last_recovery < self.job_timeout / 2:
+            return
+        self._last_recovery = now
+
+        deadline = datetime.utcnow() - timedelta(seconds=self.job_timeout)
+        result = db.session.execute(
+            update(NotificationJob)
+            .where(NotificationJob.status == 'SENDING', NotificationJob.locked_at < deadline)
+            .values(status='PENDING', claimed_by=None, locked_at=None)
+        )
+        db.session.commit()
+        if result.rowcount:
+            logger.warning(f'Requeued {result.rowcount} stale notification jobs')
+
+    def _claim(self) -> int:
+        """按各渠道剩余并发额度领取待发送任务，分批提交到线程池，返回领取数量"""
+        now = datetime.utcnow()
+        pending = db.session.query(NotificationJob.channel_type, func.count(NotificationJob.id)).filter(
+            NotificationJob.status == 'PENDING',
+            NotificationJob.available_at <= now
+        ).group_by(NotificationJob.channel_type).all()
+        QUEUE_DEPTH.labels('notification_outbox').set(sum(count for _, count in pending))
+
+        # 并发额度以发送批次计，每个批次占用一个发送线程
+        with self._cond:
+            free_workers = self.workers - sum(self._in_flight.values())
+            quotas = {}
+            for channel_type, count in pending:
+                # 渠道熔断打开时不领取其任务，不占用发送线程；半开时只领取一个批次试探
+                state = notification_breakers.get(f'channel:{channel_type}').state
+                if state == OPEN:
+                    continue
+                limit = 1 if state == HALF_OPEN else self.effective_limit(channel_type)
+                chunk_size = self.chunk_size_for(channel_type)
+                chunks = min(-(-count // chunk_size), limit - self._in_flight[channel_type], free_workers)
+                if chunks > 0:
+                    quotas[channel_type] = chunks
+                    free_workers -= chunks
+
+        claimed = 0
+        for channel_type, chunks in quotas.items():
+            chunk_size = self.chunk_size_for(channel_type)
+            job_ids = [job_id for (job_id,) in db.session.query(NotificationJob.id).filter(
+                NotificationJob.status == 'PENDING',
+                NotificationJob.channel_type == channel_type,
+                NotificationJob.available_at <= now
+            ).order_by(NotificationJob.id).limit(min(chunks * chunk_size, self.batch_size))]
+            if not job_ids:
+                continue
+
+            token = uuid.uuid4().hex
+            db.session.execute(
+                update(NotificationJob)
+                .where(NotificationJob.id.in_(job_ids), NotificationJob.status == 'PENDING')
+                .values(status='SENDING', claimed_by=token, locked_at=now, attempts=NotificationJob.attempts + 1)
+            )
+            db.session.commit()
+
+            # 只有批次标识匹配的行才是本进程领取成功的，其余已被其他进程领走
+            job_ids = [job_id for (job_id,) in db.session.query(NotificationJob.id).filter(
+                NotificationJob.claimed_by == token
+            ).order_by(NotificationJob.id)]
+            chunk_list = [job_ids[i:i + chunk_size] for i in range(0, len(job_ids), chunk_size)]
+            with self._cond:
+                self._in_flight[channel_type] += len(chunk_list)
+            for chunk in chunk_list:
+                self._executor.submit(self._deliver, chunk, channel_type)
+            claimed += len(job_ids)
+        return claimed
+
+    def _deliver(self, job_ids: List[int], channel_type: str):
+        with self._app.app_context():
+            try:
+                self._send(job_ids)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f'Notification jobs {job_ids} delivery error: {str(e)}')
+            finally:
+                db.session.remove()
+                with self._cond:
+                    self._in_flight[channel_type] -= 1
+                    self._cond.notify()
+
+    def _send(self, job_ids: List[int]):
+        jobs = NotificationJob.query.options(joinedload(NotificationJob.log)).filter(
+            NotificationJob.id.in_(job_ids),
+            NotificationJob.status == 'SENDING'
+        ).order_by(NotificationJob.id).all()
+
+        # 同一渠道配置的任务通过一个渠道实例批量发送（邮件复用同一个SMTP连接）
+        groups = defaultdict(list)
+        for job in jobs:
+            options = job.options or {}
+            groups[(job.channel_type, job.channel_id, json.dumps(options.get('webhook_config'), sort_keys=True))].append(job)
+
+        retry_times = []
+        for (channel_type, channel_id, _), group in groups.items():
+            options = group[0].options
+            try:
+                channel_config = None if (options or {}).get('webhook_config') else \
+                    resolve_channel_config(channel_type, channel_id)
+                channel = build_channel(channel_type, channel_config, options)
+            except Exception as e:
+                logger.error(f'Notification jobs {[job.id for job in group]} send error: {str(e)}')
+                for job in group:
+                    NOTIFICATION_SENT.labels(channel_type, 'FAILED').inc()
+                    due = self._record_result(job, {'status': 'FAILED', 'message': str(e), 'external_id': None})
+                    if due is not None:
+                        retry_times.append(due)
+                continue
+            retry_times.extend(self._send_group(channel_type, channel, group))
+        db.session.commit()
+        self._schedule_retries(retry_times)
+
+    def _send_group(self, channel_type: str, channel, group: List[NotificationJob]) -> List[float]:
+        """
+        经渠道和目标主机的熔断器分段发送同一渠道配置的任务，返回重试到期时间；
+        熔断打开时剩余任务推迟到恢复之后，不计入发送次数
+        """
+        retry_times = []
+        channel_breaker = notification_breakers.get(f'channel:{channel_type}')
+        endpoint = channel.endpoint()
+        host_breaker = notification_breakers.get(f'host:{endpoint}') if endpoint else None
+        # 每段不超过熔断阈值，目标挂起时至多一段任务等待超时
+        slice_size = max(notification_breakers.failure_threshold, 1)
+
+        for start in range(0, len(group), slice_size):
+            # 先检查主机再检查渠道，避免主机熔断时占用渠道的半开试探名额
+            if (host_breaker is not None and not host_breaker.allow()) or not channel_breaker.allow():
+                delay = max(channel_breaker.retry_after(), host_breaker.retry_after() if host_breaker else 0.0,
+                            notification_breakers.reset_timeout / 10)
+                retry_times.extend(self._defer(group[start:], delay))
+                break
+
+            jobs = group[start:start + slice_size]
+            started = time.perf_counter()
+            try:
+                results = channel.send_batch([
+                    (job.recipient, job.subject or '', job.content, (job.options or {}).get('send_kwargs', {}))
+                    for job in jobs
+                ])
+            except Exception as e:
+                logger.error(f'Notification jobs {[job.id for job in jobs]} send error: {str(e)}')
+                results = [{'status': 'FAILED', 'message': str(e), 'external_id': None}] * len(jobs)
+
+            elapsed = (time.perf_counter() - started) / len(jobs)
+            failed = False
+            for job, result in zip(jobs, results):
+                NOTIFICATION_LATENCY.labels(channel_type).observe(elapsed)
+                NOTIFICATION_SENT.labels(channel_type, result['status']).inc()
+                # 不可重试的失败（如收件人被拒绝）说明目标可达，不计入熔断
+                if result['status'] != 'SUCCESS' and result.get('retryable', True):
+                    failed = True
+                    channel_breaker.record_failure(result.get('message'))
+                    if host_breaker is not None:
+                        host_breaker.record_failure(result.get('message'))
+                else:
+                    channel_breaker.record_success()
+                    if host_breaker is not None:
+                        host_breaker.record_success()
+                due = self._record_result(job, result)
+                if due is not None:
+                    retry_times.append(due)
+            if self.adaptive_concurrency:
+                self.limiter_for(channel_type).update(elapsed, failed)
+        return retry_times
+
+    @staticmethod
+    def _defer(jobs: List[NotificationJob], delay: float) -> List[float]:
+        """熔断期间未发送的任务重新置为待发送，撤销领取时增加的发送次数"""
+        available_at = datetime.utcnow() + timedelta(seconds=delay)
+        for job in jobs:
+            job.status = 'PENDING'
+            job.attempts = max(job.attempts - 1, 0)
+            job.claimed_by = None
+            job.locked_at = None
+            job.available_at = available_at
+        logger.warning(f'Circuit open, deferred {len(jobs)} notification jobs by {delay:.1f}s')
+        return [time.time() + delay]
+
+    def _record_result(self, job: NotificationJob, result: Dict[str, Any]) -> Optional[float]:
+        """
+        回写发送结果；可重试的失败在次数未用尽时推迟后重新置为待发送，返回重试到期时间戳，
+        不可重试或次数用尽时标记失败并写入死信表
+        """
+        log = job.log
+        job.claimed_by = None
+        log.response_content = result.get('message', '')
+
+        if result['status'] == 'SUCCESS':
+            job.status = 'SUCCESS'
+            job.last_error = None
+            log.status = 'SUCCESS'
+            log.external_id = result.get('external_id')
+            log.call_duration = result.get('call_duration')
+            log.call_status = result.get('call_status')
+            return None
+
+        job.last_error = result.get('message')
+        policy = self.retry_policy_for(job.channel_type)
+        if result.get('retryable', True) and job.attempts < policy.max_attempts:
+            delay = policy.delay_for(job.attempts)
+            job.status = 'PENDING'
+            job.locked_at = None
+            job.available_at = datetime.utcnow() + timedelta(seconds=delay)
+            logger.warning(f'Notification job {job.id} attempt {job.attempts} failed, retry in {delay:.1f}s: {job.last_error}')
+            return time.time() + delay
+
+        job.status = 'FAILED'
+        log.status = 'FAILED'
+        log.call_status = result.get('call_status')
+        db.session.add(NotificationDeadLetter(
+            job_id=job.id,
+            log_id=job.log_id,
+            channel_type=job.channel_type,
+            recipient=job.recipient,
+            attempts=job.attempts,
+            last_error=job.last_error
+        ))
+        return None
+
+
+notification_dispatcher = NotificationDispatcher()
+
+
+def init_notification_dispatcher(app):
+    """根据应用配置初始化通知派发器，各worker在处理首个请求时启动派发线程"""
+    notification_dispatcher.configure(app)
+    if notification_dispatcher.enabled:
+        app.before_request(notification_dispatcher.ensure_started)
+        atexit.register(notification_dispatcher.stop)
+    return notification_dispatcher
@@ -0,0 +1,318 @@
+"""
+通知升级调度
+严重故障的语音电话等通知发出后，按升级链写入带到期时间的升级步骤（escalation_steps），
+例如5分钟后再次呼叫本人、10分钟后呼叫其所在组的负责人。
+每个进程一个调度线程，按 (status, due_at) 索引取出到期步骤批量写入通知发送队列，
+空闲时睡眠到最早的到期时间，不逐个轮询进行中的升级；
+故障状态变更或告警被确认时，在同一事务中取消该来源下全部待执行的步骤
+"""
+from typing import Any, Dict, List, Tuple
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, insert, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from app import db
+from app.models import Alert, EscalationStep, Group, Incident, NewIncident, User
+from app.models.user import user_group
+from app.notification.dispatcher import enqueue_notification_batch, notification_dispatcher
+from app.notification.recipients import Recipient
+import atexit
+import os
+import threading
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+ESCALATION_STEP_TYPES = ('REPEAT', 'MANAGER')
+
+
+def parse_escalation_steps(spec: str) -> List[Tuple[str, int]]:
+    """
+    解析升级链配置，格式为 "步骤类型=距首次通知的秒数,..."，例如 "REPEAT=300,MANAGER=600"；
+    REPEAT 再次通知本人，MANAGER 通知本人所在组的负责人
+    """
+    steps = []
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        step_type, _, delay = item.partition('=')
+        step_type = step_type.strip().upper()
+        if step_type not in ESCALATION_STEP_TYPES:
+            raise ValueError(f'Unsupported escalation step type: {step_type}')
+        steps.append((step_type, int(delay)))
+    return sorted(steps, key=lambda step: step[1])
+
+
+def schedule_escalations(source_type: str, source_id: int, trigger_event: str,
+                         targets: List[Dict[str, Any]], steps: List[Tuple[str, int]]) -> int:
+    """
+    为已发出的通知写入升级步骤（一次多行INSERT，不提交事务），返回写入的步骤数
+    targets 为 enqueue_notification_batch 使用的通知参数
+    """
+    if not targets or not steps:
+        return 0
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            'source_type': source_type,
+            'source_id': source_id,
+            'trigger_event': trigger_event,
+            'step_no': step_no,
+            'step_type': step_type,
+            'target_user_id': target.get('target_user_id'),
+            'channel_type': target['channel_type'],
+            'recipient': target['recipient'],
+            'subject': target.get('subject'),
+            'content': target['content'],
+            'options': target.get('options'),
+            'status': 'PENDING',
+            'due_at': now + timedelta(seconds=delay),
+            'created_at': now
+        }
+        for target in targets
+        for step_no, (step_type, delay) in enumerate(steps, start=1)
+    ]
+    db.session.execute(insert(EscalationStep), rows)
+    db.session.info['escalations_scheduled'] = True
+    return len(rows)
+
+
+def cancel_escalations(source_type: str, source_ids: List[int], session=None) -> int:
+    """取消来源下全部待执行的升级步骤（不提交事务），返回取消的步骤数"""
+    if not source_ids:
+        return 0
+    session = session or db.session
+    result = session.execute(
+        update(EscalationStep.__table__).where(
+            EscalationStep.__table__.c.source_type == source_type,
+            EscalationStep.__table__.c.source_id.in_(source_ids),
+            EscalationStep.__table__.c.status == 'PENDING'
+        ).values(status='CANCELLED', cancelled_at=datetime.utcnow())
+    )
+    return result.rowcount
+
+
+def _load_managers(user_ids: List[int]) -> Dict[int, List[Recipient]]:
+    """用一条查询取出各用户所在组的启用负责人（不含本人）"""
+    if not user_ids:
+        return {}
+    rows = db.session.query(
+        user_group.c.user_id, User.id, User.username, User.email, User.phone_number
+    ).join(
+        Group, Group.id == user_group.c.group_id
+    ).join(
+        User, User.id == Group.manager_id
+    ).filter(
+        user_group.c.user_id.in_(user_ids),
+        User.is_active == True,
+        User.id != user_group.c.user_id
+    ).distinct()
+
+    managers = defaultdict(list)
+    for user_id, manager_id, username, email, phone_number in rows:
+        # 升级通知针对严重故障，不受负责人个人的渠道偏好限制
+        managers[user_id].append(Recipient(manager_id, username, email, phone_number, frozenset()))
+    return managers
+
+
+def _build_step_targets(steps: List[EscalationStep]) -> List[Dict[str, Any]]:
+    """把到期步骤转换为通知参数；同一来源、同一级别的负责人只通知一次"""
+    managers = _load_managers(list({
+        step.target_user_id for step in steps if step.step_type == 'MANAGER' and step.target_user_id
+    }))
+
+    targets = []
+    notified = set()
+    for step in steps:
+        if step.step_type == 'REPEAT':
+            recipients = [(step.target_user_id, step.recipient)]
+        else:
+            recipients = [
+                (manager.user_id, manager.address_for(step.channel_type))
+                for manager in managers.get(step.target_user_id, [])
+            ]
+
+        for user_id, address in recipients:
+            key = (step.source_type, step.source_id, step.step_no, step.channel_type, user_id)
+            if not address or key in notified:
+                continue
+            notified.add(key)
+            targets.append({
+                'channel_type': step.channel_type,
+                'recipient': address,
+                'subject': f'[升级{step.step_no}] {step.subject or ""}'[:255],
+                'content': f'升级通知（第{step.step_no}级）：{step.content}',
+                'options': step.options,
+                'target_user_id': user_id,
+                'trigger_event': f'{step.trigger_event}.escalation',
+                'trigger_record_id': step.source_id
+            })
+    return targets
+
+
+class EscalationScheduler:
+    """执行到期升级步骤的后台调度线程"""
+
+    def __init__(self):
+        self.enabled = True
+        self.steps: List[Tuple[str, int]] = []
+        self.channels = ()
+        self.events = ()
+        self.batch_size = 500
+        self.max_wait = 60.0
+
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._app = None
+        self._stopping = False
+
+    def configure(self, app):
+        config = app.config
+        self.enabled = config['NOTIFICATION_ESCALATION_ENABLED']
+        self.steps = parse_escalation_steps(config['NOTIFICATION_ESCALATION_STEPS'])
+        self.channels = tuple(item.strip().upper() for item in config['NOTIFICATION_ESCALATION_CHANNELS'].split(',')
+                              if item.strip())
+        self.events = tuple(item.strip() for item in config['NOTIFICATION_ESCALATION_EVENTS'].split(',') if item.strip())
+        self.batch_size = config['NOTIFICATION_ESCALATION_BATCH_SIZE']
+        self.max_wait = config['NOTIFICATION_ESCALATION_MAX_WAIT']
+        self._app = app
+
+    def should_escalate(self, trigger_event: str, channel_type: str) -> bool:
+        return self.enabled and bool(self.steps) and trigger_event in self.events and channel_type in self.channels
+
+    def ensure_started(self):
+        """在当前进程内启动调度线程（gunicorn fork后的worker各自启动）"""
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='escalation-scheduler', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def wake(self):
+        """写入新的升级步骤后唤醒调度线程重新计算最早到期时间"""
+        self.ensure_started()
+        with self._cond:
+            self._cond.notify()
+
+    def stop(self, timeout: float = 5.0):
+        if self._pid != os.getpid():
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping:
+            wait = self.max_wait
+            with self._app.app_context():
+                try:
+                    fired = self._fire_due()
+                    wait = 0 if fired >= self.batch_size else self._seconds_until_next_due()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f'Escalation scheduler error: {str(e)}')
+                finally:
+                    db.session.remove()
+
+            if wait > 0:
+                with self._cond:
+                    if not self._stopping:
+                        self._cond.wait(wait)
+
+    def _seconds_until_next_due(self) -> float:
+        """最早待执行步骤的到期秒数（走 (status, due_at) 索引），没有时为最长等待时间"""
+        next_due = db.session.query(func.min(EscalationStep.due_at)).filter(
+            EscalationStep.status == 'PENDING'
+        ).scalar()
+        if next_due is None:
+            return self.max_wait
+        return min(max((next_due - datetime.utcnow()).total_seconds(), 0.0), self.max_wait)
+
+    def _fire_due(self) -> int:
+        """
+        领取一批到期步骤并写入通知发送队列，领取和入队在同一事务中提交；
+        返回领取的步骤数
+        """
+        now = datetime.utcnow()
+        step_ids = [step_id for (step_id,) in db.session.query(EscalationStep.id).filter(
+            EscalationStep.status == 'PENDING',
+            EscalationStep.due_at <= now
+        ).order_by(EscalationStep.due_at).limit(self.batch_size)]
+        if not step_ids:
+            return 0
+
+        # 多进程同时调度时只有批次标识匹配的行属于本进程
+        token = uuid.uuid4().hex
+        db.session.execute(
+            update(EscalationStep)
+            .where(EscalationStep.id.in_(step_ids), EscalationStep.status == 'PENDING')
+            .values(status='FIRED', claimed_by=token, fired_at=now)
+        )
+        steps = EscalationStep.query.filter(EscalationStep.claimed_by == token).order_by(EscalationStep.id).all()
+
+        targets = _build_step_targets(steps)
+        batch_id, job_ids = enqueue_notification_batch(targets, 'escalation')
+        db.session.commit()
+        if job_ids:
+            notification_dispatcher.wake()
+            logger.info(f'Fired {len(steps)} escalation steps, queued notification batch {batch_id}')
+        return len(steps)
+
+
+escalation_scheduler = EscalationScheduler()
+
+
+def _status_changed(obj) -> bool:
+    return get_history(obj, 'status').has_changes()
+
+
+@event.listens_for(Session, 'after_flush')
+def _cancel_acknowledged_escalations(session, flush_context):
+    """告警被确认、故障状态变更写入后，在同一事务中取消对应的升级步骤"""
+    sources = defaultdict(set)
+    for obj in session.dirty:
+        if isinstance(obj, Alert):
+            if obj.status == 'Acknowledged' and _status_changed(obj):
+                sources['alert'].add(obj.id)
+                if obj.incident_id:
+                    sources['new_incident'].add(obj.incident_id)
+        elif isinstance(obj, Incident):
+            if _status_changed(obj):
+                sources['incident'].add(obj.id)
+        elif isinstance(obj, NewIncident):
+            if _status_changed(obj):
+                sources['new_incident'].add(obj.id)
+
+    for source_type, source_ids in sources.items():
+        cancelled = cancel_escalations(source_type, list(source_ids), session)
+        if cancelled:
+            logger.info(f'Cancelled {cancelled} escalation steps for {source_type} {sorted(source_ids)}')
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_escalation_scheduler(session):
+    if session.info.pop('escalations_scheduled', False):
+        escalation_scheduler.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_escalation_mark(session):
+    session.info.pop('escalations_scheduled', None)
+
+
+def init_escalation_scheduler(app):
+    """根据应用配置初始化升级调度，各worker在处理首个请求时启动调度线程"""
+    escalation_scheduler.configure(app)
+    if escalation_scheduler.enabled:
+        app.before_request(escalation_scheduler.ensure_started)
+        atexit.register(escalation_scheduler.stop)
+    return escalation_scheduler
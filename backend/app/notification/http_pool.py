@@ -0,0 +1,150 @@
+"""
+Webhook HTTP 连接池
+每个目标主机（协议、地址、端口）在进程内共享一个 requests.Session，
+TCP/TLS 连接在多次发送之间保持复用（keep-alive），并按渠道配置设置连接池大小、重试退避和超时；
+安装了 httpx 或 aiohttp 时，同一批次的大量Webhook可通过 asyncio 并发发送。
+fork后的子进程不复用父进程的连接
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import asyncio
+import os
+import threading
+import requests
+import logging
+
+try:
+    import httpx
+except ImportError:  # 可选依赖
+    httpx = None
+
+try:
+    import aiohttp
+except ImportError:  # 可选依赖
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+# 限流（429）和暂时不可用（503）表示请求未被处理，可以在连接内重试；
+# 502/504 时网关之后的服务可能已处理了请求，不在连接内重发，交给派发线程的重试策略和熔断统计
+RETRY_STATUS_CODES = (429, 503)
+
+
+class HTTPSessionOptions:
+    """从应用配置和渠道配置合并得到的连接参数"""
+
+    __slots__ = ('pool_size', 'retries', 'backoff_factor', 'connect_timeout', 'read_timeout')
+
+    def __init__(self, channel_config: Dict[str, Any], config):
+        self.pool_size = int(channel_config.get('pool_size') or config['WEBHOOK_POOL_SIZE'])
+        retries = channel_config.get('retries')
+        self.retries = int(config['WEBHOOK_RETRIES'] if retries is None else retries)
+        backoff_factor = channel_config.get('backoff_factor')
+        self.backoff_factor = float(config['WEBHOOK_RETRY_BACKOFF'] if backoff_factor is None else backoff_factor)
+        self.connect_timeout = float(channel_config.get('connect_timeout') or config['WEBHOOK_CONNECT_TIMEOUT'])
+        self.read_timeout = float(channel_config.get('timeout') or config['WEBHOOK_TIMEOUT'])
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return self.connect_timeout, self.read_timeout
+
+    def key(self) -> Tuple:
+        return self.pool_size, self.retries, self.backoff_factor
+
+
+def _host_key(url: str) -> Tuple[str, str, Optional[int]]:
+    parts = urlsplit(url)
+    return parts.scheme.lower(), (parts.hostname or '').lower(), parts.port
+
+
+class HTTPSessionRegistry:
+    """按目标主机和连接参数区分的共享会话"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[Tuple, requests.Session] = {}
+        self._pid = os.getpid()
+
+    @staticmethod
+    def _create_session(options: HTTPSessionOptions) -> requests.Session:
+        retry = Retry(
+            total=options.retries,
+            connect=options.retries,
+            read=0,  # 已发出的请求超时后不重发，避免重复推送
+            status=options.retries,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=None,
+            backoff_factor=options.backoff_factor,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=options.pool_size, max_retries=retry, pool_block=True)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get(self, url: str, options: HTTPSessionOptions) -> requests.Session:
+        key = _host_key(url) + options.key()
+        with self._lock:
+            if self._pid != os.getpid():
+                # 父进程的socket不能在子进程中使用
+                self._sessions = {}
+                self._pid = os.getpid()
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = self._create_session(options)
+            return session
+
+    def close_all(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+
+
+http_sessions = HTTPSessionRegistry()
+
+
+def async_transport_available() -> bool:
+    return httpx is not None or aiohttp is not None
+
+
+async def _post_all_httpx(requests_list, options: HTTPSessionOptions):
+    limits = httpx.Limits(max_connections=options.pool_size, max_keepalive_connections=options.pool_size)
+    timeout = httpx.Timeout(options.read_timeout, connect=options.connect_timeout)
+    transport = httpx.AsyncHTTPTransport(retries=options.retries, limits=limits)
+    async with httpx.AsyncClient(transport=transport, timeout=timeout) as client:
+        async def post(method, url, payload, headers):
+            response = await client.request(method, url, json=payload, headers=headers)
+            return response.status_code, response.text
+        return await asyncio.gather(
+            *[post(*item) for item in requests_list], return_exceptions=True
+        )
+
+
+async def _post_all_aiohttp(requests_list, options: HTTPSessionOptions):
+    connector = aiohttp.TCPConnector(limit_per_host=options.pool_size)
+    timeout = aiohttp.ClientTimeout(sock_connect=options.connect_timeout, sock_read=options.read_timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def post(method, url, payload, headers):
+            async with session.request(method, url, json=payload, headers=headers) as response:
+                return response.status, await response.text()
+        return await asyncio.gather(
+            *[post(*item) for item in requests_list], return_exceptions=True
+        )
+
+
+def post_all_async(requests_list: List[Tuple[str, str, Any, Dict[str, str]]],
+                   options: HTTPSessionOptions) -> List[Any]:
+    """
+    在新的事件循环中并发发送一批请求，requests_list 为 (method, url, payload, headers)；
+    返回与之一一对应的 (status_code, text) 或异常。连接在本批次内复用，优先使用 httpx
+    """
+    if httpx is not None:
+        return asyncio.run(_post_all_httpx(requests_list, options))
+    if aiohttp is not None:
+        return asyncio.run(_post_all_aiohttp(requests_list, options))
+    raise RuntimeError('Async webhook transport requires httpx or aiohttp')
@@ -0,0 +1,104 @@
+"""
+通知接收人批量解析
+每个规则动作用一条查询取出全部启用的目标用户、联系方式及其关闭的通知渠道，
+返回轻量的 Recipient 元组而非ORM实体，不触发 group.members、role.users、
+user.notification_preferences 等逐行懒加载
+"""
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional
+from collections import OrderedDict
+from sqlalchemy import and_
+from app import db
+from app.models import User, UserNotificationPreference
+from app.models.user import user_group, user_role
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Recipient(NamedTuple):
+    """通知接收人及其联系方式，disabled_channels 为用户关闭的渠道类型"""
+    user_id: int
+    username: str
+    email: Optional[str]
+    phone_number: Optional[str]
+    disabled_channels: FrozenSet[str]
+
+    def address_for(self, channel_type: str) -> Optional[str]:
+        """渠道对应的收件地址，用户缺少该联系方式时返回None"""
+        if channel_type == 'EMAIL':
+            return self.email
+        if channel_type in ('SMS', 'VOICE_CALL'):
+            return self.phone_number
+        return self.username  # 对于webhook类型
+
+
+def _context_user_id(context: Dict[str, Any], attribute: str) -> Optional[int]:
+    incident = context.get('incident')
+    return getattr(incident, attribute, None) if incident is not None else None
+
+
+def _action_filter(action, context: Dict[str, Any]):
+    """动作对应的用户筛选条件和需要连接的关联表，无法解析时返回None"""
+    action_type = action.action_type
+    if action_type == 'NOTIFY_USER':
+        return User.id == int(action.target_identifier), None
+    if action_type == 'NOTIFY_GROUP':
+        return user_group.c.group_id == int(action.target_identifier), user_group
+    if action_type == 'NOTIFY_ROLE':
+        return user_role.c.role_id == int(action.target_identifier), user_role
+    if action_type == 'NOTIFY_ASSIGNEE':
+        # 特殊处理：通知事件分配人
+        user_id = _context_user_id(context, 'assignee_id')
+        return (User.id == user_id, None) if user_id else None
+    if action_type == 'NOTIFY_REPORTER':
+        # 特殊处理：通知事件报告人
+        user_id = _context_user_id(context, 'reporter_id')
+        return (User.id == user_id, None) if user_id else None
+    return None
+
+
+def resolve_action_recipients(action, context: Dict[str, Any]) -> List[Recipient]:
+    """用一条查询解析单个动作的接收人（含关闭的渠道），按用户ID排序"""
+    resolved = _action_filter(action, context)
+    if resolved is None:
+        return []
+    condition, association = resolved
+
+    query = db.session.query(
+        User.id, User.username, User.email, User.phone_number, UserNotificationPreference.channel_type
+    )
+    if association is not None:
+        query = query.join(association, association.c.user_id == User.id)
+    rows = query.outerjoin(UserNotificationPreference, and_(
+        UserNotificationPreference.user_id == User.id,
+        UserNotificationPreference.is_enabled == False
+    )).filter(condition, User.is_active == True).order_by(User.id)
+
+    users = OrderedDict()
+    for user_id, username, email, phone_number, disabled_channel in rows:
+        entry = users.setdefault(user_id, (username, email, phone_number, set()))
+        if disabled_channel:
+            entry[3].add(disabled_channel)
+    return [
+        Recipient(user_id, username, email, phone_number, frozenset(disabled))
+        for user_id, (username, email, phone_number, disabled) in users.items()
+    ]
+
+
+def resolve_recipients(actions, context: Dict[str, Any]) -> List[tuple]:
+    """
+    解析多个动作的接收人，返回 [(动作, [Recipient, ...]), ...]；
+    同一用户被多个动作选中时只保留在第一个动作中
+    """
+    seen = set()
+    result = []
+    for action in actions:
+        try:
+            recipients = [recipient for recipient in resolve_action_recipients(action, context)
+                          if recipient.user_id not in seen]
+        except Exception as e:
+            logger.error(f'Error getting target users: {str(e)}')
+            continue
+        seen.update(recipient.user_id for recipient in recipients)
+        result.append((action, recipients))
+    return result
@@ -0,0 +1,162 @@
+"""
+通知规则索引
+将启用的通知规则编译为进程内只读索引：触发事件 -> 规则 -> 动作，以及 (触发事件, 渠道) -> 模板，
+事件分发时直接查索引，不再逐次查询规则、动作和模板。
+规则、动作或模板变更时在同一事务中递增 config_versions 中的版本号，
+各进程按 NOTIFICATION_RULE_VERSION_TTL 检查版本号，发现变化后重建索引；本进程提交变更后立即重建
+"""
+from typing import Dict, Optional, Tuple
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models import ConfigVersion, NotificationRule, NotificationRuleAction, NotificationTemplate
+from app.notification.templating import template_cache_key
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# config_versions 中通知规则（含动作、模板）的版本名称
+NOTIFICATION_RULE_VERSION_NAME = 'notification_rules'
+
+_INDEXED_MODELS = (NotificationRule, NotificationRuleAction, NotificationTemplate)
+
+
+class CompiledTemplate:
+    """模板的只读快照，subject_key/body_key 为模板编译缓存的键"""
+
+    __slots__ = ('id', 'trigger_event', 'channel_type', 'subject_template', 'body_template',
+                 'tts_voice', 'play_times', 'timeout_sec', 'subject_key', 'body_key')
+
+    def __init__(self, template: NotificationTemplate):
+        self.id = template.id
+        self.trigger_event = template.trigger_event
+        self.channel_type = template.channel_type
+        self.subject_template = template.subject_template
+        self.body_template = template.body_template
+        self.tts_voice = template.tts_voice
+        self.play_times = template.play_times
+        self.timeout_sec = template.timeout_sec
+        self.subject_key = template_cache_key(template, 'subject')
+        self.body_key = template_cache_key(template, 'body')
+
+
+class CompiledAction:
+    """规则动作的只读快照"""
+
+    __slots__ = ('id', 'action_type', 'target_identifier', 'channel_priority')
+
+    def __init__(self, action: NotificationRuleAction):
+        self.id = action.id
+        self.action_type = action.action_type
+        self.target_identifier = action.target_identifier
+        self.channel_priority = tuple(action.channel_priority or ())
+
+
+class CompiledRule:
+    """规则的只读快照，templates 为该规则触发事件下各渠道的模板"""
+
+    __slots__ = ('id', 'name', 'trigger_event', 'actions', 'templates')
+
+    def __init__(self, rule: NotificationRule, actions: Tuple[CompiledAction, ...],
+                 templates: Dict[str, CompiledTemplate]):
+        self.id = rule.id
+        self.name = rule.name
+        self.trigger_event = rule.trigger_event
+        self.actions = actions
+        self.templates = templates
+
+
+class NotificationRuleIndex:
+    """按触发事件索引的通知规则，版本号按TTL缓存，稳定状态下分发事件不访问数据库"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules: Dict[str, Tuple[CompiledRule, ...]] = {}
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+
+    def _build(self) -> Dict[str, Tuple[CompiledRule, ...]]:
+        """用三条查询加载全部启用的规则、动作和模板"""
+        rules = NotificationRule.query.filter(NotificationRule.is_active == True).order_by(NotificationRule.id).all()
+
+        actions = defaultdict(list)
+        if rules:
+            for action in NotificationRuleAction.query.filter(
+                NotificationRuleAction.rule_id.in_([rule.id for rule in rules])
+            ).order_by(NotificationRuleAction.id):
+                actions[action.rule_id].append(CompiledAction(action))
+
+        # 同一事件、渠道有多个启用模板时取ID最小的一个
+        templates = defaultdict(dict)
+        for template in NotificationTemplate.query.filter(
+            NotificationTemplate.is_active == True
+        ).order_by(NotificationTemplate.id.desc()):
+            templates[template.trigger_event][template.channel_type] = CompiledTemplate(template)
+
+        index = defaultdict(list)
+        for rule in rules:
+            index[rule.trigger_event].append(
+                CompiledRule(rule, tuple(actions[rule.id]), templates.get(rule.trigger_event, {}))
+            )
+        return {trigger_event: tuple(event_rules) for trigger_event, event_rules in index.items()}
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at <= current_app.config['NOTIFICATION_RULE_VERSION_TTL']:
+            return
+        with self._lock:
+            if self._version is not None and now - self._checked_at <= current_app.config['NOTIFICATION_RULE_VERSION_TTL']:
+                return
+            version = ConfigVersion.get_version(NOTIFICATION_RULE_VERSION_NAME)
+            if version != self._version:
+                self._rules = self._build()
+                logger.info(f'Notification rule index rebuilt at version {version}: '
+                            f'{sum(len(rules) for rules in self._rules.values())} rules')
+            self._version = version
+            self._checked_at = now
+
+    def rules_for(self, trigger_event: str) -> Tuple[CompiledRule, ...]:
+        """触发事件对应的启用规则"""
+        self._refresh()
+        return self._rules.get(trigger_event, ())
+
+    def expire(self):
+        """本进程内变更规则后，下次分发时重新读取版本号并重建索引"""
+        with self._lock:
+            self._version = None
+            self._checked_at = 0.0
+
+
+notification_rule_index = NotificationRuleIndex()
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_notification_rule_version(session, flush_context):
+    """规则、动作或模板写入后，在同一事务中递增版本号（每个事务只递增一次）"""
+    if session.info.get('notification_rules_changed'):
+        return
+    if any(isinstance(obj, _INDEXED_MODELS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['notification_rules_changed'] = True
+        ConfigVersion.bump(NOTIFICATION_RULE_VERSION_NAME)
+
+
+@event.listens_for(Session, 'after_commit')
+def _expire_notification_rule_index(session):
+    if session.info.pop('notification_rules_changed', False):
+        notification_rule_index.expire()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_notification_rule_mark(session):
+    session.info.pop('notification_rules_changed', None)
+
+
+def init_notification_rule_index(app):
+    """
+    规则变更监听在导入本模块时注册，应用启动时调用以确保
+    任何接口修改规则、动作或模板都会递增版本号
+    """
+    return notification_rule_index
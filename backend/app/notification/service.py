@@ -3,17 +3,31 @@
 负责处理各种通知渠道的消息发送
 """
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from flask import current_app
-from flask_mail import Message, Mail
-from jinja2 import Template
-import requests
+from urllib.parse import urlsplit
+from flask_mail import Message, Mail, BadHeaderError
+from app.notification.smtp_pool import smtp_pools
+from app.notification.templating import template_renderer
+from app.notification.http_pool import HTTPSessionOptions, http_sessions, async_transport_available, post_all_async
+from app.utils.metrics import NOTIFICATION_SENT, NOTIFICATION_LATENCY
 import json
 import logging
+import smtplib
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# 收件人、发件人被拒绝或邮件内容本身有问题，重试也不会成功
+PERMANENT_EMAIL_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, BadHeaderError, AssertionError)
+
+# 钉钉、企业微信在HTTP 200响应体中以errcode返回错误，其中限流错误可以稍后重试
+# 钉钉 130101: 发送速度太快而限流；企业微信 45009: 接口调用超过限制，45033: 并发调用超过限制
+WEBHOOK_THROTTLE_ERRCODES = {130101, 45009, 45033}
+# 超时、限流、网关错误之外的4xx表示请求本身不被接受
+WEBHOOK_RETRYABLE_STATUS_CODES = {408, 429}
+
 class NotificationChannel(ABC):
     """通知渠道抽象基类"""
     
@@ -29,6 +43,14 @@ class NotificationChannel(ABC):
     def validate_config(self) -> bool:
         """验证配置是否有效"""
         pass
+    
+    def send_batch(self, items: List[Tuple[str, str, str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """批量发送，items 为 (to, subject, content, kwargs)；默认逐条发送"""
+        return [self.send(to, subject, content, **kwargs) for to, subject, content, kwargs in items]
+    
+    def endpoint(self) -> Optional[str]:
+        """发送目标主机，用于按主机熔断；没有固定目标主机的渠道返回None"""
+        return None
 
 class EmailChannel(NotificationChannel):
     """邮件通知渠道"""
@@ -38,28 +60,63 @@ class EmailChannel(NotificationChannel):
         self.mail = mail
     
     def send(self, to: str, subject: str, content: str, **kwargs) -> Dict[str, Any]:
+        return self.send_batch([(to, subject, content, kwargs)])[0]
+    
+    def send_batch(self, items: List[Tuple[str, str, str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """通过连接池中的同一个SMTP连接发送多封邮件，避免每封邮件重复握手和登录"""
+        config = current_app.config
+        sender = config.get('MAIL_DEFAULT_SENDER')
+        messages = [
+            Message(subject=subject, recipients=[to], html=content, sender=sender)
+            for to, subject, content, _ in items
+        ]
+        
         try:
-            msg = Message(
-                subject=subject,
-                recipients=[to],
-                html=content,
-                sender=current_app.config.get('MAIL_DEFAULT_SENDER')
-            )
-            
-            self.mail.send(msg)
-            
-            return {
-                'status': 'SUCCESS',
-                'message': 'Email sent successfully',
-                'external_id': None
-            }
+            if config.get('MAIL_SUPPRESS_SEND', config.get('TESTING')):
+                # 测试环境交给Flask-Mail处理（不真正连接SMTP服务器）
+                for msg in messages:
+                    self.mail.send(msg)
+                errors = [None] * len(messages)
+            else:
+                errors = self._get_pool().send_messages(messages)
         except Exception as e:
-            logger.error(f'Email sending failed: {str(e)}')
-            return {
-                'status': 'FAILED',
-                'message': str(e),
-                'external_id': None
-            }
+            errors = [e] * len(messages)
+        
+        results = []
+        for error in errors:
+            if error is None:
+                results.append({
+                    'status': 'SUCCESS',
+                    'message': 'Email sent successfully',
+                    'external_id': None
+                })
+            else:
+                logger.error(f'Email sending failed: {str(error)}')
+                results.append({
+                    'status': 'FAILED',
+                    'message': str(error),
+                    'external_id': None,
+                    'retryable': not isinstance(error, PERMANENT_EMAIL_ERRORS)
+                })
+        return results
+    
+    def endpoint(self) -> Optional[str]:
+        return self.config.get('smtp_server') or current_app.config.get('MAIL_SERVER')
+    
+    def _get_pool(self):
+        """按渠道配置的SMTP服务器获取连接池，渠道未配置服务器时使用应用的MAIL_*配置"""
+        config = current_app.config
+        if self.config.get('smtp_server'):
+            return smtp_pools.get(
+                self.config['smtp_server'], self.config.get('smtp_port', 25),
+                self.config.get('username'), self.config.get('password'),
+                self.config.get('use_tls', True), self.config.get('use_ssl', False), config
+            )
+        return smtp_pools.get(
+            config['MAIL_SERVER'], config['MAIL_PORT'],
+            config.get('MAIL_USERNAME'), config.get('MAIL_PASSWORD'),
+            config.get('MAIL_USE_TLS', False), config.get('MAIL_USE_SSL', False), config
+        )
     
     def validate_config(self) -> bool:
         required_keys = ['smtp_server', 'smtp_port', 'username', 'password']
@@ -94,55 +151,111 @@ class WebhookChannel(NotificationChannel):
     """Webhook通知渠道（支持钉钉、企业微信等）"""
     
     def send(self, to: str, subject: str, content: str, **kwargs) -> Dict[str, Any]:
+        return self.send_batch([(to, subject, content, kwargs)])[0]
+    
+    def send_batch(self, items: List[Tuple[str, str, str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        通过目标主机的共享会话发送，TCP/TLS连接在消息之间复用；
+        批次较大且安装了httpx/aiohttp时改为asyncio并发发送
+        """
+        config = current_app.config
         try:
             webhook_url = self.config.get('webhook_url')
-            webhook_type = self.config.get('webhook_type', 'dingtalk')
+            method = (self.config.get('method') or 'POST').upper()
+            headers = self.config.get('headers') or {}
+            options = HTTPSessionOptions(self.config, config)
+            payloads = [self._build_payload(webhook_url, subject, content) for _, subject, content, _ in items]
             
-            if webhook_type == 'dingtalk':
-                payload = {
-                    'msgtype': 'text',
-                    'text': {
-                        'content': f'{subject}\n{content}'
-                    }
-                }
-            elif webhook_type == 'wechat' or 'weixin' in webhook_url.lower():
-                # 企业微信Webhook格式
-                payload = {
-                    'msgtype': 'text',
-                    'text': {
-                        'content': f'{subject}\n{content}'
-                    }
-                }
-            else:  # generic webhook
-                payload = {
-                    'text': f'{subject}\n{content}'
+            if len(items) >= config['WEBHOOK_ASYNC_MIN_BATCH'] and config['WEBHOOK_ASYNC_ENABLED'] \
+                    and async_transport_available():
+                responses = post_all_async(
+                    [(method, webhook_url, payload, headers) for payload in payloads], options
+                )
+            else:
+                session = http_sessions.get(webhook_url, options)
+                responses = []
+                for payload in payloads:
+                    try:
+                        response = session.request(method, webhook_url, json=payload, headers=headers,
+                                                   timeout=options.timeout)
+                        responses.append((response.status_code, response.text))
+                    except Exception as e:
+                        responses.append(e)
+        except Exception as e:
+            responses = [e] * len(items)
+        
+        return [self._to_result(response) for response in responses]
+    
+    def endpoint(self) -> Optional[str]:
+        return urlsplit(self.config.get('webhook_url') or '').hostname
+    
+    def _build_payload(self, webhook_url: str, subject: str, content: str) -> Dict[str, Any]:
+        webhook_type = self.config.get('webhook_type', 'dingtalk')
+        
+        if webhook_type == 'dingtalk':
+            return {
+                'msgtype': 'text',
+                'text': {
+                    'content': f'{subject}\n{content}'
                 }
-            
-            response = requests.post(webhook_url, json=payload, timeout=10)
-            
-            if response.status_code == 200:
-                return {
-                    'status': 'SUCCESS',
-                    'message': 'Webhook sent successfully',
-                    'external_id': f'webhook_{int(datetime.utcnow().timestamp())}',
-                    'response': response.text
+            }
+        elif webhook_type == 'wechat' or 'weixin' in webhook_url.lower():
+            # 企业微信Webhook格式
+            return {
+                'msgtype': 'text',
+                'text': {
+                    'content': f'{subject}\n{content}'
                 }
-            else:
+            }
+        else:  # generic webhook
+            return {
+                'text': f'{subject}\n{content}'
+            }
+    
+    def _to_result(self, response) -> Dict[str, Any]:
+        if isinstance(response, Exception):
+            logger.error(f'Webhook sending failed: {str(response)}')
+            return {
+                'status': 'FAILED',
+                'message': str(response),
+                'external_id': None
+            }
+        
+        status_code, text = response
+        if status_code == 200:
+            errcode = self._response_errcode(text)
+            if errcode:
                 return {
                     'status': 'FAILED',
-                    'message': f'Webhook failed with status {response.status_code}',
+                    'message': f'Webhook rejected with errcode {errcode}: {text[:200]}',
                     'external_id': None,
-                    'response': response.text
+                    'response': text,
+                    'retryable': errcode in WEBHOOK_THROTTLE_ERRCODES
                 }
-                
-        except Exception as e:
-            logger.error(f'Webhook sending failed: {str(e)}')
+            return {
+                'status': 'SUCCESS',
+                'message': 'Webhook sent successfully',
+                'external_id': f'webhook_{int(datetime.utcnow().timestamp())}',
+                'response': text
+            }
+        else:
             return {
                 'status': 'FAILED',
-                'message': str(e),
-                'external_id': None
+                'message': f'Webhook failed with status {status_code}',
+                'external_id': None,
+                'response': text,
+                'retryable': status_code >= 500 or status_code in WEBHOOK_RETRYABLE_STATUS_CODES
             }
     
+    def _response_errcode(self, text: str) -> int:
+        """钉钉、企业微信响应体中的errcode，其他类型的Webhook不解析响应体"""
+        if self.config.get('webhook_type', 'dingtalk') not in ('dingtalk', 'wechat'):
+            return 0
+        try:
+            return int(json.loads(text).get('errcode') or 0)
+        except (ValueError, TypeError, AttributeError):
+            return 0
+    
     def validate_config(self) -> bool:
         return 'webhook_url' in self.config
 
@@ -210,13 +323,20 @@ class NotificationService:
             }
         
         channel = self.channels[channel_type]
-        return channel.send(to, subject, content, **kwargs)
+        started = time.perf_counter()
+        status = 'FAILED'
+        try:
+            result = channel.send(to, subject, content, **kwargs)
+            status = result.get('status', 'FAILED')
+            return result
+        finally:
+            NOTIFICATION_LATENCY.labels(channel_type).observe(time.perf_counter() - started)
+            NOTIFICATION_SENT.labels(channel_type, status).inc()
     
-    def render_template(self, template_content: str, context: Dict[str, Any]) -> str:
-        """渲染模板"""
+    def render_template(self, template_content: str, context: Dict[str, Any], cache_key: Optional[tuple] = None) -> str:
+        """渲染模板，编译结果按 cache_key（见 template_cache_key）或模板内容缓存"""
         try:
-            template = Template(template_content)
-            return template.render(**context)
+            return template_renderer.render(template_content, context, cache_key)
         except Exception as e:
             logger.error(f'Template rendering failed: {str(e)}')
             return template_content  # 返回原始内容
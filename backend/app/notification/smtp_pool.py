@@ -0,0 +1,200 @@
+"""
+SMTP 连接池
+每个SMTP服务器（地址、端口、账号）在进程内维护一组已完成TLS握手和登录的连接，
+发送时借出、发送后归还；空闲超过保活间隔的连接借出前先用NOOP探测，
+连接断开时重新建立并重发当前邮件。fork后的子进程不复用父进程的连接
+"""
+from typing import Dict, List, Optional, Tuple
+from collections import deque
+from contextlib import contextmanager
+from flask_mail import Message, BadHeaderError, sanitize_address, sanitize_addresses
+import os
+import smtplib
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPPoolTimeoutError(Exception):
+    """等待空闲连接超时"""
+    pass
+
+
+class SMTPConnectionPool:
+    """单个SMTP服务器的有界连接池"""
+
+    def __init__(self, host: str, port: int, username: Optional[str] = None, password: Optional[str] = None,
+                 use_tls: bool = False, use_ssl: bool = False, max_size: int = 4,
+                 keepalive_interval: float = 30, idle_timeout: float = 300, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.keepalive_interval = keepalive_interval
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = deque()
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                conn.starttls()
+            if self.username and self.password:
+                conn.login(self.username, self.password)
+        except Exception:
+            self._close(conn)
+            raise
+        return conn
+
+    @staticmethod
+    def _close(conn: smtplib.SMTP):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    @staticmethod
+    def _is_alive(conn: smtplib.SMTP) -> bool:
+        try:
+            return conn.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _take_idle(self) -> Optional[smtplib.SMTP]:
+        """取出一个可用的空闲连接，丢弃超过空闲时间或探测失败的连接"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn, last_used = self._idle.pop()
+            idle = time.monotonic() - last_used
+            if idle > self.idle_timeout:
+                self._close(conn)
+                continue
+            if idle > self.keepalive_interval and not self._is_alive(conn):
+                self._close(conn)
+                continue
+            return conn
+
+    @contextmanager
+    def connection(self):
+        """借出一个已登录的连接；使用中出错的连接不再归还"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise SMTPPoolTimeoutError(f'No idle SMTP connection to {self.host}:{self.port}')
+        conn = None
+        try:
+            conn = self._take_idle() or self._connect()
+            yield conn
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+            conn = None
+        finally:
+            if conn is not None:
+                self._close(conn)
+            self._slots.release()
+
+    @staticmethod
+    def _deliver(conn: smtplib.SMTP, message: Message):
+        assert message.send_to, 'No recipients have been added'
+        assert message.sender, 'The message does not specify a sender'
+        if message.has_bad_headers():
+            raise BadHeaderError
+        if message.date is None:
+            message.date = time.time()
+        conn.sendmail(
+            sanitize_address(message.sender),
+            list(sanitize_addresses(message.send_to)),
+            message.as_bytes(),
+            message.mail_options,
+            message.rcpt_options
+        )
+
+    def send_messages(self, messages: List[Message]) -> List[Optional[Exception]]:
+        """
+        通过同一个连接依次发送多封邮件，返回与messages一一对应的异常（成功为None）
+        连接中途断开时重新连接并重发当前邮件，单封邮件被服务器拒绝不影响后续邮件
+        """
+        errors: List[Optional[Exception]] = [None] * len(messages)
+        index = 0
+        while index < len(messages):
+            try:
+                with self.connection() as conn:
+                    while index < len(messages):
+                        try:
+                            self._deliver(conn, messages[index])
+                        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                                smtplib.SMTPDataError, BadHeaderError, AssertionError) as e:
+                            errors[index] = e
+                        index += 1
+            except smtplib.SMTPServerDisconnected as e:
+                # 连接在借出后被服务器关闭：当前邮件在新连接上重试一次
+                logger.warning(f'SMTP connection to {self.host} dropped, reconnecting: {str(e)}')
+                try:
+                    with self.connection() as conn:
+                        self._deliver(conn, messages[index])
+                except Exception as retry_error:
+                    errors[index] = retry_error
+                index += 1
+            except SMTPPoolTimeoutError as e:
+                # 连接池持续占满时剩余邮件不再逐封等待
+                for remaining in range(index, len(messages)):
+                    errors[remaining] = e
+                break
+            except Exception as e:
+                errors[index] = e
+                index += 1
+        return errors
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for conn, _ in idle:
+            self._close(conn)
+
+
+class SMTPPoolRegistry:
+    """按服务器和账号区分的连接池集合"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[Tuple, SMTPConnectionPool] = {}
+        self._pid = os.getpid()
+
+    def get(self, host: str, port: int, username: Optional[str], password: Optional[str],
+            use_tls: bool, use_ssl: bool, config) -> SMTPConnectionPool:
+        key = (host, int(port), username, password, bool(use_tls), bool(use_ssl))
+        with self._lock:
+            if self._pid != os.getpid():
+                # 父进程的socket不能在子进程中使用
+                self._pools = {}
+                self._pid = os.getpid()
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = SMTPConnectionPool(
+                    host, int(port), username, password, use_tls, use_ssl,
+                    max_size=config['SMTP_POOL_SIZE'],
+                    keepalive_interval=config['SMTP_KEEPALIVE_INTERVAL'],
+                    idle_timeout=config['SMTP_IDLE_TIMEOUT'],
+                    timeout=config['SMTP_TIMEOUT']
+                )
+            return pool
+
+    def close_all(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.close()
+
+
+smtp_pools = SMTPPoolRegistry()
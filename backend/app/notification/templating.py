@@ -0,0 +1,117 @@
+"""
+通知模板编译缓存
+所有模板共享一个沙箱化的 jinja2 环境，编译结果按模板ID和更新时间（或模板内容的哈希）缓存在进程内LRU中，
+同一模板向大量接收人发送时只解析编译一次；编译出的字节码另写入字节码缓存目录，worker重启或新进程可直接加载。
+模板被修改或删除时，ORM事件会清除该模板的缓存项
+"""
+from typing import Any, Dict, Hashable, Optional
+from collections import OrderedDict
+from jinja2 import FileSystemBytecodeCache, Template
+from jinja2.sandbox import SandboxedEnvironment
+from sqlalchemy import event
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateRenderer:
+    """带编译缓存的模板渲染器"""
+
+    def __init__(self, max_size: int = 512):
+        self.max_size = max_size
+        self.env = SandboxedEnvironment(autoescape=False)
+
+        self._lock = threading.Lock()
+        self._templates: 'OrderedDict[Hashable, Template]' = OrderedDict()
+
+    def configure(self, app):
+        config = app.config
+        self.max_size = config['NOTIFICATION_TEMPLATE_CACHE_SIZE']
+        self.env.bytecode_cache = FileSystemBytecodeCache(config['NOTIFICATION_TEMPLATE_BYTECODE_DIR'] or None) \
+            if config['NOTIFICATION_TEMPLATE_BYTECODE_CACHE'] else None
+        self.clear()
+
+    @staticmethod
+    def content_key(source: str) -> str:
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    def _compile(self, key: Hashable, source: str) -> Template:
+        """编译模板，字节码缓存按名称和源码校验，源码变化时自动重新编译"""
+        env = self.env
+        name = f'notification:{key}'
+        bucket = None
+        code = None
+        if env.bytecode_cache is not None:
+            try:
+                bucket = env.bytecode_cache.get_bucket(env, name, None, source)
+                code = bucket.code
+            except OSError as e:
+                logger.warning(f'Template bytecode cache unavailable: {str(e)}')
+                bucket = None
+        if code is None:
+            code = env.compile(source, name)
+            if bucket is not None:
+                bucket.code = code
+                try:
+                    env.bytecode_cache.set_bucket(bucket)
+                except OSError as e:
+                    logger.warning(f'Template bytecode cache write failed: {str(e)}')
+        return env.template_class.from_code(env, code, env.make_globals(None))
+
+    def get_template(self, source: str, cache_key: Optional[Hashable] = None) -> Template:
+        """
+        获取编译后的模板；cache_key 通常为 (模板ID, 字段, 更新时间)，
+        未提供时按源码哈希缓存
+        """
+        key = cache_key if cache_key is not None else self.content_key(source)
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                return template
+
+        template = self._compile(key, source)
+        with self._lock:
+            self._templates[key] = template
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.max_size:
+                self._templates.popitem(last=False)
+        return template
+
+    def render(self, source: str, context: Dict[str, Any], cache_key: Optional[Hashable] = None) -> str:
+        return self.get_template(source, cache_key).render(**context)
+
+    def invalidate_template(self, template_id: int):
+        """清除某个通知模板的所有缓存项（键的第一个元素为模板ID）"""
+        with self._lock:
+            for key in [key for key in self._templates if isinstance(key, tuple) and key[:1] == (template_id,)]:
+                del self._templates[key]
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+
+template_renderer = TemplateRenderer()
+
+
+def template_cache_key(template, field: str) -> tuple:
+    """通知模板某个字段的缓存键，模板更新后 updated_at 变化，旧缓存项不再命中"""
+    return template.id, field, template.updated_at.isoformat() if template.updated_at else None
+
+
+def _invalidate_notification_template(mapper, connection, target):
+    template_renderer.invalidate_template(target.id)
+
+
+def init_template_renderer(app):
+    """根据应用配置初始化模板渲染器，并在通知模板修改、删除时清除其缓存"""
+    from app.models import NotificationTemplate
+
+    template_renderer.configure(app)
+    if not event.contains(NotificationTemplate, 'after_update', _invalidate_notification_template):
+        event.listen(NotificationTemplate, 'after_update', _invalidate_notification_template)
+        event.listen(NotificationTemplate, 'after_delete', _invalidate_notification_template)
+    return template_renderer
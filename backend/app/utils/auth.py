@@ -3,9 +3,180 @@
 包含权限检查装饰器和相关工具函数
 """
 from functools import wraps
-from flask import jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import User
+from collections import OrderedDict
+from flask import jsonify, current_app, after_this_request
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from sqlalchemy import select, union
+from app import db
+from app.models import User, Permission, ConfigVersion
+from app.models.user import user_role, user_group, group_role, role_permission
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# config_versions 中权限授予关系的版本名称
+PERMISSION_VERSION_NAME = 'permissions'
+
+def load_user_permissions(user_id):
+    """
+    用一条查询加载用户的全部权限代码（直接角色 + 所在组的角色）
+    用户不存在时返回None
+    """
+    direct = select(
+        user_role.c.user_id.label('user_id'), role_permission.c.permission_id.label('permission_id')
+    ).join(role_permission, role_permission.c.role_id == user_role.c.role_id)
+    via_group = select(
+        user_group.c.user_id, role_permission.c.permission_id
+    ).join(
+        group_role, group_role.c.group_id == user_group.c.group_id
+    ).join(role_permission, role_permission.c.role_id == group_role.c.role_id)
+    grants = union(direct, via_group).subquery()
+    
+    rows = db.session.query(User.id, Permission.code).outerjoin(
+        grants, grants.c.user_id == User.id
+    ).outerjoin(
+        Permission, Permission.id == grants.c.permission_id
+    ).filter(User.id == user_id).all()
+    
+    if not rows:
+        return None
+    return frozenset(code for _, code in rows if code)
+
+class PermissionCache:
+    """
+    用户ID -> 权限代码集合的进程内缓存（TTL + LRU淘汰）
+    用户、用户组变更后由接口主动失效，角色权限变更由TTL兜底
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+    
+    def get_permissions(self, user_id):
+        """返回用户的权限集合，用户不存在时返回None"""
+        now = time.monotonic()
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            # 命中时刷新最近使用顺序，淘汰时才是最久未使用的用户
+            with self._lock:
+                if user_id in self._entries:
+                    self._entries.move_to_end(user_id)
+            return entry[1]
+        
+        permissions = load_user_permissions(user_id)
+        with self._lock:
+            self._entries[user_id] = (now + current_app.config['PERMISSION_CACHE_TTL'], permissions)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > current_app.config['PERMISSION_CACHE_SIZE']:
+                self._entries.popitem(last=False)
+        return permissions
+    
+    def invalidate(self, user_id=None):
+        """失效指定用户的缓存，不指定时清空全部"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+permission_cache = PermissionCache()
+
+class PermissionRegistry:
+    """
+    权限位图注册表：权限在位图中的位置即Permission.id，
+    当前授予关系版本号按PERMISSION_VERSION_TTL缓存，用于判断令牌中的位图是否过期
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bits = {}
+        self._version = 0
+        self._checked_at = 0.0
+    
+    def current_version(self):
+        """当前权限版本号（短时缓存，多数请求不访问数据库）"""
+        now = time.monotonic()
+        if now - self._checked_at > current_app.config['PERMISSION_VERSION_TTL']:
+            version = ConfigVersion.get_version(PERMISSION_VERSION_NAME)
+            with self._lock:
+                if version != self._version or not self._bits:
+                    self._bits = {code: permission_id for permission_id, code in
+                                  db.session.query(Permission.id, Permission.code)}
+                self._version = version
+                self._checked_at = now
+        return self._version
+    
+    def bit_for(self, permission_code):
+        """权限代码对应的位，未注册的权限返回None"""
+        self.current_version()
+        return self._bits.get(permission_code)
+    
+    def encode(self, permission_codes):
+        """将权限代码集合编码为十六进制位图"""
+        mask = 0
+        for code in permission_codes:
+            bit = self.bit_for(code)
+            if bit is not None:
+                mask |= 1 << bit
+        return format(mask, 'x')
+    
+    def expire(self):
+        """本进程内变更权限后立即重新读取版本号"""
+        with self._lock:
+            self._checked_at = 0.0
+
+permission_registry = PermissionRegistry()
+
+def build_permission_claims(user):
+    """生成访问令牌的附加声明，启用权限位图时包含位图和权限版本号"""
+    claims = {
+        'username': user.username,
+        'roles': [role.name for role in user.roles]
+    }
+    if current_app.config['JWT_PERMISSION_CLAIMS']:
+        version = permission_registry.current_version()
+        claims['perm_mask'] = permission_registry.encode(load_user_permissions(user.id) or ())
+        claims['perm_ver'] = version
+    return claims
+
+def invalidate_user_permissions(user_id=None):
+    """
+    用户、组或角色的授予关系变更提交后调用：
+    失效本进程的权限缓存，并递增权限版本号使所有令牌中的位图过期
+    """
+    permission_cache.invalidate(user_id)
+    try:
+        ConfigVersion.bump(PERMISSION_VERSION_NAME)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'Permission version bump error: {str(e)}')
+    permission_registry.expire()
+
+def _check_token_permission(permission_code):
+    """
+    用令牌中的权限位图鉴权，无需访问数据库
+    返回True/False；令牌没有位图或位图已过期时返回None，由调用方回退到权限缓存
+    """
+    if not current_app.config['JWT_PERMISSION_CLAIMS']:
+        return None
+    
+    claims = get_jwt()
+    if 'perm_mask' not in claims:
+        return None
+    
+    if claims.get('perm_ver') != permission_registry.current_version():
+        # 提示客户端调用 /auth/refresh-permissions 换取新令牌
+        @after_this_request
+        def mark_stale(response):
+            response.headers['X-Permissions-Stale'] = '1'
+            return response
+        return None
+    
+    bit = permission_registry.bit_for(permission_code)
+    return bit is not None and bool(int(claims['perm_mask'], 16) >> bit & 1)
 
 def permission_required(permission_code):
     """权限检查装饰器"""
@@ -13,13 +184,17 @@ def permission_required(permission_code):
         @wraps(f)
         @jwt_required()
         def decorated_function(*args, **kwargs):
-            current_user_id = get_jwt_identity()
-            user = User.query.get(current_user_id)
+            allowed = _check_token_permission(permission_code)
             
-            if not user:
-                return jsonify({'error': 'User not found'}), 404
+            if allowed is None:
+                permissions = permission_cache.get_permissions(get_jwt_identity())
+                
+                if permissions is None:
+                    return jsonify({'error': 'User not found'}), 404
+                
+                allowed = permission_code in permissions
             
-            if not user.has_permission(permission_code):
+            if not allowed:
                 return jsonify({
                     'error': 'Permission denied',
                     'required_permission': permission_code
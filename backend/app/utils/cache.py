@@ -0,0 +1,32 @@
+"""
+进程内结果缓存
+用于高频轮询、允许短时间不一致的只读接口；每个worker各自缓存，
+本进程内的写操作主动失效，其他worker依靠TTL过期
+"""
+from typing import Any, Callable, Dict, Hashable, Tuple
+import threading
+import time
+
+
+class TTLCache:
+    """带过期时间的简单键值缓存"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: float) -> Any:
+        """命中且未过期时返回缓存值，否则调用loader加载并缓存"""
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        value = loader()
+        with self._lock:
+            self._entries[key] = (now + ttl, value)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = {}
@@ -0,0 +1,210 @@
+"""
+请求级SQL与耗时统计
+通过SQLAlchemy游标事件统计每个请求执行的SQL条数和数据库耗时，通过JSON序列化器统计响应体编码耗时
+（视图中 to_dict 等对象转换不在其中，计入应用耗时），
+按Flask端点汇总到进程内统计表，并以Server-Timing响应头返回给调用方；
+端点可声明查询预算，超出时记录警告，用于发现和防止N+1查询回归
+"""
+from typing import Any, Dict, Optional, Tuple
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetrics:
+    """单个请求内的计量数据"""
+
+    __slots__ = ('started', 'query_count', 'db_time', 'encode_time', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.encode_time = 0.0
+        self.statements = Counter()
+
+
+def _current_metrics() -> Optional[RequestMetrics]:
+    # 后台线程（告警写入、抑制计数刷新等）没有请求上下文，不计入任何端点
+    if not has_request_context():
+        return None
+    return g.get('request_metrics')
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_metrics() is not None:
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics = _current_metrics()
+    if metrics is None or not conn.info.get('query_start_time'):
+        return
+    metrics.db_time += time.perf_counter() - conn.info['query_start_time'].pop()
+    metrics.query_count += 1
+    metrics.statements[statement] += 1
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """记录响应体JSON编码耗时的序列化器"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        metrics = _current_metrics()
+        if metrics is None:
+            return super().dumps(obj, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            metrics.encode_time += time.perf_counter() - started
+
+
+def query_budget(max_queries: Optional[int] = None, max_db_ms: Optional[float] = None):
+    """
+    声明端点的查询预算：SQL条数上限和数据库耗时上限（毫秒）
+    需放在路由装饰器之下，超出预算只记录警告，不影响响应
+    """
+    def decorator(f):
+        f.query_budget = (max_queries, max_db_ms)
+        return f
+    return decorator
+
+
+def parse_budgets(spec: str) -> Dict[str, Tuple[Optional[int], Optional[float]]]:
+    """
+    解析配置中的预算覆盖，格式为 "端点=条数[:毫秒],..."，
+    例如 "api_v1.get_alerts=10:200,api_v1.get_users=5"；条数留空表示不限制条数
+    """
+    budgets = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        endpoint, _, limits = item.partition('=')
+        max_queries, _, max_db_ms = limits.partition(':')
+        budgets[endpoint.strip()] = (
+            int(max_queries) if max_queries.strip() else None,
+            float(max_db_ms) if max_db_ms.strip() else None
+        )
+    return budgets
+
+
+class EndpointStats:
+    """按端点汇总的进程内统计（每个worker各自统计）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, endpoint: str, metrics: RequestMetrics, duration: float, over_budget: bool):
+        with self._lock:
+            stat = self._stats.get(endpoint)
+            if stat is None:
+                stat = self._stats[endpoint] = {
+                    'requests': 0, 'queries': 0, 'max_queries': 0,
+                    'db_time': 0.0, 'encode_time': 0.0, 'duration': 0.0, 'max_duration': 0.0,
+                    'over_budget': 0
+                }
+            stat['requests'] += 1
+            stat['queries'] += metrics.query_count
+            stat['max_queries'] = max(stat['max_queries'], metrics.query_count)
+            stat['db_time'] += metrics.db_time
+            stat['encode_time'] += metrics.encode_time
+            stat['duration'] += duration
+            stat['max_duration'] = max(stat['max_duration'], duration)
+            stat['over_budget'] += int(over_budget)
+
+    def snapshot(self):
+        with self._lock:
+            stats = {endpoint: dict(stat) for endpoint, stat in self._stats.items()}
+
+        result = []
+        for endpoint, stat in stats.items():
+            requests = stat['requests']
+            result.append({
+                'endpoint': endpoint,
+                'requests': requests,
+                'avg_queries': round(stat['queries'] / requests, 2),
+                'max_queries': stat['max_queries'],
+                'avg_db_ms': round(stat['db_time'] * 1000 / requests, 2),
+                'avg_encode_ms': round(stat['encode_time'] * 1000 / requests, 2),
+                'avg_duration_ms': round(stat['duration'] * 1000 / requests, 2),
+                'max_duration_ms': round(stat['max_duration'] * 1000, 2),
+                'over_budget': stat['over_budget']
+            })
+        result.sort(key=lambda item: item['avg_queries'], reverse=True)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+
+endpoint_stats = EndpointStats()
+
+
+def _get_budget(endpoint: str) -> Tuple[Optional[int], Optional[float]]:
+    budgets = current_app.config['INSTRUMENTATION_BUDGETS']
+    if endpoint in budgets:
+        return budgets[endpoint]
+    view = current_app.view_functions.get(endpoint)
+    return getattr(view, 'query_budget', (None, None))
+
+
+def _start_request():
+    g.request_metrics = RequestMetrics()
+
+
+def _finish_request(response):
+    metrics = g.pop('request_metrics', None)
+    if metrics is None or request.endpoint is None:
+        return response
+
+    duration = time.perf_counter() - metrics.started
+    endpoint = request.endpoint
+    config = current_app.config
+
+    max_queries, max_db_ms = _get_budget(endpoint)
+    db_ms = metrics.db_time * 1000
+    over_budget = (max_queries is not None and metrics.query_count > max_queries) or \
+        (max_db_ms is not None and db_ms > max_db_ms)
+    if over_budget:
+        logger.warning(
+            f'Query budget exceeded on {endpoint}: {metrics.query_count} queries '
+            f'(budget {max_queries}), {db_ms:.1f}ms db time (budget {max_db_ms})'
+        )
+
+    # 同一条SQL在一个请求中重复执行多次，通常是逐行懒加载关联
+    if metrics.statements:
+        statement, repeats = metrics.statements.most_common(1)[0]
+        if repeats >= config['INSTRUMENTATION_REPEAT_THRESHOLD']:
+            logger.warning(f'Possible N+1 on {endpoint}: statement executed {repeats} times: {statement[:200]}')
+
+    endpoint_stats.record(endpoint, metrics, duration, over_budget)
+
+    if config['SERVER_TIMING_ENABLED']:
+        app_ms = max(duration - metrics.db_time - metrics.encode_time, 0) * 1000
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={db_ms:.2f};desc="{metrics.query_count} queries"',
+            f'encode;dur={metrics.encode_time * 1000:.2f}',
+            f'app;dur={app_ms:.2f}'
+        ])
+    return response
+
+
+def init_instrumentation(app):
+    """根据应用配置注册请求计量钩子和计时序列化器"""
+    if not app.config['INSTRUMENTATION_ENABLED']:
+        return
+    app.config['INSTRUMENTATION_BUDGETS'] = parse_budgets(app.config['INSTRUMENTATION_BUDGETS'])
+    app.json = TimedJSONProvider(app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
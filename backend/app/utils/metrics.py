@@ -0,0 +1,112 @@
+"""
+Prometheus 运行指标
+请求量与延迟、数据库连接池、通知发送、告警接入和进程内队列深度，由 /metrics 暴露；
+gunicorn 多worker部署时设置环境变量 PROMETHEUS_MULTIPROC_DIR（须在进程启动前设置），
+各worker将指标写入该目录下的共享文件，抓取时由任意worker汇总（见 gunicorn.conf.py）
+"""
+from flask import Response, g, request
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.pool import Pool, QueuePool
+import os
+import time
+
+REQUEST_COUNT = Counter(
+    'http_requests_total', 'HTTP请求数', ['method', 'endpoint', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP请求处理耗时', ['method', 'endpoint'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', '从连接池获取连接的等待耗时（含新建连接）',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+)
+DB_POOL_IN_USE = Gauge(
+    'db_pool_connections_in_use', '已借出的数据库连接数', multiprocess_mode='livesum'
+)
+
+NOTIFICATION_SENT = Counter(
+    'notifications_sent_total', '通知发送次数', ['channel', 'status']
+)
+NOTIFICATION_LATENCY = Histogram(
+    'notification_send_duration_seconds', '通知发送耗时', ['channel'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+ALERTS_INGESTED = Counter(
+    'alerts_ingested_total', '接入的告警数（created/deduplicated 写入并提交，suppressed 被抑制，queued 进入异步队列，rejected 异步写入时被数据库拒绝；'
+    '异步模式下告警入队时计入queued，后台批量写入提交后再计入created/deduplicated）',
+    ['result']
+)
+
+QUEUE_DEPTH = Gauge(
+    'inprocess_queue_depth', '进程内队列积压条数', ['queue'], multiprocess_mode='livesum'
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """记录连接借出等待时间的连接池"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+@event.listens_for(Pool, 'checkout')
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_IN_USE.inc()
+
+
+@event.listens_for(Pool, 'checkin')
+def _on_checkin(dbapi_connection, connection_record):
+    DB_POOL_IN_USE.dec()
+
+
+def configure_engine_metrics(app):
+    """在创建数据库引擎之前为连接池启用等待时间统计（SQLite使用单连接池，不适用）"""
+    if not app.config['METRICS_ENABLED'] or app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.setdefault('poolclass', InstrumentedQueuePool)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+    # 未匹配路由统一归为一类，避免任意URL产生新的标签值
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - started)
+    REQUEST_COUNT.labels(request.method, endpoint, response.status_code).inc()
+    return response
+
+
+def metrics_view():
+    """输出Prometheus文本格式的指标"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    """注册请求指标钩子和 /metrics 端点"""
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,93 @@
+"""
+游标（keyset）分页
+按 (排序时间列, id) 倒序翻页，用上一页最后一行的键值作为不透明游标，
+避免深分页时的 OFFSET 扫描，总数只在调用方明确需要时才统计；
+排序列为NULL的行排在最后并按id倒序，游标中的排序值为null
+"""
+from typing import Any, Dict, Optional
+from datetime import datetime
+from sqlalchemy import or_, and_
+import base64
+import json
+
+
+class InvalidCursorError(ValueError):
+    """游标无法解析"""
+    pass
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    """将上一页最后一行的排序键编码为游标，排序值为NULL时编码为null"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """解析游标，返回 (排序值, id)，排序值为None表示已翻到排序列为NULL的行"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        if sort_value is None:
+            return None, int(row_id)
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (TypeError, ValueError):
+        raise InvalidCursorError('Invalid cursor')
+
+
+def is_cursor_request(args) -> bool:
+    """请求携带cursor参数（首页传空字符串）时使用游标分页，否则保持原有页码分页"""
+    return 'cursor' in args
+
+
+def paginate_by_cursor(query, sort_column, id_column, args, default_per_page: int = 20,
+                       max_per_page: int = 100) -> Dict[str, Any]:
+    """
+    按 (sort_column, id_column) 倒序执行游标分页，sort_column为NULL的行排在最后
+    args 为请求参数，支持 cursor、per_page、with_total
+    返回 {'items', 'next_cursor', 'has_more', 'per_page', 'total'}，未请求总数时total为None
+    """
+    per_page = min(max(args.get('per_page', default_per_page, type=int), 1), max_per_page)
+    with_total = args.get('with_total', 'false').lower() in ['true', '1']
+
+    total = query.order_by(None).count() if with_total else None
+
+    cursor = args.get('cursor')
+    sort_value, last_id = decode_cursor(cursor) if cursor else (None, None)
+    # 多取一行用于判断是否还有下一页
+    limit = per_page + 1
+
+    # 先按 (排序列, id) 倒序取排序列非NULL的行，各数据库对NULL的排序位置不同，分开查询且都能使用索引
+    items = []
+    if not cursor or sort_value is not None:
+        segment = query.filter(sort_column.isnot(None))
+        if cursor:
+            segment = segment.filter(or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, id_column < last_id)
+            ))
+        items = segment.order_by(sort_column.desc(), id_column.desc()).limit(limit).all()
+
+    # 非NULL的行取完后接着按id倒序取排序列为NULL的行
+    if len(items) < limit:
+        segment = query.filter(sort_column.is_(None))
+        if cursor and sort_value is None:
+            segment = segment.filter(id_column < last_id)
+        items += segment.order_by(id_column.desc()).limit(limit - len(items)).all()
+
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    next_cursor: Optional[str] = None
+    if has_more:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+    return {
+        'items': items,
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'per_page': per_page,
+        'total': total
+    }
@@ -0,0 +1,63 @@
+"""
+故障ID序列分配
+每天一行计数，通过“插入或累加”的单条语句原子地预留一段序号，
+进程内按段发放，多个gunicorn worker并发创建故障时无需重试
+"""
+from typing import Dict, Tuple
+from datetime import date
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.models.incident_new import IncidentIdSequence
+from app.utils.sql import upsert_statement
+import os
+import threading
+
+
+def _increment_sequence(table, inserted):
+    return {'last_value': table.c.last_value + inserted.last_value}
+
+
+class IncidentIdAllocator:
+    """
+    按日期分段预留序号：每次从序列表预留INCIDENT_ID_BLOCK_SIZE个序号，用完再预留
+    段大于1时，进程重启会跳过未用完的序号，不同worker之间的序号也不再严格按时间递增
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._blocks: Dict[date, Tuple[int, int]] = {}
+        self._pid = os.getpid()
+
+    def next_value(self, day: date) -> int:
+        with self._lock:
+            # fork出的子进程不能沿用父进程预留的序号段
+            if self._pid != os.getpid():
+                self._blocks = {}
+                self._pid = os.getpid()
+
+            next_value, end = self._blocks.get(day, (1, 0))
+            if next_value > end:
+                next_value, end = self._reserve(day, current_app.config['INCIDENT_ID_BLOCK_SIZE'])
+                # 只保留当天的序号段
+                self._blocks = {}
+
+            self._blocks[day] = (next_value + 1, end)
+            return next_value
+
+    def _reserve(self, day: date, size: int) -> Tuple[int, int]:
+        """原子地把当天计数增加size，返回预留的序号区间 [start, end]"""
+        table = IncidentIdSequence.__table__
+        stmt = upsert_statement(table, [table.c.seq_date], _increment_sequence)
+
+        # 使用独立连接并立即提交，计数行锁只在这条语句的事务内持有，
+        # 不会被故障创建的事务拖长，回滚的故障只会留下序号空洞
+        with db.engine.begin() as conn:
+            conn.execute(stmt, {'seq_date': day, 'last_value': size})
+            end = conn.execute(
+                select(table.c.last_value).where(table.c.seq_date == day)
+            ).scalar_one()
+        return end - size + 1, end
+
+
+incident_id_allocator = IncidentIdAllocator()
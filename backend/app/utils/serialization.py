@@ -0,0 +1,29 @@
+"""
+序列化配置（profile）
+- detail：完整关联图，与原有 to_dict() 输出一致，默认配置
+- summary：列表用，自身字段加上以 embed 方式嵌入的直接关联，集合只返回数量
+- embed：作为其他对象的嵌套字段，只含标识信息，不访问任何关联
+
+模型通过 loader_options(profile) 声明该配置需要预加载的关联，
+列表接口按配置自动加上 selectinload/joinedload，查询数与返回行数无关
+"""
+
+PROFILES = ('summary', 'detail', 'embed')
+
+
+class InvalidProfileError(ValueError):
+    """不支持的序列化配置"""
+    pass
+
+
+def get_profile(args, default='detail'):
+    """从请求参数 view 中读取序列化配置"""
+    profile = args.get('view') or default
+    if profile not in PROFILES:
+        raise InvalidProfileError(f'Invalid view: {profile}, expected one of {", ".join(PROFILES)}')
+    return profile
+
+
+def apply_profile(query, model, profile):
+    """为查询加上模型在该配置下声明的预加载选项"""
+    return query.options(*model.loader_options(profile))
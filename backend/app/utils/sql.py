@@ -0,0 +1,32 @@
+"""
+SQL辅助函数
+封装不同数据库方言之间存在差异的语句构造
+"""
+from sqlalchemy import insert
+from app import db
+
+
+def upsert_statement(table, index_elements, build_updates):
+    """
+    构造“唯一键冲突时改为更新”的INSERT语句，兼容MySQL、SQLite和PostgreSQL
+    build_updates(table, inserted) 返回冲突时需要更新的列字典，inserted 引用待插入行的值
+    """
+    dialect_name = db.session.get_bind().dialect.name
+
+    if dialect_name == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(table)
+        return stmt.on_duplicate_key_update(**build_updates(table, stmt.inserted))
+
+    if dialect_name in ('sqlite', 'postgresql'):
+        if dialect_name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_=build_updates(table, stmt.excluded)
+        )
+
+    return insert(table)
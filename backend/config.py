@@ -36,6 +36,121 @@ class Config:
     DEFAULT_PAGE_SIZE = 20
     MAX_PAGE_SIZE = 100
     
+    # 告警接入配置
+    ALERT_BULK_MAX_ITEMS = int(os.environ.get('ALERT_BULK_MAX_ITEMS') or 5000)
+    # 告警自动关联故障：时间窗口（秒）与未关闭故障索引的刷新间隔（秒）
+    ALERT_CORRELATION_ENABLED = os.environ.get('ALERT_CORRELATION_ENABLED', 'true').lower() in ['true', '1']
+    ALERT_CORRELATION_WINDOW = int(os.environ.get('ALERT_CORRELATION_WINDOW') or 1800)
+    ALERT_CORRELATION_INDEX_TTL = int(os.environ.get('ALERT_CORRELATION_INDEX_TTL') or 30)
+    # Alertmanager中用于匹配服务目录的标签，按顺序查找
+    ALERTMANAGER_SERVICE_LABELS = (os.environ.get('ALERTMANAGER_SERVICE_LABELS') or 'service,job').split(',')
+    # 告警抑制：来源/指纹令牌桶（每秒速率、突发量），风暴阈值（窗口内条数）及风暴期间的抽样比例
+    ALERT_SUPPRESSION_ENABLED = os.environ.get('ALERT_SUPPRESSION_ENABLED', 'true').lower() in ['true', '1']
+    ALERT_SOURCE_RATE = float(os.environ.get('ALERT_SOURCE_RATE') or 200)
+    ALERT_SOURCE_BURST = float(os.environ.get('ALERT_SOURCE_BURST') or 1000)
+    ALERT_FINGERPRINT_RATE = float(os.environ.get('ALERT_FINGERPRINT_RATE') or 1)
+    ALERT_FINGERPRINT_BURST = float(os.environ.get('ALERT_FINGERPRINT_BURST') or 10)
+    ALERT_STORM_THRESHOLD = int(os.environ.get('ALERT_STORM_THRESHOLD') or 500)
+    ALERT_STORM_WINDOW = int(os.environ.get('ALERT_STORM_WINDOW') or 60)
+    ALERT_STORM_SAMPLE_RATE = int(os.environ.get('ALERT_STORM_SAMPLE_RATE') or 10)
+    # 抑制计数写入数据库的间隔（秒）
+    ALERT_SUPPRESSION_FLUSH_INTERVAL = int(os.environ.get('ALERT_SUPPRESSION_FLUSH_INTERVAL') or 10)
+    # 告警写入模式：sync 请求内直接提交；async 写入本地spool和内存队列后由后台线程批量提交
+    ALERT_INGEST_MODE = (os.environ.get('ALERT_INGEST_MODE') or 'sync').lower()
+    ALERT_QUEUE_MAX_SIZE = int(os.environ.get('ALERT_QUEUE_MAX_SIZE') or 10000)
+    ALERT_QUEUE_BATCH_SIZE = int(os.environ.get('ALERT_QUEUE_BATCH_SIZE') or 500)
+    ALERT_QUEUE_FLUSH_INTERVAL = float(os.environ.get('ALERT_QUEUE_FLUSH_INTERVAL') or 0.2)
+    ALERT_QUEUE_RETRY_AFTER = int(os.environ.get('ALERT_QUEUE_RETRY_AFTER') or 1)
+    ALERT_SPOOL_DIR = os.environ.get('ALERT_SPOOL_DIR') or 'spool'
+    ALERT_SPOOL_FSYNC = os.environ.get('ALERT_SPOOL_FSYNC', 'false').lower() in ['true', '1']
+    # 队列持续有积压时，spool中累计确认的告警数超过该值后重写spool，只保留未写入的告警
+    ALERT_SPOOL_COMPACT_THRESHOLD = int(os.environ.get('ALERT_SPOOL_COMPACT_THRESHOLD') or 10000)
+    
+    # 故障ID序号每次从序列表预留的数量，大于1可减少并发创建时对计数行的竞争（会产生序号空洞）
+    INCIDENT_ID_BLOCK_SIZE = int(os.environ.get('INCIDENT_ID_BLOCK_SIZE') or 1)
+    
+    # /incidents-new/statistics 结果缓存时间（秒）
+    INCIDENT_STATISTICS_CACHE_TTL = int(os.environ.get('INCIDENT_STATISTICS_CACHE_TTL') or 5)
+    
+    # 权限缓存：用户权限集合的缓存时间（秒）与最多缓存的用户数
+    PERMISSION_CACHE_TTL = int(os.environ.get('PERMISSION_CACHE_TTL') or 60)
+    PERMISSION_CACHE_SIZE = int(os.environ.get('PERMISSION_CACHE_SIZE') or 10000)
+    # 在访问令牌中携带权限位图，版本号未变时鉴权不访问数据库；版本号的检查间隔（秒）
+    JWT_PERMISSION_CLAIMS = os.environ.get('JWT_PERMISSION_CLAIMS', 'true').lower() in ['true', '1']
+    PERMISSION_VERSION_TTL = int(os.environ.get('PERMISSION_VERSION_TTL') or 5)
+    
+    # 通知异步派发：发送线程数、各渠道并发上限（"EMAIL=4,WEBHOOK=16"，未列出的渠道使用默认值）、
+    # outbox轮询间隔（秒）、单次领取的最大任务数、已领取任务的超时重新派发时间（秒）
+    NOTIFICATION_DISPATCH_ENABLED = os.environ.get('NOTIFICATION_DISPATCH_ENABLED', 'true').lower() in ['true', '1']
+    NOTIFICATION_WORKERS = int(os.environ.get('NOTIFICATION_WORKERS') or 8)
+    NOTIFICATION_CHANNEL_DEFAULT_CONCURRENCY = int(os.environ.get('NOTIFICATION_CHANNEL_DEFAULT_CONCURRENCY') or 4)
+    NOTIFICATION_CHANNEL_CONCURRENCY = os.environ.get('NOTIFICATION_CHANNEL_CONCURRENCY') or ''
+    # 每个发送批次包含的任务数（"EMAIL=20"），邮件批次复用同一个SMTP连接，Webhook批次可异步并发发送；未列出的渠道逐条发送
+    NOTIFICATION_CHANNEL_BATCH_SIZE = os.environ.get('NOTIFICATION_CHANNEL_BATCH_SIZE') or \
+        'EMAIL=20,DINGTALK=20,SLACK=20,TEAMS=20,WEBHOOK=20'
+    NOTIFICATION_POLL_INTERVAL = float(os.environ.get('NOTIFICATION_POLL_INTERVAL') or 1)
+    NOTIFICATION_CLAIM_BATCH_SIZE = int(os.environ.get('NOTIFICATION_CLAIM_BATCH_SIZE') or 100)
+    NOTIFICATION_JOB_TIMEOUT = int(os.environ.get('NOTIFICATION_JOB_TIMEOUT') or 300)
+    # 发送失败重试：默认最多发送次数、首次重试延迟和最大延迟（秒），按渠道覆盖的格式为 "渠道=次数:首次延迟:最大延迟"；
+    # 钉钉机器人每分钟限流，使用较短的延迟和更多的次数
+    NOTIFICATION_RETRY_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_RETRY_MAX_ATTEMPTS') or 5)
+    NOTIFICATION_RETRY_BASE_DELAY = float(os.environ.get('NOTIFICATION_RETRY_BASE_DELAY') or 10)
+    NOTIFICATION_RETRY_MAX_DELAY = float(os.environ.get('NOTIFICATION_RETRY_MAX_DELAY') or 1800)
+    NOTIFICATION_RETRY_POLICIES = os.environ.get('NOTIFICATION_RETRY_POLICIES') or 'DINGTALK=8:5:300'
+    # 熔断：按渠道类型和目标主机统计连续失败次数，达到阈值后暂停发送的时间（秒）及恢复后放行的试探批次数
+    NOTIFICATION_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('NOTIFICATION_BREAKER_FAILURE_THRESHOLD') or 5)
+    NOTIFICATION_BREAKER_RESET_TIMEOUT = float(os.environ.get('NOTIFICATION_BREAKER_RESET_TIMEOUT') or 30)
+    NOTIFICATION_BREAKER_HALF_OPEN_MAX = int(os.environ.get('NOTIFICATION_BREAKER_HALF_OPEN_MAX') or 1)
+    # 自适应并发：单条发送耗时超过目标（秒）或失败时减小渠道并发上限，否则逐步恢复到 NOTIFICATION_CHANNEL_CONCURRENCY
+    NOTIFICATION_ADAPTIVE_CONCURRENCY = os.environ.get('NOTIFICATION_ADAPTIVE_CONCURRENCY', 'true').lower() in ['true', '1']
+    NOTIFICATION_LATENCY_TARGET = float(os.environ.get('NOTIFICATION_LATENCY_TARGET') or 2)
+    # 渠道配置缓存时间（秒）
+    NOTIFICATION_CHANNEL_CACHE_TTL = int(os.environ.get('NOTIFICATION_CHANNEL_CACHE_TTL') or 30)
+    # 通知规则索引检查版本号的间隔（秒），其他进程修改规则、模板后最多经过该时间生效
+    NOTIFICATION_RULE_VERSION_TTL = int(os.environ.get('NOTIFICATION_RULE_VERSION_TTL') or 5)
+    # 通知升级：严重故障的指定渠道通知发出后按升级链定时再次通知本人（REPEAT）或其所在组负责人（MANAGER），
+    # 格式为 "步骤类型=距首次通知的秒数,..."；告警确认或故障状态变更时取消未执行的步骤
+    NOTIFICATION_ESCALATION_ENABLED = os.environ.get('NOTIFICATION_ESCALATION_ENABLED', 'true').lower() in ['true', '1']
+    NOTIFICATION_ESCALATION_STEPS = os.environ.get('NOTIFICATION_ESCALATION_STEPS') or 'REPEAT=300,MANAGER=600'
+    NOTIFICATION_ESCALATION_CHANNELS = os.environ.get('NOTIFICATION_ESCALATION_CHANNELS') or 'VOICE_CALL'
+    NOTIFICATION_ESCALATION_EVENTS = os.environ.get('NOTIFICATION_ESCALATION_EVENTS') or 'incident.created'
+    # 升级调度每批执行的步骤数，以及无到期步骤时的最长睡眠时间（秒）
+    NOTIFICATION_ESCALATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_ESCALATION_BATCH_SIZE') or 500)
+    NOTIFICATION_ESCALATION_MAX_WAIT = float(os.environ.get('NOTIFICATION_ESCALATION_MAX_WAIT') or 60)
+    
+    # 通知模板编译缓存：进程内缓存的模板数，以及是否将编译结果写入字节码缓存目录（留空使用系统临时目录）
+    NOTIFICATION_TEMPLATE_CACHE_SIZE = int(os.environ.get('NOTIFICATION_TEMPLATE_CACHE_SIZE') or 512)
+    NOTIFICATION_TEMPLATE_BYTECODE_CACHE = os.environ.get('NOTIFICATION_TEMPLATE_BYTECODE_CACHE', 'true').lower() in ['true', '1']
+    NOTIFICATION_TEMPLATE_BYTECODE_DIR = os.environ.get('NOTIFICATION_TEMPLATE_BYTECODE_DIR') or ''
+    
+    # SMTP连接池：每个服务器的最大连接数、空闲超过多久先发NOOP探测、空闲连接最长保留时间及超时（秒）
+    SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE') or 4)
+    SMTP_KEEPALIVE_INTERVAL = int(os.environ.get('SMTP_KEEPALIVE_INTERVAL') or 30)
+    SMTP_IDLE_TIMEOUT = int(os.environ.get('SMTP_IDLE_TIMEOUT') or 300)
+    SMTP_TIMEOUT = int(os.environ.get('SMTP_TIMEOUT') or 30)
+    
+    # Webhook HTTP连接池：每个目标主机保持的连接数、失败重试次数和退避系数、连接/读取超时（秒），
+    # 渠道配置中的 pool_size、retries、backoff_factor、connect_timeout、timeout 优先
+    WEBHOOK_POOL_SIZE = int(os.environ.get('WEBHOOK_POOL_SIZE') or 20)
+    WEBHOOK_RETRIES = int(os.environ.get('WEBHOOK_RETRIES') or 2)
+    WEBHOOK_RETRY_BACKOFF = float(os.environ.get('WEBHOOK_RETRY_BACKOFF') or 0.5)
+    WEBHOOK_CONNECT_TIMEOUT = float(os.environ.get('WEBHOOK_CONNECT_TIMEOUT') or 5)
+    WEBHOOK_TIMEOUT = float(os.environ.get('WEBHOOK_TIMEOUT') or 10)
+    # 安装了httpx或aiohttp时，达到该条数的Webhook批次通过asyncio并发发送
+    WEBHOOK_ASYNC_ENABLED = os.environ.get('WEBHOOK_ASYNC_ENABLED', 'true').lower() in ['true', '1']
+    WEBHOOK_ASYNC_MIN_BATCH = int(os.environ.get('WEBHOOK_ASYNC_MIN_BATCH') or 5)
+    
+    # Prometheus指标（/metrics）；多worker部署需设置环境变量 PROMETHEUS_MULTIPROC_DIR
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ['true', '1']
+    
+    # 请求计量：统计各端点SQL条数、数据库耗时与响应体编码耗时，并返回Server-Timing响应头
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', 'true').lower() in ['true', '1']
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() in ['true', '1']
+    # 端点查询预算覆盖，格式 "端点=条数[:毫秒],..."，如 "api_v1.get_alerts=10:200"
+    INSTRUMENTATION_BUDGETS = os.environ.get('INSTRUMENTATION_BUDGETS') or ''
+    # 同一SQL在单个请求中重复执行达到该次数时记录疑似N+1警告
+    INSTRUMENTATION_REPEAT_THRESHOLD = int(os.environ.get('INSTRUMENTATION_REPEAT_THRESHOLD') or 10)
+    
     # 文件上传配置
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn 配置
+设置 PROMETHEUS_MULTIPROC_DIR 时，各worker的Prometheus指标写入该目录下的共享文件，
+启动前清空上次运行残留的文件，worker退出后标记其进程，使livesum类指标不再计入
+用法: PROMETHEUS_MULTIPROC_DIR=/tmp/event-manage-metrics gunicorn -c gunicorn.conf.py run:app
+"""
+import glob
+import os
+
+
+def on_starting(server):
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,27 @@
+-- 告警指纹与去重字段
+ALTER TABLE alerts
+    ADD COLUMN fingerprint VARCHAR(64) NULL COMMENT '告警指纹（标识标签的哈希）',
+    ADD COLUMN active_fingerprint VARCHAR(64) NULL COMMENT '活跃告警指纹',
+    ADD COLUMN occurrence_count INT NOT NULL DEFAULT 1 COMMENT '重复触发次数',
+    ADD COLUMN last_fired_at DATETIME NULL COMMENT '最近一次触发时间';
+
+-- 回填历史告警指纹（与 Alert.compute_fingerprint 的算法保持一致）
+UPDATE alerts SET
+    fingerprint = SHA1(CONCAT_WS(CHAR(31),
+        IFNULL(alert_rule, ''), IFNULL(host, ''), IFNULL(service_id, ''), IFNULL(metric_name, ''),
+        IF(CONCAT(IFNULL(alert_rule, ''), IFNULL(host, ''), IFNULL(service_id, ''), IFNULL(metric_name, '')) = '',
+           title, ''))),
+    last_fired_at = fired_at;
+
+-- 每个指纹只保留最新的一条活跃告警，避免唯一索引冲突
+UPDATE alerts a
+JOIN (
+    SELECT MAX(id) AS id FROM alerts
+    WHERE resolved_at IS NULL AND status <> 'Ignored'
+    GROUP BY fingerprint
+) latest ON a.id = latest.id
+SET a.active_fingerprint = a.fingerprint;
+
+-- MySQL不支持部分索引：唯一索引允许多个NULL，非活跃告警的active_fingerprint置空即可
+CREATE INDEX ix_alerts_fingerprint ON alerts(fingerprint);
+CREATE UNIQUE INDEX ix_alerts_active_fingerprint ON alerts(active_fingerprint);
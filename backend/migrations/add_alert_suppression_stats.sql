@@ -0,0 +1,10 @@
+-- 告警抑制统计表（限流和风暴采样丢弃的告警按来源/级别/日期累计）
+CREATE TABLE alert_suppression_stats (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    alert_source VARCHAR(100) NOT NULL DEFAULT '' COMMENT '告警来源',
+    level ENUM('Critical', 'Warning', 'Info') NOT NULL COMMENT '告警级别',
+    stat_date DATE NOT NULL COMMENT '统计日期',
+    suppressed_count INT NOT NULL DEFAULT 0 COMMENT '被抑制的告警数量',
+    updated_at DATETIME,
+    CONSTRAINT _alert_suppression_stat_uc UNIQUE (alert_source, level, stat_date)
+);
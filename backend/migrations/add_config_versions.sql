@@ -0,0 +1,8 @@
+-- 配置版本号表：各进程缓存的配置（权限位图等）据此判断是否需要重新加载
+CREATE TABLE config_versions (
+    name VARCHAR(50) PRIMARY KEY COMMENT '配置名称',
+    version INT NOT NULL DEFAULT 0 COMMENT '版本号',
+    updated_at DATETIME COMMENT '更新时间'
+);
+
+INSERT INTO config_versions (name, version, updated_at) VALUES ('permissions', 0, NOW());
@@ -0,0 +1,24 @@
+-- 通知升级步骤：严重故障通知后按升级链定时再次通知，确认或状态变更时取消
+CREATE TABLE escalation_steps (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    source_type ENUM('incident', 'new_incident', 'alert') NOT NULL COMMENT '升级来源类型',
+    source_id INT NOT NULL COMMENT '升级来源记录ID',
+    trigger_event VARCHAR(100) NOT NULL,
+    step_no INT NOT NULL COMMENT '升级级别，从1开始',
+    step_type ENUM('REPEAT', 'MANAGER') NOT NULL COMMENT 'REPEAT再次通知本人，MANAGER通知所在组负责人',
+    target_user_id INT,
+    channel_type ENUM('EMAIL', 'SMS', 'SLACK', 'TEAMS', 'DINGTALK', 'WEBHOOK', 'VOICE_CALL') NOT NULL,
+    recipient VARCHAR(500) NOT NULL,
+    subject VARCHAR(255),
+    content TEXT NOT NULL,
+    options JSON,
+    status ENUM('PENDING', 'FIRED', 'CANCELLED') NOT NULL DEFAULT 'PENDING',
+    due_at DATETIME NOT NULL COMMENT '到期时间',
+    claimed_by VARCHAR(32) COMMENT '执行该步骤的调度批次标识',
+    fired_at DATETIME,
+    cancelled_at DATETIME,
+    created_at DATETIME,
+    FOREIGN KEY (target_user_id) REFERENCES users(id),
+    INDEX idx_escalation_steps_status_due_at (status, due_at),
+    INDEX idx_escalation_steps_source (source_type, source_id, status)
+);
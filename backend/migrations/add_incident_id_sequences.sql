@@ -0,0 +1,13 @@
+-- 故障ID按日序列表，替代按 LIKE 'F-YYYYMMDD-%' 计数生成序号
+CREATE TABLE incident_id_sequences (
+    seq_date DATE PRIMARY KEY COMMENT '日期',
+    last_value INT NOT NULL DEFAULT 0 COMMENT '已分配的最大序号'
+);
+
+-- 用已有故障ID初始化各日期的序号
+INSERT INTO incident_id_sequences (seq_date, last_value)
+SELECT STR_TO_DATE(SUBSTRING(incident_id, 3, 8), '%Y%m%d'),
+       MAX(CAST(SUBSTRING_INDEX(incident_id, '-', -1) AS UNSIGNED))
+FROM incidents_new
+WHERE incident_id REGEXP '^F-[0-9]{8}-[0-9]+$'
+GROUP BY SUBSTRING(incident_id, 3, 8);
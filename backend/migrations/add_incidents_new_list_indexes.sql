@@ -0,0 +1,3 @@
+-- 故障列表分页与状态筛选所需的复合索引
+CREATE INDEX idx_incidents_new_created_at_id ON incidents_new(created_at, id);
+CREATE INDEX idx_incidents_new_status_created_at_id ON incidents_new(status, created_at, id);
@@ -0,0 +1,11 @@
+-- 游标分页所需的复合索引：按 (时间列, id) 倒序翻页
+CREATE INDEX idx_alerts_fired_at_id ON alerts(fired_at, id);
+CREATE INDEX idx_alerts_status_fired_at_id ON alerts(status, fired_at, id);
+
+CREATE INDEX idx_incidents_created_at_id ON incidents(created_at, id);
+CREATE INDEX idx_incidents_status_created_at_id ON incidents(status, created_at, id);
+
+CREATE INDEX idx_problems_created_at_id ON problems(created_at, id);
+CREATE INDEX idx_problems_status_created_at_id ON problems(status, created_at, id);
+
+CREATE INDEX idx_notification_logs_created_at_id ON notification_logs(created_at, id);
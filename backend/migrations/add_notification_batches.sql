@@ -0,0 +1,6 @@
+-- 批量通知批次：日志与发送任务按批次批量写入，并可按批次查询发送进度
+ALTER TABLE notification_logs ADD COLUMN batch_id VARCHAR(32) COMMENT '批量通知批次标识';
+ALTER TABLE notification_logs ADD INDEX idx_notification_logs_batch_id (batch_id);
+
+ALTER TABLE notification_jobs ADD COLUMN batch_id VARCHAR(32) COMMENT '批量通知批次标识' AFTER log_id;
+ALTER TABLE notification_jobs ADD INDEX idx_notification_jobs_batch_id (batch_id);
@@ -0,0 +1,15 @@
+-- 通知死信：重试次数用尽仍发送失败的任务，可通过接口批量重放
+CREATE TABLE notification_dead_letters (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    job_id INT NOT NULL,
+    log_id INT NOT NULL,
+    channel_type ENUM('EMAIL', 'SMS', 'SLACK', 'TEAMS', 'DINGTALK', 'WEBHOOK', 'VOICE_CALL') NOT NULL,
+    recipient VARCHAR(500) NOT NULL,
+    attempts INT NOT NULL,
+    last_error TEXT,
+    created_at DATETIME,
+    replayed_at DATETIME COMMENT '重放时间，为空表示尚未重放',
+    FOREIGN KEY (job_id) REFERENCES notification_jobs(id),
+    FOREIGN KEY (log_id) REFERENCES notification_logs(id),
+    INDEX idx_notification_dead_letters_replayed_at (replayed_at, id)
+);
@@ -0,0 +1,25 @@
+-- 通知发送任务（outbox）：接口只写入任务，由后台派发线程池发送
+ALTER TABLE notification_logs MODIFY COLUMN status ENUM('PENDING', 'SUCCESS', 'FAILED') NOT NULL;
+
+CREATE TABLE notification_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    channel_type ENUM('EMAIL', 'SMS', 'SLACK', 'TEAMS', 'DINGTALK', 'WEBHOOK', 'VOICE_CALL') NOT NULL,
+    channel_id INT,
+    log_id INT NOT NULL,
+    recipient VARCHAR(500) NOT NULL COMMENT '收件地址：邮箱、手机号或Webhook地址',
+    subject VARCHAR(255),
+    content TEXT NOT NULL,
+    options JSON COMMENT '渠道附加参数，如单条发送指定的webhook配置、语音播报参数',
+    status ENUM('PENDING', 'SENDING', 'SUCCESS', 'FAILED') NOT NULL DEFAULT 'PENDING',
+    attempts INT NOT NULL DEFAULT 0,
+    last_error TEXT,
+    claimed_by VARCHAR(32) COMMENT '领取该任务的派发批次标识',
+    available_at DATETIME NOT NULL COMMENT '最早可发送时间',
+    locked_at DATETIME COMMENT '被领取的时间',
+    created_at DATETIME,
+    updated_at DATETIME,
+    FOREIGN KEY (channel_id) REFERENCES notification_channels(id),
+    FOREIGN KEY (log_id) REFERENCES notification_logs(id),
+    INDEX idx_notification_jobs_status_available_at (status, available_at),
+    INDEX idx_notification_jobs_claimed_by (claimed_by)
+);